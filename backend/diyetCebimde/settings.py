@@ -14,6 +14,7 @@ import os
 import json
 import dj_database_url
 from pathlib import Path
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -173,6 +174,9 @@ CORS_ALLOWED_ORIGINS = [
 
 # For mobile development, you might want to allow all origins temporarily
 CORS_ALLOW_ALL_ORIGINS = True
+# get-meal-plan conditional GET (ETag / If-None-Match) web istemcilerinde de çalışsın
+CORS_ALLOW_HEADERS = (*default_headers, 'if-none-match')
+CORS_EXPOSE_HEADERS = ['ETag']
 
 # Add CSRF settings
 CSRF_TRUSTED_ORIGINS = [
@@ -183,6 +187,39 @@ CSRF_TRUSTED_ORIGINS = [
 # OpenAI API Key
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
 
+# Meal plan generation
+# Önce offline üretilmiş şablon kütüphanesine bakılır, uygun şablon yoksa GPT'ye gidilir
+MEALPLAN_USE_TEMPLATES = os.environ.get('MEALPLAN_USE_TEMPLATES', 'True').lower() == 'true'
+# 'gpt' => GPT ile üret, 'native' => GPT'siz katalog + optimizer motoru
+MEALPLAN_ENGINE = os.environ.get('MEALPLAN_ENGINE', 'gpt').lower()
+# GPT yavaş/erişilemez olduğunda native motora düş
+MEALPLAN_NATIVE_FALLBACK = os.environ.get('MEALPLAN_NATIVE_FALLBACK', 'True').lower() == 'true'
+MEALPLAN_GPT_TIMEOUT = float(os.environ.get('MEALPLAN_GPT_TIMEOUT', '90'))
+# 'week' => haftanın tamamı tek MILP modeli, 'day' => her gün ayrı model,
+# 'process' => her gün ayrı model, process pool'da paralel
+MEALPLAN_OPTIMIZER_MODE = os.environ.get('MEALPLAN_OPTIMIZER_MODE', 'week').lower()
+# 'process' modu için havuz boyutu (0 => CPU sayısı); havuz süreç başına bir kez bu boyutta açılır
+MEALPLAN_OPTIMIZER_WORKERS = int(os.environ.get('MEALPLAN_OPTIMIZER_WORKERS', '0'))
+# 'cbc' / 'highs' / 'native' (sadece NumPy hızlı yolu)
+MEALPLAN_SOLVER_BACKEND = os.environ.get('MEALPLAN_SOLVER_BACKEND', 'cbc').lower()
+# Çözüm başına süre sınırı (saniye, 0 => sınırsız) ve göreli MIP gap (0 => çözücü varsayılanı)
+MEALPLAN_SOLVE_TIMEOUT = float(os.environ.get('MEALPLAN_SOLVE_TIMEOUT', '10'))
+MEALPLAN_MIP_GAP = float(os.environ.get('MEALPLAN_MIP_GAP', '0'))
+# Aynı besinler + hedefler için çözülmüş porsiyonları süreç içinde sakla (LRU)
+MEALPLAN_OPTIMIZER_CACHE = os.environ.get('MEALPLAN_OPTIMIZER_CACHE', 'True').lower() == 'true'
+# Küçük günlük problemler önce NumPy ile çözülür, tolerans içinde çözülemezse CBC
+MEALPLAN_OPTIMIZER_FAST_PATH = os.environ.get('MEALPLAN_OPTIMIZER_FAST_PATH', 'True').lower() == 'true'
+# Aktif plan dışında kullanıcı başına saklanacak eski sürüm sayısı (geri alma için); fazlası prune_meal_plans ile silinir
+MEALPLAN_KEEP_VERSIONS = int(os.environ.get('MEALPLAN_KEEP_VERSIONS', '1'))
+# get_meal_plan planın JSON snapshot'ını tek satırdan döner; False => her istekte ORM serializer
+MEALPLAN_SNAPSHOTS = os.environ.get('MEALPLAN_SNAPSHOTS', 'True').lower() == 'true'
+
+# Tracker istatistik yanıtları kullanıcı başına önbellekte tutulur; veri değişince nesil anahtarı ile geçersiz olur.
+# Geçersiz kılma tüm süreçlere (gunicorn worker'ları, cron) ancak paylaşılan bir CACHES backend'i
+# (Redis / Memcached) ile ulaşır; varsayılan LocMem süreç içidir => sadece paylaşılan önbellekle açın.
+TRACKER_STATS_CACHE = os.environ.get('TRACKER_STATS_CACHE', 'False').lower() == 'true'
+TRACKER_STATS_CACHE_TTL = int(os.environ.get('TRACKER_STATS_CACHE_TTL', '300'))
+
 # Logging configuration for Railway
 LOGGING = {
     'version': 1,
@@ -225,5 +262,8 @@ if not DEBUG:
 
 # Cron jobs
 CRONJOBS = [
-    # Add your cron jobs here if any
+    # Eski meal plan sürümlerini gece parça parça sil
+    ('30 3 * * *', 'django.core.management.call_command', ['prune_meal_plans']),
+    # Süresi dolmuş çevrimdışı senkronizasyon idempotency key'lerini sil
+    ('45 3 * * *', 'django.core.management.call_command', ['prune_sync_events']),
 ]
@@ -2,6 +2,7 @@ from django.db import models
 from django.conf import settings
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from django.contrib.auth import get_user_model
 
 class ManualTrackingDay(models.Model):
     user = models.ForeignKey(
@@ -39,63 +40,50 @@ class ManualTrackingEntry(models.Model):
 
 @receiver(post_save, sender=ManualTrackingEntry)
 def update_daily_intake_on_entry_save(sender, instance, **kwargs):
-    """Update the daily intake totals when a manual entry is saved"""
-    from tracker.models import DailyIntake
-    
-    # Get the date from the parent day
-    entry_date = instance.day.date
-    
+    """Sync the entry's net value in the intake ledger (and the daily totals) when it is saved"""
+    from tracker.models import IntakeEvent
+    from tracker.stats_cache import invalidate_user_stats
+    from tracker.utils import set_intake_for_ref
+    from tracker.views import get_or_create_daily_intake
+
+    day = instance.day
     try:
-        # Get or create the daily intake record
-        from tracker.views import get_or_create_daily_intake
-        daily_intake = get_or_create_daily_intake(instance.day.user, entry_date)
-        
-        # Recalculate totals from all manual entries for this day
-        entries = ManualTrackingEntry.objects.filter(day=instance.day)
-        total_calories = sum(e.calories for e in entries)
-        total_protein = sum(e.protein for e in entries)
-        total_carbs = sum(e.carbs for e in entries)
-        total_fats = sum(e.fats for e in entries)
-        
-        # Update the daily intake record
-        daily_intake.actual_calorie = total_calories
-        daily_intake.actual_protein = total_protein
-        daily_intake.actual_carbs = total_carbs
-        daily_intake.actual_fats = total_fats
-        daily_intake.save()
+        # Goal values are seeded from the user's preferences on first creation
+        get_or_create_daily_intake(day.user, day.date)
+        set_intake_for_ref(
+            day.user, day.date, IntakeEvent.SOURCE_MANUAL, instance.id,
+            calories=instance.calories,
+            protein=instance.protein,
+            carbs=instance.carbs,
+            fats=instance.fats
+        )
     except Exception as e:
         print(f"Error updating daily intake: {e}")
+    # Entry lists are part of the cached manual stats even when the macros are unchanged
+    invalidate_user_stats(day.user_id)
 
 
 @receiver(post_delete, sender=ManualTrackingEntry)
 def update_daily_intake_on_entry_delete(sender, instance, **kwargs):
-    """Update the daily intake totals when a manual entry is deleted"""
-    # Similar to post_save, but we need to handle the case where all entries for a day are deleted
-    from tracker.models import DailyIntake
-    
-    # Get the date from the parent day
-    entry_date = instance.day.date
-    day = instance.day
-    
+    """Reverse the entry's net value in the intake ledger when it is deleted"""
+    from tracker.models import IntakeEvent
+    from tracker.stats_cache import invalidate_user_stats
+    from tracker.utils import set_intake_for_ref
+
+    # User deletion cascades to the ledger too; nothing to reverse
+    if isinstance(kwargs.get('origin'), get_user_model()):
+        return
+
+    try:
+        day = instance.day
+    except ManualTrackingDay.DoesNotExist:
+        # Parent day is being deleted in the same cascade
+        day = None
+
     try:
-        # Get the daily intake record
-        daily_intake = DailyIntake.objects.get(user=day.user, date=entry_date)
-        
-        # Recalculate totals from remaining manual entries for this day
-        entries = ManualTrackingEntry.objects.filter(day=day)
-        total_calories = sum(e.calories for e in entries)
-        total_protein = sum(e.protein for e in entries)
-        total_carbs = sum(e.carbs for e in entries)
-        total_fats = sum(e.fats for e in entries)
-        
-        # Update the daily intake record
-        daily_intake.actual_calorie = total_calories
-        daily_intake.actual_protein = total_protein
-        daily_intake.actual_carbs = total_carbs
-        daily_intake.actual_fats = total_fats
-        daily_intake.save()
-    except DailyIntake.DoesNotExist:
-        # This is fine, there's no daily intake to update
-        pass
+        if day is not None:
+            set_intake_for_ref(day.user, day.date, IntakeEvent.SOURCE_MANUAL, instance.id)
     except Exception as e:
-        print(f"Error updating daily intake on delete: {e}")
\ No newline at end of file
+        print(f"Error updating daily intake on delete: {e}")
+    if day is not None:
+        invalidate_user_stats(day.user_id)
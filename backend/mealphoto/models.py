@@ -3,6 +3,7 @@ from django.db import models
 from django.conf import settings
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from django.contrib.auth import get_user_model
 from django.utils import timezone
 from datetime import date
 
@@ -60,99 +61,41 @@ class UserPhotoMeal(models.Model):
 
 @receiver(post_save, sender=UserPhotoMeal)
 def update_daily_intake_on_photo_save(sender, instance, **kwargs):
-    """Update the daily intake totals when a photo meal is saved"""
-    from tracker.models import DailyIntake
+    """Sync the photo meal's net value in the intake ledger (and the daily totals) when it is saved"""
+    from tracker.models import IntakeEvent
+    from tracker.stats_cache import invalidate_user_stats
+    from tracker.utils import set_intake_for_ref
     from tracker.views import get_or_create_daily_intake
-    
+
     try:
-        # Get or create the daily intake record
-        daily_intake = get_or_create_daily_intake(instance.user, instance.date)
-        
-        # Recalculate totals from all entries for this day
-        from mealgpt.models import ManualTrackingDay, ManualTrackingEntry
-        
-        # Get manual tracking entries
-        manual_calories = 0
-        manual_protein = 0
-        manual_carbs = 0
-        manual_fats = 0
-        
-        try:
-            manual_day = ManualTrackingDay.objects.get(user=instance.user, date=instance.date)
-            manual_entries = ManualTrackingEntry.objects.filter(day=manual_day)
-            manual_calories = sum(e.calories for e in manual_entries)
-            manual_protein = sum(e.protein for e in manual_entries)
-            manual_carbs = sum(e.carbs for e in manual_entries)
-            manual_fats = sum(e.fats for e in manual_entries)
-        except ManualTrackingDay.DoesNotExist:
-            pass
-        
-        # Get photo meals for the same day
-        photo_meals = UserPhotoMeal.objects.filter(
-            user=instance.user,
-            date=instance.date
+        # Goal values are seeded from the user's preferences on first creation
+        get_or_create_daily_intake(instance.user, instance.date)
+        set_intake_for_ref(
+            instance.user, instance.date, IntakeEvent.SOURCE_PHOTO, instance.id,
+            calories=instance.calories,
+            protein=instance.protein,
+            carbs=instance.carbs,
+            fats=instance.fats
         )
-        photo_calories = sum(m.calories for m in photo_meals)
-        photo_protein = sum(m.protein for m in photo_meals)
-        photo_carbs = sum(m.carbs for m in photo_meals)
-        photo_fats = sum(m.fats for m in photo_meals)
-        
-        # Update the daily intake record with totals from both sources
-        daily_intake.actual_calorie = manual_calories + photo_calories
-        daily_intake.actual_protein = manual_protein + photo_protein
-        daily_intake.actual_carbs = manual_carbs + photo_carbs
-        daily_intake.actual_fats = manual_fats + photo_fats
-        daily_intake.save()
     except Exception as e:
         print(f"Error updating daily intake from photo meal: {e}")
+    # Photo meal lists are part of the cached manual stats even when the macros are unchanged
+    invalidate_user_stats(instance.user_id)
 
 
 @receiver(post_delete, sender=UserPhotoMeal)
 def update_daily_intake_on_photo_delete(sender, instance, **kwargs):
-    """Update the daily intake totals when a photo meal is deleted"""
-    from tracker.models import DailyIntake
-    
+    """Reverse the photo meal's net value in the intake ledger when it is deleted"""
+    from tracker.models import IntakeEvent
+    from tracker.stats_cache import invalidate_user_stats
+    from tracker.utils import set_intake_for_ref
+
+    # User deletion cascades to the ledger too; nothing to reverse
+    if isinstance(kwargs.get('origin'), get_user_model()):
+        return
+
     try:
-        # Get the daily intake record
-        daily_intake = DailyIntake.objects.get(user=instance.user, date=instance.date)
-        
-        # Recalculate totals from all entries for this day
-        from mealgpt.models import ManualTrackingDay, ManualTrackingEntry
-        
-        # Get manual tracking entries
-        manual_calories = 0
-        manual_protein = 0
-        manual_carbs = 0
-        manual_fats = 0
-        
-        try:
-            manual_day = ManualTrackingDay.objects.get(user=instance.user, date=instance.date)
-            manual_entries = ManualTrackingEntry.objects.filter(day=manual_day)
-            manual_calories = sum(e.calories for e in manual_entries)
-            manual_protein = sum(e.protein for e in manual_entries)
-            manual_carbs = sum(e.carbs for e in manual_entries)
-            manual_fats = sum(e.fats for e in manual_entries)
-        except ManualTrackingDay.DoesNotExist:
-            pass
-        
-        # Get remaining photo meals for the same day
-        photo_meals = UserPhotoMeal.objects.filter(
-            user=instance.user,
-            date=instance.date
-        ).exclude(id=instance.id)
-        photo_calories = sum(m.calories for m in photo_meals)
-        photo_protein = sum(m.protein for m in photo_meals)
-        photo_carbs = sum(m.carbs for m in photo_meals)
-        photo_fats = sum(m.fats for m in photo_meals)
-        
-        # Update the daily intake record with totals from both sources
-        daily_intake.actual_calorie = manual_calories + photo_calories
-        daily_intake.actual_protein = manual_protein + photo_protein
-        daily_intake.actual_carbs = manual_carbs + photo_carbs
-        daily_intake.actual_fats = manual_fats + photo_fats
-        daily_intake.save()
-    except DailyIntake.DoesNotExist:
-        # This is fine, there's no daily intake to update
-        pass
+        set_intake_for_ref(instance.user, instance.date, IntakeEvent.SOURCE_PHOTO, instance.id)
     except Exception as e:
         print(f"Error updating daily intake on photo delete: {e}")
+    invalidate_user_stats(instance.user_id)
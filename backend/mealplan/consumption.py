@@ -0,0 +1,92 @@
+# mealplan/consumption.py
+
+from django.db import transaction
+from django.db.models import Q
+
+from mealplan.models import Food, Meal
+from mealplan.plan_snapshot import patch_snapshot_consumed
+from tracker.models import IntakeEvent
+from tracker.utils import record_intake_batch
+
+
+def apply_consumption(user, foods: dict = None, meals: dict = None, day=None, intake_date=None) -> dict:
+    """
+    Tüketim işaretlerini küme bazlı uygular (mark_food / mark_meal / bulk_update ortak yolu).
+    foods => {food_id: consumed}, meals => {meal_id: consumed}; öğün durumu içindeki
+    tüm besinlere uygulanır ve aynı besin için tekil değerin önüne geçer.
+    day => sadece o Day'in kayıtları, intake_date => tracker'a yazılacak tarih (varsayılan: planın günü).
+
+    Hedef satırlar tek sorguda kilitlenerek yüklenir, sadece durumu değişenler
+    bulk_update edilir ve her tarih için tek birleştirilmiş makro farkı yazılır.
+    id'ler int'e çevrilir (geçersizse ValueError / TypeError).
+    Dönüş: {"foods": {id: Food}, "meals": {id: Meal}, "changed_foods": {...}, "changed_meals": {...}}
+    """
+    foods = {int(k): v for k, v in (foods or {}).items()}
+    meals = {int(k): v for k, v in (meals or {}).items()}
+    result = {"foods": {}, "meals": {}, "changed_foods": {}, "changed_meals": {}}
+    if not foods and not meals:
+        return result
+
+    scope = {"meal__day__meal_plan__user": user, "meal__day__meal_plan__is_active": True}
+    if day is not None:
+        scope["meal__day"] = day
+
+    with transaction.atomic():
+        meal_rows = []
+        if meals:
+            meal_rows = list(
+                Meal.objects.select_for_update(of=('self',))
+                .select_related('day')
+                .filter(id__in=meals.keys(), **{k.removeprefix('meal__'): v for k, v in scope.items()})
+            )
+        meal_ids = [m.id for m in meal_rows]
+
+        food_rows = list(
+            Food.objects.select_for_update(of=('self',))
+            .select_related('meal__day')
+            .filter(Q(id__in=foods.keys()) | Q(meal_id__in=meal_ids), **scope)
+            .order_by('id')
+        )
+
+        # Öğün durumu, içindeki besinlerin hedef durumunu belirler
+        targets = {fd.id: bool(foods[fd.id]) for fd in food_rows if fd.id in foods}
+        foods_by_meal = {}
+        for fd in food_rows:
+            foods_by_meal.setdefault(fd.meal_id, []).append(fd)
+        for meal in meal_rows:
+            meal_state = bool(meals[meal.id])
+            for fd in foods_by_meal.get(meal.id, []):
+                targets[fd.id] = meal_state
+            if meal.consumed != meal_state:
+                meal.consumed = meal_state
+                result["changed_meals"][meal.id] = meal_state
+
+        flipped = [fd for fd in food_rows if fd.consumed != targets[fd.id]]
+        intake_items = []
+        for fd in flipped:
+            fd.consumed = targets[fd.id]
+            sign = 1.0 if fd.consumed else -1.0
+            intake_items.append({
+                "date": intake_date or fd.meal.day.date,
+                "ref_id": fd.id,
+                "calories": sign * (fd.calories or 0.0),
+                "protein": sign * (fd.protein or 0.0),
+                "carbs": sign * (fd.carbs or 0.0),
+                "fats": sign * (fd.fats or 0.0),
+            })
+            result["changed_foods"][fd.id] = fd.consumed
+
+        if flipped:
+            Food.objects.bulk_update(flipped, ['consumed'])
+        if result["changed_meals"]:
+            Meal.objects.bulk_update([m for m in meal_rows if m.id in result["changed_meals"]], ['consumed'])
+
+        record_intake_batch(user, intake_items, source=IntakeEvent.SOURCE_PLAN_FOOD)
+
+        if result["changed_foods"] or result["changed_meals"]:
+            plan_id = (meal_rows or [fd.meal for fd in food_rows])[0].day.meal_plan_id
+            patch_snapshot_consumed(plan_id, foods=result["changed_foods"], meals=result["changed_meals"])
+
+    result["foods"] = {fd.id: fd for fd in food_rows}
+    result["meals"] = {m.id: m for m in meal_rows}
+    return result
@@ -36,7 +36,8 @@ def load_yemekler():
             'porsiyon_metrik': item.metric_amount,
             'ana_bilesenler': item.main_ingredients,
             'tarif': item.recipe,
-            'maksimum_porsiyon': item.max_portion
+            'maksimum_porsiyon': item.max_portion,
+            'ogun_etiketleri': item.meal_tags
         })
     
     return food_items
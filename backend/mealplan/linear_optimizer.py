@@ -1,95 +1,708 @@
 # mealplan/linear_optimizer.py
 
-import pandas as pd
+import hashlib
+import math
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
 
-def solve_meal_plan_with_pulp(df_one_day, kcal_target, prot_target, carb_target, fat_target,
-                              kcal_tol=0.05, prot_tol=0.1, carb_tol=0.1, fat_tol=0.1):
+import numpy as np
+
+# Optimizer PlanRow listeleri (mealplan.plan_rows) üzerinde çalışır; porsiyonlar
+# başarılı çözümde satırlara yerinde yazılır, başarısızsa satırlara dokunulmaz.
+
+# Hedef aralığın dışına çıkmanın (slack) amaç fonksiyonundaki ağırlıkları
+SLACK_WEIGHTS = {"kcal": 1.8, "prot": 1.5, "carb": 1.5, "fat": 1.5}
+MACRO_KEYS = ["kcal", "prot", "carb", "fat"]
+# Günlük hedef toleransları (solve_* fonksiyonlarının varsayılanlarıyla aynı)
+DEFAULT_TOLERANCES = {"kcal": 0.05, "prot": 0.1, "carb": 0.1, "fat": 0.1}
+
+# 'cbc' / 'highs' => PuLP üzerinden MILP çözücü, 'native' => sadece NumPy hızlı yolu
+SOLVER_BACKENDS = ('cbc', 'highs', 'native')
+
+# Süreç başına saklanan çözülmüş porsiyon vektörü sayısı (LRU)
+PORTION_CACHE_SIZE = 4096
+
+# NumPy hızlı yolu bu kadar değişkene kadar denenir; daha büyük problemler doğrudan CBC'ye
+FAST_PATH_MAX_VARS = 40
+FAST_PATH_MAX_SWEEPS = 50
+
+
+def _day_arrays(rows):
+    """
+    Günün porsiyon sınırlarını, mevcut porsiyonlarını ve makro katsayılarını
+    tek geçişte NumPy dizileri olarak döner.
+    Dönüş: (mp, st, maxp, ub, coef, current) => coef (n x 4), sütunlar MACRO_KEYS sırasında.
+    """
+    values = np.array([
+        (r.minimum_porsiyon_boyutu, r.porsiyon_artis_birimi, r.maksimum_porsiyon_adedi, r.porsiyon_adedi,
+         r.kalori, r.protein, r.karbonhidrat, r.yag)
+        for r in rows
+    ], dtype=float).reshape(-1, 8)
+    mp, st, maxp, current = values[:, 0], values[:, 1], values[:, 2], values[:, 3]
+    st = np.where(st <= 0, 1.0, st)
+    ub = np.maximum(np.rint((maxp - mp) / st), 0).astype(int)
+    return mp, st, maxp, ub, values[:, 4:], current
+
+
+def _write_portions(rows, portions):
+    for row, portion in zip(rows, portions.tolist()):
+        row.porsiyon_adedi = portion
+
+
+# ---------------------------------------------------------------------------
+# Çözüm cache'i => aynı besinler + sınırlar + hedefler => aynı porsiyonlar
+# ---------------------------------------------------------------------------
+_PORTION_CACHE = OrderedDict()
+_PORTION_CACHE_LOCK = threading.Lock()
+
+
+def problem_key(rows, arrays, targets, tols, solver=()):
+    """
+    Problemin kanonik hash'i: (yemek_id, min, artış, max, makrolar) satırları sıralanır,
+    hedefler, toleranslar ve çözücü ayarları (backend, time_limit, mip_gap) eklenir.
+    Dönüş: (key, order) => order, satırların kanonik sıradaki yeri
+    (aynı besinler farklı sırada gelse de aynı key).
+    """
+    mp, st, maxp, _, coef, _ = arrays
+    ids = np.array([-1 if r.yemek_id is None else r.yemek_id for r in rows], dtype=float)
+    table = np.round(np.column_stack([ids, mp, st, maxp, coef]), 6)
+    order = np.lexsort(table.T[::-1])
+    params = np.array([targets[k] for k in MACRO_KEYS] + [tols[k] for k in MACRO_KEYS], dtype=float)
+
+    digest = hashlib.sha1(np.ascontiguousarray(table[order]).tobytes())
+    digest.update(np.round(params, 6).tobytes())
+    digest.update(":".join(str(p) for p in solver).encode())
+    return digest.hexdigest(), order
+
+
+def _cache_get(key, order):
+    with _PORTION_CACHE_LOCK:
+        entry = _PORTION_CACHE.get(key)
+        if entry is None:
+            return None
+        _PORTION_CACHE.move_to_end(key)
+    canonical, objective = entry
+    portions = np.empty(len(order))
+    portions[order] = canonical
+    return portions, objective
+
+
+def _cache_put(key, order, portions, objective):
+    entry = (np.asarray(portions, dtype=float)[order], objective)
+    with _PORTION_CACHE_LOCK:
+        _PORTION_CACHE[key] = entry
+        _PORTION_CACHE.move_to_end(key)
+        while len(_PORTION_CACHE) > PORTION_CACHE_SIZE:
+            _PORTION_CACHE.popitem(last=False)
+
+
+def clear_portion_cache():
+    with _PORTION_CACHE_LOCK:
+        _PORTION_CACHE.clear()
+
+
+def cached_day(rows, targets, tols, metrics=None, solver=()):
+    """
+    Aynı problem aynı çözücü ayarlarıyla daha önce çözüldüyse porsiyonları satırlara yazar
+    (solver çalışmaz). solver => (backend, time_limit, mip_gap).
+    Dönüş: (hit, key, order) => key/order store_day için.
+    """
+    t0 = time.perf_counter()
+    arrays = _day_arrays(rows)
+    key, order = problem_key(rows, arrays, targets, tols, solver)
+    hit = _cache_get(key, order)
+    if hit is None:
+        return False, key, order
+
+    portions, objective = hit
+    _write_portions(rows, portions)
+    _record_metrics(metrics, {
+        "label": _day_label(rows),
+        "backend": "cache",
+        "status": "Optimal",
+        "wall_ms": (time.perf_counter() - t0) * 1000,
+        "objective": objective,
+        "gap": 0.0 if objective <= 0 else None,
+    }, log=False)
+    return True, key, order
+
+
+def store_day(key, order, rows, targets, tols):
+    """
+    Çözülmüş günü cache'e yazar; amaç değeri porsiyonlardan yeniden hesaplanır.
+    Sadece kanıtlanmış çözümler yazılmalı (sertifikalı hızlı yol veya optimal MILP);
+    süre sınırında kalan çözüm kalıcı olarak cache'lenmez.
+    """
+    _, _, _, _, coef, current = _day_arrays(rows)
+    lower, upper, weights = _target_bounds(targets, tols)
+    objective = float(_slack_objective(current @ coef, lower, upper, weights))
+    _cache_put(key, order, current, objective)
+
+
+def _target_bounds(targets, tols):
+    lower = np.array([targets[k]*(1.0 - tols[k]) for k in MACRO_KEYS])
+    upper = np.array([targets[k]*(1.0 + tols[k]) for k in MACRO_KEYS])
+    weights = np.array([SLACK_WEIGHTS[k] for k in MACRO_KEYS])
+    return lower, upper, weights
+
+
+def _slack_objective(totals, lower, upper, weights):
+    """
+    CBC modeliyle aynı amaç: hedef aralığın dışına taşan miktarların ağırlıklı toplamı.
+    totals (..., 4) şeklinde olabilir.
+    """
+    viol = np.maximum(lower - totals, 0) + np.maximum(totals - upper, 0)
+    return viol @ weights
+
+
+def solve_portions_numpy(mp, st, ub, coef, lower, upper, weights, y0=None):
+    """
+    Sınırlı tamsayı koordinat inişi: her adımda bir besinin tüm porsiyon
+    basamakları denenir, amaç düşmeyene kadar tekrarlanır.
+    y0 => başlangıç (örn. mevcut porsiyonlar). Dönüş: (y, objective);
+    objective == 0 ise tüm makrolar tolerans içinde => CBC ile aynı kalitede (optimal).
+    """
+    n = len(mp)
+    starts = [np.zeros(n, dtype=int), ub // 2]
+    if y0 is not None:
+        starts.insert(0, np.clip(y0, 0, ub).astype(int))
+
+    best_y, best_obj = None, np.inf
+    for y in starts:
+        y = y.copy()
+        totals = (mp + st*y) @ coef
+        obj = _slack_objective(totals, lower, upper, weights)
+        for _ in range(FAST_PATH_MAX_SWEEPS):
+            improved = False
+            for i in range(n):
+                if obj <= 0:
+                    break
+                if ub[i] == 0:
+                    continue
+                base = totals - (mp[i] + st[i]*y[i]) * coef[i]
+                cand = mp[i] + st[i]*np.arange(ub[i] + 1)
+                cand_obj = _slack_objective(base + cand[:, None]*coef[i], lower, upper, weights)
+                j = int(np.argmin(cand_obj))
+                if cand_obj[j] < obj - 1e-9:
+                    y[i] = j
+                    totals = base + cand[j]*coef[i]
+                    obj = cand_obj[j]
+                    improved = True
+            if obj <= 0 or not improved:
+                break
+        if obj < best_obj:
+            best_y, best_obj = y, obj
+        if best_obj <= 0:
+            break
+    return best_y, float(best_obj)
+
+
+def solve_day_fast(rows, targets, tols, metrics=None):
+    """
+    Küçük problemler için CBC'siz çözüm. Hepsi tolerans içindeyse (sertifikalı)
+    porsiyonları satırlara yazıp True döner, aksi halde False => CBC'ye düşülmeli.
+    """
+    if not rows or len(rows) > FAST_PATH_MAX_VARS:
+        return False
+    t0 = time.perf_counter()
+    mp, st, _, ub, coef, current = _day_arrays(rows)
+    lower, upper, weights = _target_bounds(targets, tols)
+    y0 = np.rint((current - mp) / st)
+    y, obj = solve_portions_numpy(mp, st, ub, coef, lower, upper, weights, y0=y0)
+    _record_metrics(metrics, {
+        "label": _day_label(rows),
+        "backend": "native",
+        "status": "Optimal" if obj <= 0 else "Not Certified",
+        "wall_ms": (time.perf_counter() - t0) * 1000,
+        "objective": obj,
+        "gap": 0.0 if obj <= 0 else None,
+    }, log=False)
+    if obj > 0:
+        return False
+    _write_portions(rows, mp + st*y)
+    return True
+
+
+def fit_day_portions(rows, targets, tols=None):
+    """
+    NumPy çözücünün bulduğu en iyi porsiyonları (tolerans içinde olmasa da) satırlara yazar.
+    Seçim aşamasında besin kümesinin hedeflere uyup uymadığını ölçmek için (native_planner);
+    yazılan porsiyonlar sonraki optimizasyonun başlangıç noktası olur.
+    Dönüş: amaç değeri => 0 ise tüm makrolar tolerans içinde.
+    """
+    if not rows:
+        return math.inf
+    tols = tols or DEFAULT_TOLERANCES
+    mp, st, _, ub, coef, current = _day_arrays(rows)
+    lower, upper, weights = _target_bounds(targets, tols)
+    y, obj = solve_portions_numpy(mp, st, ub, coef, lower, upper, weights, y0=np.rint((current - mp) / st))
+    _write_portions(rows, mp + st*y)
+    return obj
+
+
+def _add_day_to_problem(prob, arrays, prefix, targets, tols):
+    """
+    Bir günün porsiyon değişkenlerini, makro kısıtlarını ve slack'lerini prob'a ekler.
+    arrays => _day_arrays çıktısı; katsayılar doğrudan dizilerden, tek geçişte kurulur.
+    targets/tols => {"kcal": .., "prot": .., "carb": .., "fat": ..}
+    Dönüş: (y_vars, totals, objective) => y_vars satır sırasında liste, totals günlük
+    makro ifadeleri, objective bu günün ağırlıklı slack toplamı.
+    """
+    from pulp import LpVariable, LpAffineExpression, lpSum, LpInteger
+
+    mp, st, _, ub, coef, _ = arrays
+    y_vars = [
+        LpVariable(f"{prefix}y_{i}", lowBound=0, upBound=int(ub[i]), cat=LpInteger)
+        for i in range(len(mp))
+    ]
+
+    # x_i = mp_i + st_i*y_i => toplam_k = sum(mp*coef_k) + sum(st*coef_k * y)
+    constants = mp @ coef
+    step_coef = st[:, None] * coef
+
+    totals = {}
+    objective = []
+    for k, key in enumerate(MACRO_KEYS):
+        total = LpAffineExpression(zip(y_vars, step_coef[:, k].tolist()), constant=float(constants[k]))
+        lower = targets[key]*(1.0 - tols[key])
+        upper = targets[key]*(1.0 + tols[key])
+
+        # Slack variables
+        s_plus = LpVariable(f"{prefix}Splus_{key}", lowBound=0)
+        s_minus = LpVariable(f"{prefix}Sminus_{key}", lowBound=0)
+        prob += (total >= lower - s_minus)
+        prob += (total <= upper + s_plus)
+
+        totals[key] = total
+        objective.append(SLACK_WEIGHTS[key]*(s_plus + s_minus))
+
+    return y_vars, totals, lpSum(objective)
+
+
+def _solved_portions(arrays, y_vars):
+    """
+    Çözümden porsiyon dizisi => [min, max] aralığında, satır sırasında.
+    """
+    mp, st, maxp, ub, _, _ = arrays
+    y = np.array([v.varValue or 0 for v in y_vars], dtype=float)
+    return np.minimum(np.maximum(mp + st*np.clip(y, 0, ub), mp), maxp)
+
+
+def _day_label(rows):
+    return f"day {rows[0].day_index}" if rows else "Unknown day"
+
+
+def _record_metrics(metrics, entry, log=True):
+    if log:
+        gap = "?" if entry["gap"] is None else f"{entry['gap']:.4f}"
+        objective = "?" if entry["objective"] is None else f"{entry['objective']:.4f}"
+        print(f"[solver] {entry['label']} backend={entry['backend']} status={entry['status']} "
+              f"wall={entry['wall_ms']:.1f}ms gap={gap} objective={objective}")
+    if metrics is not None:
+        metrics.append(entry)
+
+
+def _make_solver(backend, time_limit=None, mip_gap=None, warm_start=False):
+    """
+    PuLP çözücüsünü seçer; HiGHS kurulu değilse CBC'ye düşer.
+    """
+    import pulp
+
+    options = {"msg": False}
+    if time_limit:
+        options["timeLimit"] = time_limit
+    if mip_gap is not None:
+        options["gapRel"] = mip_gap
+
+    if backend == 'highs':
+        for name in ('HiGHS', 'HiGHS_CMD'):
+            solver = pulp.getSolver(name, **options)
+            if solver.available():
+                return solver
+        print("[linear_optimizer] HiGHS bulunamadı, CBC kullanılıyor.")
+    return pulp.PULP_CBC_CMD(warmStart=warm_start, **options)
+
+
+def _set_warm_start(arrays, y_vars):
+    """
+    Başlangıç çözümü => mevcut (GPT'nin önerdiği) porsiyonlar, basamağa yuvarlanmış.
+    """
+    mp, st, _, ub, _, current = arrays
+    y0 = np.clip(np.rint((current - mp) / st), 0, ub).astype(int)
+    for var, val in zip(y_vars, y0.tolist()):
+        var.setInitialValue(val)
+
+
+def _achieved_gap(prob, objective):
+    """
+    Çözücünün en iyi alt sınırına (dual bound) göre göreli gap: (amaç - sınır) / |amaç|.
+    Sınırı sadece HiGHS'in Python API'si (highspy) veriyor; CBC / HiGHS_CMD => None.
+    """
+    model = getattr(prob, 'solverModel', None)
+    if model is None or not hasattr(model, 'getInfo'):
+        return None
+    bound = model.getInfo().mip_dual_bound
+    if not math.isfinite(bound):
+        return None
+    return max(0.0, objective - bound) / abs(objective)
+
+
+def _run_solver(prob, label, backend='cbc', time_limit=None, mip_gap=None, warm_start=False, metrics=None):
+    """
+    prob'u seçilen backend ile çözer, durum / süre / gap / amaç değerini loglar.
+    gap => amaç alt sınırı 0 olduğundan amaç 0 ise kanıtlanmış optimum (0); aksi halde
+    çözücünün en iyi alt sınırından hesaplanan gerçek gap (_achieved_gap), sınır yoksa None.
+    CBC süre sınırında durunca da status "Optimal" döner; o yüzden kanıt sol_status'tan okunur.
+    Dönüş: (ok, proven) => ok: çözüm kullanılabilir mi,
+    proven: optimal mi (sol_status optimal veya amaç 0) => sadece bu durumda cache'lenir.
+    """
+    from pulp import LpStatus, LpSolutionOptimal, value
+
+    solver = _make_solver(backend, time_limit, mip_gap, warm_start)
+    t0 = time.perf_counter()
+    prob.solve(solver)
+    wall_ms = (time.perf_counter() - t0) * 1000
+
+    status = LpStatus[prob.status]
+    objective = value(prob.objective)
+    if objective is None:
+        gap = None
+    elif objective <= 1e-9:
+        gap = 0.0
+    else:
+        gap = _achieved_gap(prob, objective)
+    _record_metrics(metrics, {
+        "label": label,
+        "backend": 'highs' if 'HiGHS' in solver.name else 'cbc',
+        "status": status,
+        "wall_ms": wall_ms,
+        "objective": objective,
+        "gap": gap,
+    })
+    ok = status == "Optimal"
+    proven = ok and (prob.sol_status == LpSolutionOptimal or (objective is not None and objective <= 1e-9))
+    return ok, proven
+
+
+def _solve_day_milp(day_rows, targets, tols, backend='cbc', time_limit=None, mip_gap=None, metrics=None):
+    """
+    Tek günü MILP çözücüyle çözer, başarılıysa porsiyonları satırlara yazar.
+    Dönüş: (ok, proven) => _run_solver ile aynı
+    """
     try:
-        from pulp import LpProblem, LpMinimize, LpVariable, lpSum, LpStatus, value, LpInteger
+        from pulp import LpProblem, LpMinimize
     except ImportError:
         print("[solve_meal_plan_with_pulp] pulp not installed!")
-        return df_one_day, False
+        return False, False
 
-    print("[solve_meal_plan_with_pulp] => day name =>",
-          df_one_day['day_index'].iloc[0] if not df_one_day.empty else "Unknown day")
+    print("[solve_meal_plan_with_pulp] => day name =>", day_rows[0].day_index)
 
     prob = LpProblem("MealPlanOptimize", LpMinimize)
 
-    day_df = df_one_day.copy().reset_index(drop=True)
-    y_vars = {}
-    for i, row in day_df.iterrows():
-        mp = row['minimum_porsiyon_boyutu']
-        st = row['porsiyon_artıs_birimi']
-        if st <= 0:
-            st = 1.0
-        maxp = row['maksimum_porsiyon_adedi']
-        upbound = int(round((maxp - mp)/st))
-        if upbound < 0:
-            upbound = 0
-        var = LpVariable(f"y_{i}", lowBound=0, upBound=upbound, cat=LpInteger)
-        y_vars[i] = var
-
-    def x_expr(i):
-        r = day_df.loc[i]
-        mp = r['minimum_porsiyon_boyutu']
-        st = r['porsiyon_artıs_birimi']
-        if st <= 0:
-            st = 1.0
-        return mp + st*y_vars[i]
-
-    total_kcal = lpSum([x_expr(i)* day_df.loc[i,'kalori (kcal)'] for i in day_df.index])
-    total_prot = lpSum([x_expr(i)* day_df.loc[i,'protein (g)'] for i in day_df.index])
-    total_carb = lpSum([x_expr(i)* day_df.loc[i,'karbonhidrat (g)'] for i in day_df.index])
-    total_fat  = lpSum([x_expr(i)* day_df.loc[i,'yag (g)'] for i in day_df.index])
-
-    kcal_LB = kcal_target*(1.0 - kcal_tol)
-    kcal_UB = kcal_target*(1.0 + kcal_tol)
-    prot_LB = prot_target*(1.0 - prot_tol)
-    prot_UB = prot_target*(1.0 + prot_tol)
-    carb_LB = carb_target*(1.0 - carb_tol)
-    carb_UB = carb_target*(1.0 + carb_tol)
-    fat_LB  = fat_target*(1.0 - fat_tol)
-    fat_UB  = fat_target*(1.0 + fat_tol)
-
-    # Slack variables
-    Splus_kcal   = LpVariable("Splus_kcal", lowBound=0)
-    Sminus_kcal  = LpVariable("Sminus_kcal", lowBound=0)
-    Splus_prot   = LpVariable("Splus_prot", lowBound=0)
-    Sminus_prot  = LpVariable("Sminus_prot", lowBound=0)
-    Splus_carb   = LpVariable("Splus_carb", lowBound=0)
-    Sminus_carb  = LpVariable("Sminus_carb", lowBound=0)
-    Splus_fat    = LpVariable("Splus_fat", lowBound=0)
-    Sminus_fat   = LpVariable("Sminus_fat", lowBound=0)
-
-    prob += (total_kcal >= kcal_LB - Sminus_kcal)
-    prob += (total_kcal <= kcal_UB + Splus_kcal)
-    prob += (total_prot >= prot_LB - Sminus_prot)
-    prob += (total_prot <= prot_UB + Splus_prot)
-    prob += (total_carb >= carb_LB - Sminus_carb)
-    prob += (total_carb <= carb_UB + Splus_carb)
-    prob += (total_fat  >= fat_LB  - Sminus_fat)
-    prob += (total_fat  <= fat_UB  + Splus_fat)
-
-    prob += (1.8*(Splus_kcal + Sminus_kcal)
-             +1.5*(Splus_prot + Sminus_prot)
-             +1.5*(Splus_carb + Sminus_carb)
-             +1.5*(Splus_fat  + Sminus_fat))
-
-    prob.solve()
-    print("pulp => status:", LpStatus[prob.status])
-
-    if LpStatus[prob.status] != "Optimal":
-        return day_df, False
-
-    for i in day_df.index:
-        y_val = value(y_vars[i]) or 0
-        mp = day_df.loc[i,'minimum_porsiyon_boyutu']
-        st = day_df.loc[i,'porsiyon_artıs_birimi']
-        if st <= 0:
-            st = 1.0
-        newp = mp + st*y_val
-        newp = max(mp, newp)
-        newp = min(day_df.loc[i,'maksimum_porsiyon_adedi'], newp)
-        day_df.at[i,'porsiyon_adedi'] = newp
-
-    return day_df, True
+    arrays = _day_arrays(day_rows)
+    y_vars, _, objective = _add_day_to_problem(prob, arrays, "", targets, tols)
+    prob += objective
+    _set_warm_start(arrays, y_vars)
+
+    ok, proven = _run_solver(prob, _day_label(day_rows), backend, time_limit, mip_gap, warm_start=True, metrics=metrics)
+    if ok:
+        _write_portions(day_rows, _solved_portions(arrays, y_vars))
+    return ok, proven
+
+
+def solve_meal_plan_with_pulp(day_rows, kcal_target, prot_target, carb_target, fat_target,
+                              kcal_tol=0.05, prot_tol=0.1, carb_tol=0.1, fat_tol=0.1, time_limit=None,
+                              fast_path=True, backend='cbc', mip_gap=None, metrics=None,
+                              use_cache=True):
+    """
+    Tek günün satırlarını (PlanRow listesi) optimize eder. Dönüş: (day_rows, ok).
+    use_cache => aynı problem daha önce çözüldüyse çözücü hiç çalışmaz (problem_key).
+    fast_path => önce NumPy çözücü denenir; tolerans içinde sonuç bulamazsa MILP çözücü çalışır.
+    backend => 'cbc' / 'highs' / 'native' (sadece NumPy, MILP çözücü hiç çalışmaz).
+    time_limit / mip_gap => çözücü başına süre sınırı (sn) ve göreli MIP gap.
+    MILP çözücü mevcut porsiyonlardan warm start ile başlar.
+    metrics => verilirse her çözümün metrik sözlüğü bu listeye eklenir.
+    """
+    targets = {"kcal": kcal_target, "prot": prot_target, "carb": carb_target, "fat": fat_target}
+    tols = {"kcal": kcal_tol, "prot": prot_tol, "carb": carb_tol, "fat": fat_tol}
+    if not day_rows:
+        return day_rows, False
+
+    key = None
+    if use_cache:
+        hit, key, order = cached_day(day_rows, targets, tols, metrics, (backend, time_limit, mip_gap))
+        if hit:
+            return day_rows, True
+
+    if fast_path or backend == 'native':
+        if solve_day_fast(day_rows, targets, tols, metrics):
+            if key is not None:
+                store_day(key, order, day_rows, targets, tols)
+            return day_rows, True
+    if backend == 'native':
+        return day_rows, False
+
+    ok, proven = _solve_day_milp(day_rows, targets, tols, backend, time_limit, mip_gap, metrics)
+    if proven and key is not None:
+        store_day(key, order, day_rows, targets, tols)
+    return day_rows, ok
+
+
+def solve_week(week_rows, kcal_target, prot_target, carb_target, fat_target,
+               kcal_tol=0.05, prot_tol=0.1, carb_tol=0.1, fat_tol=0.1, weekly_tol=None,
+               fast_path=True, backend='cbc', time_limit=None, mip_gap=None, metrics=None,
+               use_cache=True):
+    """
+    Haftanın tüm günlerini tek modelde, tek solver çağrısıyla optimize eder
+    (model kurma + CBC süreci 7 kez yerine 1 kez).
+    weekly_tol verilirse haftalık ortalama için de slack'li kısıtlar eklenir.
+    fast_path => günler bağımsızsa (weekly_tol yok) önce NumPy çözücü denenir,
+    sadece tolerans içinde çözülemeyen günler CBC modeline girer.
+    backend / time_limit / mip_gap / metrics / use_cache => solve_meal_plan_with_pulp ile aynı
+    (cache günler bağımsızken kullanılır).
+    Tek model çözülemezse günler tek tek solve_meal_plan_with_pulp ile çözülür.
+    Dönüş: (week_rows, {day_index: ok}); optimize edilemeyen gün orijinal porsiyonlarıyla kalır.
+    """
+    days = {}
+    for row in week_rows:
+        days.setdefault(row.day_index, []).append(row)
+    targets = {"kcal": kcal_target, "prot": prot_target, "carb": carb_target, "fat": fat_target}
+    tols = {"kcal": kcal_tol, "prot": prot_tol, "carb": carb_tol, "fat": fat_tol}
+
+    statuses = {}
+    day_keys = {}
+    if use_cache and weekly_tol is None:
+        for d, rows in days.items():
+            hit, key, order = cached_day(rows, targets, tols, metrics, (backend, time_limit, mip_gap))
+            if hit:
+                statuses[d] = True
+            else:
+                day_keys[d] = (key, order)
+
+    if (fast_path and weekly_tol is None) or backend == 'native':
+        for d, rows in days.items():
+            if d in statuses:
+                continue
+            if solve_day_fast(rows, targets, tols, metrics):
+                statuses[d] = True
+                if d in day_keys:
+                    store_day(*day_keys[d], rows, targets, tols)
+    cbc_days = [d for d in days if d not in statuses]
+    if backend == 'native':
+        statuses.update({d: False for d in cbc_days})
+        return week_rows, statuses
+    if not cbc_days:
+        return week_rows, statuses
+
+    try:
+        from pulp import LpProblem, LpMinimize, LpVariable, lpSum
+    except ImportError:
+        print("[solve_week] pulp not installed!")
+        statuses.update({d: False for d in cbc_days})
+        return week_rows, statuses
+
+    prob = LpProblem("WeekMealPlanOptimize", LpMinimize)
+    day_arrays = {}
+    day_vars = {}
+    objective = []
+    week_totals = {key: [] for key in MACRO_KEYS}
+    for d in cbc_days:
+        arrays = _day_arrays(days[d])
+        y_vars, totals, day_objective = _add_day_to_problem(prob, arrays, f"d{d}_", targets, tols)
+        _set_warm_start(arrays, y_vars)
+        day_arrays[d] = arrays
+        day_vars[d] = y_vars
+        objective.append(day_objective)
+        for key, total in totals.items():
+            week_totals[key].append(total)
+
+    if weekly_tol is not None:
+        # Haftalık ortalama => günlerin toplamı n_gün * hedef etrafında olmalı
+        n_days = len(cbc_days)
+        for key, totals in week_totals.items():
+            total = lpSum(totals)
+            s_plus = LpVariable(f"W_Splus_{key}", lowBound=0)
+            s_minus = LpVariable(f"W_Sminus_{key}", lowBound=0)
+            prob += (total >= n_days*targets[key]*(1.0 - weekly_tol) - s_minus)
+            prob += (total <= n_days*targets[key]*(1.0 + weekly_tol) + s_plus)
+            objective.append(SLACK_WEIGHTS[key]*(s_plus + s_minus))
+
+    prob += lpSum(objective)
+    ok, proven = _run_solver(prob, f"week {cbc_days}", backend, time_limit, mip_gap, warm_start=True, metrics=metrics)
+
+    if ok:
+        for d in cbc_days:
+            _write_portions(days[d], _solved_portions(day_arrays[d], day_vars[d]))
+            statuses[d] = True
+            if proven and d in day_keys:
+                store_day(*day_keys[d], days[d], targets, tols)
+        return week_rows, statuses
+
+    # Fallback => gün gün
+    for d in cbc_days:
+        _, ok_status = solve_meal_plan_with_pulp(
+            days[d], kcal_target, prot_target, carb_target, fat_target,
+            kcal_tol, prot_tol, carb_tol, fat_tol, time_limit=time_limit,
+            fast_path=False, backend=backend, mip_gap=mip_gap, metrics=metrics,
+            use_cache=use_cache and weekly_tol is None
+        )
+        statuses[d] = ok_status
+
+    return week_rows, statuses
+
+
+# ---------------------------------------------------------------------------
+# Process pool => günleri paralel çözme
+# ---------------------------------------------------------------------------
+_POOL = None
+_POOL_WORKERS = 0
+_POOL_LOCK = threading.Lock()
+# Havuz kuyruğu + süreç arası veri taşıma için solver süre sınırına eklenen pay
+SOLVE_TIMEOUT_GRACE = 2.0
+
+
+def _get_pool(max_workers):
+    """
+    Süreç başına tek, tekrar kullanılan havuz (her istekte süreç başlatma maliyeti olmasın).
+    'spawn' => thread'li web sunucusu sürecini fork etmemek için; bu modül Django'ya bağlı değil.
+    Boyut çağrı başına değil ayardan gelir (ayar yoksa CPU sayısı); bekleyen gün sayısı
+    değişti diye havuz yeniden açılmaz, az gün varsa sadece o kadar iş gönderilir.
+    """
+    global _POOL, _POOL_WORKERS
+    with _POOL_LOCK:
+        if _POOL is None or _POOL_WORKERS != max_workers:
+            if _POOL is not None:
+                _POOL.shutdown(wait=False, cancel_futures=True)
+            _POOL = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+            _POOL_WORKERS = max_workers
+        return _POOL
+
+
+def _reset_pool(terminate=False):
+    """
+    Havuzu kapatır; bekleyen işler iptal edilir.
+    terminate => çalışan worker süreçleri de sonlandırılır (çalışmakta olan bir future
+    cancel() ile durdurulamaz; süre sınırını aşan çözüm çekirdeği tutmaya devam etmesin).
+    """
+    global _POOL
+    with _POOL_LOCK:
+        pool, _POOL = _POOL, None
+    if pool is None:
+        return
+    processes = list((pool._processes or {}).values()) if terminate else []
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+
+
+def _solve_day_in_worker(day_rows, *args, **kwargs):
+    """
+    Worker süreçte çalışır (sadece MILP); porsiyonlar, optimallik kanıtı ve metrikler
+    ana sürece sonuçla birlikte taşınır.
+    """
+    day_metrics = []
+    ok_status, proven = _solve_day_milp(day_rows, *args, metrics=day_metrics, **kwargs)
+    return [r.porsiyon_adedi for r in day_rows], ok_status, proven, day_metrics
+
+
+def solve_days_parallel(day_groups, kcal_target, prot_target, carb_target, fat_target,
+                        kcal_tol=0.05, prot_tol=0.1, carb_tol=0.1, fat_tol=0.1,
+                        max_workers=None, time_limit=None, fast_path=True,
+                        backend='cbc', mip_gap=None, metrics=None, use_cache=True):
+    """
+    Günleri (her biri PlanRow listesi) sınırlı bir process pool'da eşzamanlı çözer.
+    Sonuçlar day_groups sırasıyla döner => [(rows, ok), ...]; birleştirme deterministiktir.
+    time_limit => her çözüm için çözücü süre sınırı; süresinde dönmeyen gün ok=False olur
+    ve havuz worker'larıyla birlikte kapatılır (sonraki çağrı yenisini açar).
+    Havuz kullanılamazsa günler sırayla çözülür (cache'i kullanır ve doldurur).
+    fast_path => NumPy çözücünün tolerans içinde çözdüğü günler havuza hiç gitmez.
+    backend / mip_gap / metrics / use_cache => solve_meal_plan_with_pulp ile aynı;
+    worker'larda çözülen günler ana sürecin cache'ine yazılır.
+    """
+    if not day_groups:
+        return []
+
+    targets = {"kcal": kcal_target, "prot": prot_target, "carb": carb_target, "fat": fat_target}
+    tols = {"kcal": kcal_tol, "prot": prot_tol, "carb": carb_tol, "fat": fat_tol}
+    args = (kcal_target, prot_target, carb_target, fat_target, kcal_tol, prot_tol, carb_tol, fat_tol)
+    kwargs = {"time_limit": time_limit, "fast_path": False, "backend": backend, "mip_gap": mip_gap,
+              "use_cache": use_cache}
+    solver = (backend, time_limit, mip_gap)
+
+    results = [None] * len(day_groups)
+    day_keys = {}
+    if use_cache:
+        for n, rows in enumerate(day_groups):
+            hit, key, order = cached_day(rows, targets, tols, metrics, solver)
+            if hit:
+                results[n] = (rows, True)
+            else:
+                day_keys[n] = (key, order)
+
+    if fast_path or backend == 'native':
+        for n, rows in enumerate(day_groups):
+            if results[n] is not None:
+                continue
+            if solve_day_fast(rows, targets, tols, metrics):
+                results[n] = (rows, True)
+                if n in day_keys:
+                    store_day(*day_keys[n], rows, targets, tols)
+    pending = [n for n, r in enumerate(results) if r is None]
+    if backend == 'native':
+        for n in pending:
+            results[n] = (day_groups[n], False)
+        return results
+    if not pending:
+        return results
+
+    max_workers = max_workers or os.cpu_count() or 1
+    try:
+        pool = _get_pool(max_workers)
+        futures = {n: pool.submit(_solve_day_in_worker, day_groups[n], targets, tols, *solver) for n in pending}
+    except (BrokenProcessPool, RuntimeError, OSError) as e:
+        print(f"[solve_days_parallel] Havuz kullanılamadı, sıralı çözülüyor: {e}")
+        _reset_pool()
+        for n in pending:
+            results[n] = solve_meal_plan_with_pulp(day_groups[n], *args, metrics=metrics, **kwargs)
+        return results
+
+    deadline = None
+    if time_limit:
+        # Worker'dan fazla gün varsa bir kısmı kuyrukta bekler => tur sayısı kadar süre
+        rounds = math.ceil(len(pending) / min(len(pending), max_workers))
+        deadline = time.monotonic() + rounds * time_limit + SOLVE_TIMEOUT_GRACE
+
+    timed_out = False
+    for n in pending:
+        rows, future = day_groups[n], futures[n]
+        try:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            portions, ok_status, proven, day_metrics = future.result(timeout=timeout)
+            if ok_status:
+                _write_portions(rows, np.asarray(portions))
+                if proven and n in day_keys:
+                    store_day(*day_keys[n], rows, targets, tols)
+            results[n] = (rows, ok_status)
+            if metrics is not None:
+                metrics.extend(day_metrics)
+        except FutureTimeoutError:
+            # Süre doldu => kalan günler için de beklenmez (timeout 0), biten sonuçlar yine alınır
+            timed_out = True
+            print("[solve_days_parallel] Gün süre sınırını aştı:", _day_label(rows))
+            results[n] = (rows, False)
+        except BrokenProcessPool as e:
+            print(f"[solve_days_parallel] Havuz çöktü: {e}")
+            _reset_pool()
+            results[n] = solve_meal_plan_with_pulp(rows, *args, metrics=metrics, **kwargs)
+    if timed_out:
+        _reset_pool(terminate=True)
+    return results
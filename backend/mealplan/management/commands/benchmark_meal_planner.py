@@ -0,0 +1,97 @@
+import time
+
+from django.core.management.base import BaseCommand
+from mealplan.csv_manager import load_yemekler
+from mealplan.linear_optimizer import clear_portion_cache
+from mealplan.native_planner import build_slot_pools, generate_native_plan
+from mealplan.plan_rows import rows_to_dataframe
+from mealplan.utils import optimize_plan_days
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the native (LLM-free) meal plan engine on the FoodItem catalog, without DB writes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--plans', type=int, default=200)
+        parser.add_argument('--calories', type=float, default=2000)
+        parser.add_argument('--protein', type=float, default=120)
+        parser.add_argument('--carbs', type=float, default=220)
+        parser.add_argument('--fats', type=float, default=70)
+        parser.add_argument('--meals', default='3+1', help='Main+snack meal counts, e.g. 3+1')
+        parser.add_argument('--mode', choices=['week', 'day', 'process'], default=None,
+                            help='Optimizer mode (defaults to MEALPLAN_OPTIMIZER_MODE)')
+        parser.add_argument('--backend', choices=['cbc', 'highs', 'native'], default=None,
+                            help='Solver backend (defaults to MEALPLAN_SOLVER_BACKEND)')
+        parser.add_argument('--no-fast-path', action='store_true',
+                            help='Always use CBC, skip the NumPy fast-path solver')
+        parser.add_argument('--no-cache', action='store_true',
+                            help='Disable the solved-portion cache')
+        parser.add_argument('--repeat', type=int, default=1,
+                            help='Optimize each generated plan this many times (exercises the cache)')
+        parser.add_argument('--no-optimize', action='store_true',
+                            help='Measure food selection only, skip portion optimization')
+        parser.add_argument('--export-csv', default=None,
+                            help='Debug: write the last plan rows to this CSV path (needs pandas)')
+
+    def handle(self, *args, **options):
+        main_meals, snack_meals = (int(x) for x in options['meals'].split('+'))
+        plan_settings = {
+            "daily_cal": options['calories'],
+            "macros": {"protein": options['protein'], "carbs": options['carbs'], "fats": options['fats']},
+            "main_meals_count": main_meals,
+            "snack_meals_count": snack_meals,
+            "meal_times": {},
+            "snack_times": {},
+            "user_aversions": [],
+            "economic_status": "Orta",
+            "cuisine_type": "Türk Mutfağı",
+            "user_meal_names": [f"Ana Öğün-{i+1}" for i in range(main_meals)]
+                               + [f"Ara Öğün {i+1}" for i in range(snack_meals)],
+        }
+
+        food_list = load_yemekler()
+        pools = build_slot_pools(food_list, plan_settings["user_aversions"])
+        if not any(slot.foods for slot in pools.values()):
+            self.stdout.write(self.style.ERROR('FoodItem catalog is empty'))
+            return
+
+        clear_portion_cache()
+        select_time = 0.0
+        optimize_time = 0.0
+        metrics = []
+        for i in range(options['plans']):
+            t0 = time.perf_counter()
+            parsed_days, plan_rows = generate_native_plan(plan_settings, seed=i, pools=pools)
+            t1 = time.perf_counter()
+            select_time += t1 - t0
+            if not options['no_optimize']:
+                for _ in range(options['repeat']):
+                    optimize_plan_days(plan_rows, plan_settings, mode=options['mode'],
+                                       fast_path=not options['no_fast_path'],
+                                       backend=options['backend'], metrics=metrics,
+                                       use_cache=not options['no_cache'])
+                optimize_time += time.perf_counter() - t1
+
+        n = options['plans']
+        optimize_time /= options['repeat']
+        total = select_time + optimize_time
+        self.stdout.write(f'catalog: {len(food_list)} foods, plans: {n}')
+        self.stdout.write(f'selection: {select_time / n * 1000:.2f} ms/plan')
+        if not options['no_optimize']:
+            self.stdout.write(f'optimization: {optimize_time / n * 1000:.2f} ms/plan, '
+                              f'{optimize_time / (n * 7) * 1000:.3f} ms/day')
+        if metrics:
+            walls = sorted(m['wall_ms'] for m in metrics)
+            statuses = {}
+            for m in metrics:
+                key = f"{m['backend']}:{m['status']}"
+                statuses[key] = statuses.get(key, 0) + 1
+            self.stdout.write(
+                f'solves: {len(walls)}, p50 {walls[len(walls) // 2]:.2f} ms, '
+                f'p95 {walls[int(len(walls) * 0.95)]:.2f} ms, max {walls[-1]:.2f} ms'
+            )
+            self.stdout.write(f'statuses: {statuses}')
+        self.stdout.write(self.style.SUCCESS(f'throughput: {n / total:.1f} plans/s'))
+        if options['export_csv'] and n:
+            rows_to_dataframe(plan_rows).to_csv(options['export_csv'], index=False)
+            self.stdout.write(f"last plan rows written to {options['export_csv']}")
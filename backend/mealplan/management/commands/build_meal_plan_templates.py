@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from mealplan.models import MealPlanTemplate
+from mealplan.plan_templates import (
+    STANDARD_MACRO_SPLITS,
+    build_plan_template,
+    macros_for_split,
+    template_key,
+)
+
+
+class Command(BaseCommand):
+    help = 'Build validated, optimized week templates per (calorie bucket, macro split, meal counts, cuisine)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--calories', type=int, nargs='+', default=[1600, 1800, 2000, 2200, 2400])
+        parser.add_argument('--meals', nargs='+', default=['3+1', '3+2'],
+                            help='Main+snack meal counts, e.g. 3+1')
+        parser.add_argument('--cuisine', default='Türk Mutfağı')
+        parser.add_argument('--per-key', type=int, default=3,
+                            help='Number of templates to keep for each key')
+        parser.add_argument('--max-attempts', type=int, default=2,
+                            help='GPT attempts per missing template before giving up')
+
+    def handle(self, *args, **options):
+        created = 0
+        for calories in options['calories']:
+            for split in STANDARD_MACRO_SPLITS:
+                for meals in options['meals']:
+                    main_meals, snack_meals = (int(x) for x in meals.split('+'))
+                    key = template_key({
+                        "daily_cal": calories,
+                        "macros": macros_for_split(calories, split),
+                        "main_meals_count": main_meals,
+                        "snack_meals_count": snack_meals,
+                        "cuisine_type": options['cuisine'],
+                    })
+                    missing = options['per_key'] - MealPlanTemplate.objects.filter(**key).count()
+                    attempts = 0
+                    while missing > 0 and attempts < missing * options['max_attempts']:
+                        attempts += 1
+                        template = build_plan_template(
+                            calories, split, main_meals, snack_meals, options['cuisine']
+                        )
+                        if template:
+                            missing -= 1
+                            created += 1
+                            self.stdout.write(self.style.SUCCESS(f'Created {template}'))
+                    if missing > 0:
+                        self.stdout.write(self.style.WARNING(
+                            f'{missing} template(s) still missing for {key}'
+                        ))
+
+        self.stdout.write(self.style.SUCCESS(f'Done, {created} template(s) created'))
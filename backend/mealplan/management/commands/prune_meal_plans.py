@@ -0,0 +1,52 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from mealplan.models import MealPlan
+
+
+class Command(BaseCommand):
+    help = 'Delete superseded meal plan versions in small batches, keeping the active plan and the newest --keep versions per user'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep', type=int, default=None,
+                            help='Inactive versions to keep per user (defaults to MEALPLAN_KEEP_VERSIONS)')
+        parser.add_argument('--batch-size', type=int, default=50,
+                            help='Plans deleted per transaction')
+        parser.add_argument('--sleep', type=float, default=0.0,
+                            help='Seconds to sleep between batches')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        keep = options['keep'] if options['keep'] is not None else settings.MEALPLAN_KEEP_VERSIONS
+        batch_size = max(1, options['batch_size'])
+
+        # Kullanıcı başına en yeni `keep` pasif sürümden sonrakiler silinecek
+        to_delete = []
+        seen = {}
+        inactive = (
+            MealPlan.objects.filter(is_active=False)
+            .order_by('user_id', '-version')
+            .values_list('id', 'user_id')
+        )
+        for plan_id, user_id in inactive.iterator():
+            seen[user_id] = seen.get(user_id, 0) + 1
+            if seen[user_id] > keep:
+                to_delete.append(plan_id)
+
+        if options['dry_run']:
+            self.stdout.write(f'{len(to_delete)} plan versions would be deleted')
+            return
+
+        deleted = 0
+        for i in range(0, len(to_delete), batch_size):
+            chunk = to_delete[i:i + batch_size]
+            with transaction.atomic():
+                # Bu arada geri alma ile aktif olan sürüm silinmesin
+                _, per_model = MealPlan.objects.filter(id__in=chunk, is_active=False).delete()
+            deleted += per_model.get('mealplan.MealPlan', 0)
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} superseded meal plan versions'))
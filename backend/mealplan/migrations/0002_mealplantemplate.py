@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-19 04:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mealplan', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MealPlanTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('calorie_bucket', models.PositiveIntegerField()),
+                ('protein_pct', models.PositiveIntegerField()),
+                ('carbs_pct', models.PositiveIntegerField()),
+                ('fats_pct', models.PositiveIntegerField()),
+                ('main_meals', models.PositiveIntegerField()),
+                ('snack_meals', models.PositiveIntegerField()),
+                ('cuisine', models.CharField(default='Türk Mutfağı', max_length=100)),
+                ('parsed_days', models.JSONField()),
+                ('rows', models.JSONField()),
+                ('search_text', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['calorie_bucket', 'protein_pct', 'carbs_pct', 'fats_pct', 'main_meals', 'snack_meals', 'cuisine'], name='mealplan_template_key_idx')],
+            },
+        ),
+    ]
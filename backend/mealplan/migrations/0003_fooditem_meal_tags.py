@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 04:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mealplan', '0002_mealplantemplate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fooditem',
+            name='meal_tags',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
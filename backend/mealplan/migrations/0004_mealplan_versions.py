@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mealplan', '0003_fooditem_meal_tags'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mealplan',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='mealplan',
+            name='is_active',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddIndex(
+            model_name='mealplan',
+            index=models.Index(fields=['user', 'version'], name='mealplan_user_version_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='mealplan',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('user',), name='mealplan_one_active_per_user'),
+        ),
+    ]
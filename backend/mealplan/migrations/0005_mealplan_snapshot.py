@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 09:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mealplan', '0004_mealplan_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mealplan',
+            name='snapshot',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 10:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mealplan', '0005_mealplan_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mealplan',
+            name='revision',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
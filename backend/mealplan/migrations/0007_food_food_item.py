@@ -0,0 +1,67 @@
+# Generated by Django 5.2 on 2026-10-19 10:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def link_food_items(apps, schema_editor):
+    """
+    Mevcut Food satırlarını isimden FoodItem'a bağlar ve kopyalanmış tarif / bileşen
+    metinlerini boşaltır. Katalogda olmayan besinler metinlerini korur.
+    """
+    Food = apps.get_model('mealplan', 'Food')
+    FoodItem = apps.get_model('mealplan', 'FoodItem')
+
+    ids_by_name = {}
+    for food_id, name in FoodItem.objects.order_by('food_id').values_list('food_id', 'food_name'):
+        ids_by_name.setdefault(name, food_id)
+
+    batch = []
+    foods = Food.objects.filter(food_item__isnull=True).only('id', 'name').iterator(chunk_size=BATCH_SIZE)
+    for food in foods:
+        item_id = ids_by_name.get(food.name)
+        if item_id is None:
+            continue
+        food.food_item_id = item_id
+        food.tarif = None
+        food.ana_bilesenler = None
+        batch.append(food)
+        if len(batch) >= BATCH_SIZE:
+            Food.objects.bulk_update(batch, ['food_item', 'tarif', 'ana_bilesenler'])
+            batch = []
+    if batch:
+        Food.objects.bulk_update(batch, ['food_item', 'tarif', 'ana_bilesenler'])
+
+
+def copy_texts_back(apps, schema_editor):
+    Food = apps.get_model('mealplan', 'Food')
+
+    batch = []
+    foods = Food.objects.filter(food_item__isnull=False).select_related('food_item').iterator(chunk_size=BATCH_SIZE)
+    for food in foods:
+        food.tarif = food.food_item.recipe
+        food.ana_bilesenler = food.food_item.main_ingredients
+        batch.append(food)
+        if len(batch) >= BATCH_SIZE:
+            Food.objects.bulk_update(batch, ['tarif', 'ana_bilesenler'])
+            batch = []
+    if batch:
+        Food.objects.bulk_update(batch, ['tarif', 'ana_bilesenler'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mealplan', '0006_mealplan_revision'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='food',
+            name='food_item',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='plan_foods', to='mealplan.fooditem'),
+        ),
+        migrations.RunPython(link_food_items, copy_texts_back),
+    ]
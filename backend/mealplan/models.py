@@ -1,7 +1,19 @@
 from django.db import models
 from django.conf import settings
+from django.db.models import F
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+class MealPlanQuerySet(models.QuerySet):
+    def active(self):
+        return self.filter(is_active=True)
+
 
 class MealPlan(models.Model):
+    """
+    Planlar sürümlüdür: her üretim yeni bir sürüm ekler, kullanıcı başına tek aktif plan.
+    Eski sürümler prune_meal_plans komutuyla arka planda silinir.
+    """
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -9,9 +21,27 @@ class MealPlan(models.Model):
     )
     week_start_date = models.DateField()
     created_at = models.DateTimeField(auto_now_add=True)
+    version = models.PositiveIntegerField(default=1)
+    is_active = models.BooleanField(default=True)
+    snapshot = models.JSONField(null=True, blank=True)  # MealPlanSerializer çıktısı; get_meal_plan tek satırdan okur
+    revision = models.PositiveIntegerField(default=1)  # Plan / tüketim her değiştiğinde artar => ETag
+
+    objects = MealPlanQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user'],
+                condition=models.Q(is_active=True),
+                name='mealplan_one_active_per_user'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'version'], name='mealplan_user_version_idx'),
+        ]
 
     def __str__(self):
-        return f"Meal Plan for {self.user} starting {self.week_start_date}"
+        return f"Meal Plan v{self.version} for {self.user} starting {self.week_start_date}"
 
 
 class Day(models.Model):
@@ -46,10 +76,28 @@ class Food(models.Model):
     protein = models.FloatField()
     carbs = models.FloatField()
     fats = models.FloatField()
+    # Katalogdan gelen besinler tarif / bileşen metnini FoodItem'dan okur;
+    # tarif / ana_bilesenler sadece katalogda olmayan besinler için doldurulur
+    # (FoodItem silinirse metin önce buraya kopyalanır => keep_recipe_on_food_item_delete)
+    food_item = models.ForeignKey(
+        'FoodItem',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='plan_foods'
+    )
     tarif = models.TextField(blank=True, null=True)
     ana_bilesenler = models.TextField(blank=True, null=True)
     consumed = models.BooleanField(default=False)  # Tek tek yemek bazında tüketim bilgisi
 
+    @property
+    def recipe_text(self):
+        return self.food_item.recipe if self.food_item_id else self.tarif
+
+    @property
+    def ingredients_text(self):
+        return self.food_item.main_ingredients if self.food_item_id else self.ana_bilesenler
+
     def __str__(self):
         return f"{self.name} ({self.portion_count} {self.portion_type})"
 
@@ -83,6 +131,54 @@ class FoodItem(models.Model):
     main_ingredients = models.TextField(blank=True)
     recipe = models.TextField(blank=True)
     max_portion = models.FloatField(default=10.0)
+    meal_tags = models.JSONField(default=list, blank=True)  # ["breakfast", "main", "snack"]; boşsa isimden tahmin edilir
     
     def __str__(self):
         return f"{self.food_name} ({self.calories} kcal)"
+
+
+class MealPlanTemplate(models.Model):
+    """
+    Offline üretilmiş, doğrulanmış ve optimize edilmiş haftalık plan şablonu.
+    (kalori kovası, makro dağılımı, öğün sayıları, mutfak) ile anahtarlanır.
+    """
+    calorie_bucket = models.PositiveIntegerField()
+    protein_pct = models.PositiveIntegerField()
+    carbs_pct = models.PositiveIntegerField()
+    fats_pct = models.PositiveIntegerField()
+    main_meals = models.PositiveIntegerField()
+    snack_meals = models.PositiveIntegerField()
+    cuisine = models.CharField(max_length=100, default='Türk Mutfağı')
+    parsed_days = models.JSONField()  # GPT'den parse edilen 7 gün
+    rows = models.JSONField()  # Eşleşmiş + optimize edilmiş besin satırları
+    search_text = models.TextField(blank=True, default='')  # Besin adları + bileşenler (aversion kontrolü)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['calorie_bucket', 'protein_pct', 'carbs_pct', 'fats_pct',
+                        'main_meals', 'snack_meals', 'cuisine'],
+                name='mealplan_template_key_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return (f"Template {self.calorie_bucket} kcal "
+                f"P{self.protein_pct}/C{self.carbs_pct}/F{self.fats_pct} "
+                f"{self.main_meals}+{self.snack_meals} {self.cuisine}")
+
+
+@receiver(pre_delete, sender=FoodItem)
+def keep_recipe_on_food_item_delete(sender, instance, **kwargs):
+    """
+    Katalog besini silinince (SET_NULL) plan besinleri tarifini kaybetmesin: bağlantı
+    kopmadan önce tarif / bileşenler Food'a kopyalanır. Snapshot'taki food_item artık
+    geçersiz olduğu için etkilenen planların snapshot'ı düşürülür (ilk okumada yeniden üretilir).
+    """
+    MealPlan.objects.filter(days__meals__foods__food_item=instance).update(
+        snapshot=None, revision=F('revision') + 1
+    )
+    Food.objects.filter(food_item=instance).update(
+        tarif=instance.recipe, ana_bilesenler=instance.main_ingredients
+    )
@@ -0,0 +1,261 @@
+# mealplan/native_planner.py
+
+import random
+import re
+
+import numpy as np
+
+from mealplan.csv_manager import load_yemekler
+from mealplan.linear_optimizer import fit_day_portions
+from mealplan.plan_templates import conflicts_with_aversions
+from mealplan.plan_rows import build_plan_row
+
+BREAKFAST = 'breakfast'
+MAIN = 'main'
+SNACK = 'snack'
+MEAL_TAGS = (BREAKFAST, MAIN, SNACK)
+
+# Etiketlenmemiş (meal_tags boş) besinler için isimden tahmin.
+# 4+ harfli anahtarlar kelime başı olarak, daha kısalar tam kelime olarak eşleşir.
+TAG_KEYWORDS = {
+    BREAKFAST: [
+        'peynir', 'yumurta', 'omlet', 'menemen', 'zeytin', 'yulaf', 'ekme', 'simit',
+        'bal', 'reçel', 'kaymak', 'tost', 'gevrek', 'pekmez', 'tahin', 'granola', 'sucuk',
+    ],
+    SNACK: [
+        'elma', 'armut', 'muz', 'portakal', 'mandalina', 'çilek', 'üzüm', 'kiraz',
+        'kayısı', 'şeftali', 'karpuz', 'kavun', 'meyve', 'yoğurt', 'kefir', 'ayran',
+        'ceviz', 'badem', 'fındık', 'fıstık', 'kuruyemiş', 'leblebi', 'smoothie',
+    ],
+}
+
+FOODS_PER_SLOT = {BREAKFAST: 3, MAIN: 3, SNACK: 2}
+MAX_WEEKLY_USES = 2  # Aynı besin haftada en fazla 2 kez
+PICK_TOP_K = 3  # Makro açığına en uygun ilk K aday arasından rastgele seçilir (çeşitlilik)
+WEEK_USE_PENALTY = 0.5  # Hafta içinde daha önce kullanılan besinin skor cezası (kullanım başına)
+DAY_ATTEMPTS = 6  # Gün tolerans içine oturmazsa yeniden seçim denemesi
+MACRO_FIELDS = ('kalori (kcal)', 'protein (g)', 'karbonhidrat (g)', 'yag (g)')
+
+
+def infer_meal_tags(food_name: str) -> list:
+    words = re.findall(r'\w+', food_name.lower())
+    tags = []
+    for tag, keywords in TAG_KEYWORDS.items():
+        for kw in keywords:
+            if any(w == kw or (len(kw) >= 4 and w.startswith(kw)) for w in words):
+                tags.append(tag)
+                break
+    return tags or [MAIN]
+
+
+def slot_tag(meal_name: str) -> str:
+    """
+    "Ana Öğün-1" => kahvaltı, diğer ana öğünler => ana yemek, "Ara Öğün N" => ara öğün
+    """
+    if meal_name.startswith("Ara Öğün"):
+        return SNACK
+    if meal_name == "Ana Öğün-1":
+        return BREAKFAST
+    return MAIN
+
+
+class SlotPool:
+    """
+    Öğün tipi havuzu + seçim için önceden hesaplanmış diziler: porsiyon başına makrolar
+    (n x 4: kcal, protein, karbonhidrat, yağ), porsiyon sınırları ve isim => satır indeksi.
+    """
+
+    def __init__(self, foods: list):
+        self.foods = foods
+        self.index = {}
+        for i, f in enumerate(foods):
+            self.index.setdefault(f['yemek_adi'], []).append(i)
+        self.macros = np.array([[float(f.get(k) or 0) for k in MACRO_FIELDS] for f in foods], dtype=float).reshape(-1, 4)
+        self.minp = np.array([float(f.get("minimum_porsiyon_boyutu", 1.0)) for f in foods], dtype=float)
+        self.maxp = np.array([float(f.get("maksimum_porsiyon", 10.0)) for f in foods], dtype=float)
+        self.inv_kcal = 1.0 / np.maximum(self.macros[:, 0], 1e-6)
+
+    def mask_without(self, names) -> np.ndarray:
+        mask = np.ones(len(self.foods), dtype=bool)
+        for name in names:
+            mask[self.index.get(name, [])] = False
+        return mask
+
+    def uses(self, week_uses: dict) -> np.ndarray:
+        uses = np.zeros(len(self.foods))
+        for name, count in week_uses.items():
+            uses[self.index.get(name, [])] = count
+        return uses
+
+
+class MacroGap:
+    """
+    Günün kalan makro açığı [kcal, protein, karbonhidrat, yağ].
+    Her seçimde açık, kalan besin sayısına bölünür; adayın bu paya (porsiyon sınırları
+    içinde) ne kadar yaklaştığı skorlanır => seçilen küme hedef oranlarını kapsar.
+    """
+
+    def __init__(self, targets, foods_total: int):
+        self.remaining = np.array(targets, dtype=float)
+        self.weights = 1.0 / np.maximum(self.remaining / max(foods_total, 1), 1e-6) ** 2
+        self.foods_left = foods_total
+
+    def scores(self, macros, inv_kcal, minp, maxp):
+        """
+        Dönüş: (skor, porsiyon, katkı) => skor kalan besin başına paydan göreli kare sapma,
+        porsiyon paya denk gelen porsiyon adedi, katkı o porsiyondaki makrolar (n x 4).
+        """
+        share = np.maximum(self.remaining, 0) / max(self.foods_left, 1)
+        portions = np.minimum(np.maximum(share[0] * inv_kcal, minp), maxp)
+        contribution = portions[:, None] * macros
+        diff = contribution - share
+        return (diff * diff) @ self.weights, portions, contribution
+
+    def take(self, contribution):
+        self.remaining -= contribution
+        self.foods_left -= 1
+
+
+def build_slot_pools(food_list: list, aversions: list) -> dict:
+    """
+    Katalogu öğün tipine göre havuzlara ayırır; kullanıcının kaçındığı
+    ve makrosu olmayan besinler hiç havuza girmez. Boş kalan tip ana yemek
+    havuzunu (o da boşsa tüm katalogu) kullanır.
+    Dönüş: {etiket: SlotPool} => aynı katalogla tekrar tekrar plan üretilecekse saklanabilir.
+    """
+    pools = {tag: [] for tag in MEAL_TAGS}
+    for food in food_list:
+        if float(food.get('kalori (kcal)') or 0) <= 0:
+            continue
+        text = f"{food['yemek_adi']}\n{food.get('ana_bilesenler') or ''}".lower()
+        if conflicts_with_aversions(text, aversions):
+            continue
+        for tag in food.get('ogun_etiketleri') or infer_meal_tags(food['yemek_adi']):
+            if tag in pools:
+                pools[tag].append(food)
+    all_foods = [f for p in pools.values() for f in p]
+    return {tag: SlotPool(pools[tag] or pools[MAIN] or all_foods) for tag in MEAL_TAGS}
+
+
+def pick_slot_foods(slot: SlotPool, count: int, rnd: random.Random, day_used: set, uses: np.ndarray,
+                    gap: MacroGap, banned=()) -> list:
+    """
+    Çeşitlilik kuralları: aynı gün tekrar yok, haftada en fazla MAX_WEEKLY_USES,
+    banned (örn. bir önceki günün ana yemekleri) kullanılmaz. Aday kalmazsa
+    sadece "aynı gün tekrar yok" kuralına düşülür.
+    Her seçim günün makro açığını (gap, yerinde güncellenir) en iyi kapatan PICK_TOP_K aday
+    arasından rastgele yapılır; hafta içinde kullanılmış besinler WEEK_USE_PENALTY ile geri düşer.
+    uses => slot.uses(week_uses) (gün boyunca değişmez, çağıran saklar).
+    Dönüş: [(besin, başlangıç porsiyonu), ...] => porsiyon, açıktaki payı karşılayan miktar.
+    """
+    not_today = slot.mask_without(day_used)
+    allowed = not_today & slot.mask_without(banned) & (uses < MAX_WEEKLY_USES)
+    if allowed.sum() < count:
+        allowed = not_today
+    idx = np.flatnonzero(allowed)
+    macros, inv_kcal = slot.macros[idx], slot.inv_kcal[idx]
+    minp, maxp, penalty = slot.minp[idx], slot.maxp[idx], WEEK_USE_PENALTY * uses[idx]
+
+    chosen = []
+    for _ in range(min(count, len(idx))):
+        scores, portions, contribution = gap.scores(macros, inv_kcal, minp, maxp)
+        scores += penalty
+        if len(scores) > PICK_TOP_K:
+            top = np.argpartition(scores, PICK_TOP_K)[:PICK_TOP_K]
+            top = top[np.argsort(scores[top], kind='stable')]
+        else:
+            top = np.argsort(scores, kind='stable')
+        top = top[np.isfinite(scores[top])]
+        k = int(top[rnd.randrange(len(top))])
+        chosen.append((slot.foods[idx[k]], float(portions[k])))
+        gap.take(contribution[k])
+        penalty[k] = np.inf  # Aynı öğünde tekrar seçilmesin
+    return chosen
+
+
+def pick_day(plan_settings: dict, slot_pools: dict, rnd: random.Random,
+             uses: dict, prev_mains: set, targets: list) -> tuple:
+    """
+    Bir günün öğünlerine besin seçer.
+    slot_pools => {etiket: SlotPool}, uses => {etiket: SlotPool.uses(week_uses)}. Dönüş: (day_picks, day_mains) =>
+    [(öğün adı, [(besin, porsiyon), ...]), ...], günün ana yemekleri
+    """
+    slots = [(meal_name, slot_tag(meal_name)) for meal_name in plan_settings["user_meal_names"]]
+    gap = MacroGap(targets, sum(FOODS_PER_SLOT[tag] for _, tag in slots))
+    day_used = set()
+    day_mains = set()
+    day_picks = []
+    for meal_name, tag in slots:
+        banned = prev_mains if tag == MAIN else ()
+        chosen = pick_slot_foods(slot_pools[tag], FOODS_PER_SLOT[tag], rnd, day_used, uses[tag], gap, banned=banned)
+        for food, _ in chosen:
+            day_used.add(food['yemek_adi'])
+            if tag == MAIN:
+                day_mains.add(food['yemek_adi'])
+        day_picks.append((meal_name, chosen))
+    return day_picks, day_mains
+
+
+def generate_native_plan(plan_settings: dict, seed=None, food_list=None, pools=None, days: int = 7, exclude=()):
+    """
+    GPT kullanmadan, FoodItem katalogundan deterministik 7 günlük plan üretir.
+    Aynı seed + katalog => aynı plan. Besinler günün makro açığına göre seçilir; gün NumPy
+    çözücüyle tolerans içine oturmazsa DAY_ATTEMPTS kez yeniden seçilir.
+    pools => build_slot_pools çıktısı (verilmezse katalogdan kurulur).
+    days => üretilecek gün sayısı (tek gün / öğün yenileme için 1),
+    exclude => kullanılmaması gereken besinler (aday kalmazsa gevşetilir).
+    Dönüş: (parsed_days, plan_rows) veya (None, None);
+    plan_rows, create_matched_food_rows ile aynı formattadır ve optimizer'a gider.
+    """
+    if pools is None:
+        if food_list is None:
+            food_list = load_yemekler()
+        pools = build_slot_pools(food_list, plan_settings["user_aversions"])
+    if not any(slot.foods for slot in pools.values()):
+        print("[generate_native_plan] Katalog boş veya tüm besinler hariç tutuldu.")
+        return None, None
+
+    rnd = random.Random(seed)
+    daily_cal = float(plan_settings["daily_cal"])
+    macros = plan_settings["macros"]
+    targets = [daily_cal, float(macros['protein']), float(macros['carbs']), float(macros['fats'])]
+    solver_targets = dict(zip(("kcal", "prot", "carb", "fat"), targets))
+    week_uses = dict.fromkeys(exclude, MAX_WEEKLY_USES)
+    prev_mains = set()
+    parsed_days = []
+    plan_rows = []
+
+    for day_index in range(1, days + 1):
+        # Seçilen küme hedeflere tolerans içinde oturmazsa gün yeniden seçilir, en iyisi kalır
+        best = None
+        uses = {tag: slot.uses(week_uses) for tag, slot in pools.items()}
+        for _ in range(DAY_ATTEMPTS):
+            day_picks, day_mains = pick_day(plan_settings, pools, rnd, uses, prev_mains, targets)
+            day_rows = [
+                build_plan_row(day_index, meal_name, food['yemek_adi'], food,
+                               portion * float(food.get('porsiyon_metrik', 100.0)))
+                for meal_name, chosen in day_picks for food, portion in chosen
+            ]
+            # Porsiyonlar açık paylarından başlar, NumPy çözücü tolerans içine çeker;
+            # optimizer buradan devam eder
+            slack = fit_day_portions(day_rows, solver_targets)
+            if best is None or slack < best[0]:
+                best = (slack, day_picks, day_mains, day_rows)
+            if slack <= 0:
+                break
+        _, day_picks, prev_mains, day_rows = best
+
+        ogunler = []
+        rows = iter(day_rows)
+        for meal_name, chosen in day_picks:
+            besinler = []
+            for food, _ in chosen:
+                row = next(rows)
+                week_uses[food['yemek_adi']] = week_uses.get(food['yemek_adi'], 0) + 1
+                besinler.append({"ad": food['yemek_adi'], "miktar": f"{round(row.porsiyon_adedi * row.porsiyon_metrik)}g"})
+            ogunler.append({"öğün": meal_name, "besinler": besinler})
+
+        plan_rows.extend(day_rows)
+        parsed_days.append({"ogunler": ogunler, "gunluk_toplam": {}})
+
+    return parsed_days, plan_rows
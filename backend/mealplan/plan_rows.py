@@ -0,0 +1,168 @@
+# mealplan/plan_rows.py
+
+from dataclasses import dataclass, fields
+from typing import Optional
+
+
+@dataclass(slots=True)
+class PlanRow:
+    """
+    Planın tek besin satırı => eşleme, optimizer, final_json ve DB kaydı bunu kullanır.
+    Eski DataFrame sütun adları için to_record() / from_record().
+    row_key => plan içindeki sabit anahtar (assign_row_keys); final_json besinleri bunu taşır.
+    """
+    day_index: int
+    meal_name: str
+    original_yemek_adi: str
+    yemek_adi: str
+    kalori: float
+    protein: float
+    karbonhidrat: float
+    yag: float
+    porsiyon_adedi: float
+    porsiyon_metrik: float
+    porsiyon_metrik_turu: str
+    porsiyon_turu: str
+    minimum_porsiyon_boyutu: float
+    porsiyon_artis_birimi: float
+    maksimum_porsiyon_adedi: float
+    ana_bilesenler: str = ""
+    tarif: str = ""
+    yemek_id: Optional[int] = None
+    row_key: Optional[int] = None
+
+
+# Alan adı => eski kayıt / DataFrame sütun adı (farklı olanlar)
+RECORD_KEYS = {
+    'kalori': 'kalori (kcal)',
+    'protein': 'protein (g)',
+    'karbonhidrat': 'karbonhidrat (g)',
+    'yag': 'yag (g)',
+    'porsiyon_metrik_turu': 'porsiyon_metrik_türü',
+    'porsiyon_artis_birimi': 'porsiyon_artıs_birimi',
+}
+# row_key kayda yazılmaz; her plan kendi anahtarlarını üretir
+ROW_FIELDS = [f.name for f in fields(PlanRow) if f.name != 'row_key']
+
+
+def build_plan_row(day_index: int, meal_name: str, original_name: str, found: dict, val_std=None) -> PlanRow:
+    """
+    Veritabanı besininden (load_yemekler formatı) optimizer'ın kullandığı satırı üretir.
+    val_std => istenen miktar (g/ml); None ise 1 porsiyon (porsiyon_metrik) kabul edilir.
+    """
+    pm = float(found.get("porsiyon_metrik", 100.0))
+    st = float(found.get("porsiyon_artıs_birimi", 1.0))
+    if st <= 0:
+        st = 1.0
+    minp = float(found.get("minimum_porsiyon_boyutu", 1.0))
+    maxp = float(found.get("maksimum_porsiyon", 10.0))
+
+    if val_std is None:
+        val_std = pm
+
+    pors = val_std / pm
+    pors = round(pors / st) * st
+    pors = max(pors, minp)
+    pors = min(pors, maxp)
+
+    return PlanRow(
+        day_index=day_index,
+        meal_name=meal_name,
+        original_yemek_adi=original_name,
+        yemek_adi=found['yemek_adi'],
+        kalori=float(found['kalori (kcal)']),
+        protein=float(found['protein (g)']),
+        karbonhidrat=float(found['karbonhidrat (g)']),
+        yag=float(found['yag (g)']),
+        porsiyon_adedi=pors,
+        porsiyon_metrik=pm,
+        porsiyon_metrik_turu=found.get("porsiyon_metrik_türü", "gram"),
+        porsiyon_turu=found.get("porsiyon_turu", "porsiyon"),
+        minimum_porsiyon_boyutu=minp,
+        porsiyon_artis_birimi=st,
+        maksimum_porsiyon_adedi=maxp,
+        ana_bilesenler=found.get("ana_bilesenler", ""),
+        tarif=found.get("tarif", ""),
+        yemek_id=found.get('yemek_id'),
+    )
+
+
+def to_record(row: PlanRow) -> dict:
+    return {RECORD_KEYS.get(name, name): getattr(row, name) for name in ROW_FIELDS}
+
+
+def from_record(record: dict) -> PlanRow:
+    """
+    Eski formatlı kayıttan (örn. MealPlanTemplate.rows) PlanRow; eksik alanlar varsayılanda kalır.
+    """
+    return PlanRow(**{
+        name: record[RECORD_KEYS.get(name, name)]
+        for name in ROW_FIELDS
+        if RECORD_KEYS.get(name, name) in record
+    })
+
+
+def assign_row_keys(rows: list) -> dict:
+    """
+    Satırlara plan içi sıra numarasını row_key olarak yazar; tek geçişte {row_key: satır} döner.
+    Aynı öğünde aynı besin iki kez olsa bile her satırın anahtarı ayrıdır.
+    """
+    index = {}
+    for i, row in enumerate(rows):
+        row.row_key = i
+        index[i] = row
+    return index
+
+
+def index_rows(rows: list) -> dict:
+    """
+    Anahtarı atanmış satırlar => {row_key: satır}
+    """
+    return {row.row_key: row for row in rows if row.row_key is not None}
+
+
+def group_by_day(rows: list) -> dict:
+    """
+    Tek geçişte {day_index: [satırlar]}; günler ve satırlar ilk görülme sırasında.
+    """
+    days = {}
+    for row in rows:
+        days.setdefault(row.day_index, []).append(row)
+    return days
+
+
+def group_by_meal(rows: list) -> dict:
+    """
+    Tek geçişte {(day_index, meal_name): [satırlar]}; öğünler ilk görülme sırasında.
+    """
+    meals = {}
+    for row in rows:
+        meals.setdefault((row.day_index, row.meal_name), []).append(row)
+    return meals
+
+
+def day_totals(rows: list) -> dict:
+    """
+    Satırların toplam makroları, final_json "günlük_toplam" formatında.
+    """
+    kcal = prot = carb = fat = 0.0
+    for row in rows:
+        kcal += row.kalori * row.porsiyon_adedi
+        prot += row.protein * row.porsiyon_adedi
+        carb += row.karbonhidrat * row.porsiyon_adedi
+        fat += row.yag * row.porsiyon_adedi
+    return {
+        "kalori (kcal)": round(kcal, 2),
+        "protein (g)": round(prot, 2),
+        "karbonhidrat (g)": round(carb, 2),
+        "yağ (g)": round(fat, 2),
+    }
+
+
+def rows_to_dataframe(rows: list):
+    """
+    Sadece debug / analiz için: eski sütun adlarıyla pandas DataFrame.
+    """
+    import pandas as pd
+
+    return pd.DataFrame([to_record(row) for row in rows])
@@ -0,0 +1,161 @@
+# mealplan/plan_snapshot.py
+
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F
+
+from mealplan.models import MealPlan
+from mealplan.serializers import MealPlanSerializer, FoodSerializer, RECIPE_FIELDS
+
+# Snapshot'taki (yalın) besin alanları
+LEAN_FOOD_FIELDS = [f for f in FoodSerializer.Meta.fields if f not in RECIPE_FIELDS]
+
+
+def prefetched_plans(expand=()):
+    """
+    Nested serializer (days → meals → foods, daily_total) için N+1'siz queryset.
+    expand'de 'recipe' varsa metinler için food_item da gelir.
+    """
+    foods = 'days__meals__foods__food_item' if 'recipe' in expand else 'days__meals__foods'
+    return MealPlan.objects.prefetch_related(foods, 'days__daily_total')
+
+
+def payload_options(query_params) -> dict:
+    """
+    ?fields=name,calories&expand=recipe => serializer context
+    fields => besin alanları (id her zaman var), expand=recipe => tarif / ana_bilesenler
+    """
+    food_fields = {f.strip() for f in query_params.get('fields', '').split(',') if f.strip()}
+    expand = {e.strip() for e in query_params.get('expand', '').split(',') if e.strip()}
+    return {"food_fields": food_fields or None, "expand": expand}
+
+
+def plan_etag(meal_plan_id: int, revision: int, options: dict = None) -> str:
+    """
+    Plan id + revision => ETag; geri alma ile aktif plan değişince de ETag değişir.
+    Varsayılan dışı fields / expand farklı bir temsil olduğu için ETag'e eklenir.
+    """
+    etag = f"{meal_plan_id}-{revision}"
+    if options and (options.get("food_fields") or options.get("expand")):
+        variant = json.dumps([sorted(options.get("food_fields") or ()), sorted(options.get("expand") or ())])
+        etag += "-" + hashlib.sha1(variant.encode()).hexdigest()[:8]
+    return f'"{etag}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    If-None-Match başlığı (virgüllü liste, W/ önekli veya *) verilen ETag'i içeriyor mu?
+    """
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def build_snapshot(mealplan) -> dict:
+    """
+    Planın MealPlanSerializer çıktısını JSON'a uygun dict olarak döner (days → meals → foods).
+    """
+    data = MealPlanSerializer(mealplan).data
+    return json.loads(json.dumps(data, cls=DjangoJSONEncoder))
+
+
+def refresh_snapshot(meal_plan_id: int, bump: bool = True):
+    """
+    Snapshot'ı ORM'den baştan üretip kaydeder. Plan yapısı değiştiğinde
+    (yeni plan, gün / öğün yenileme) çağrılır ve revision'ı artırır.
+    bump=False => içerik değişmedi, sadece eksik snapshot dolduruluyor. Plan yoksa None.
+    """
+    mealplan = prefetched_plans().filter(id=meal_plan_id).first()
+    if mealplan is None:
+        return None
+
+    snapshot = build_snapshot(mealplan)
+    fields = {"snapshot": snapshot}
+    if bump:
+        fields["revision"] = F('revision') + 1
+    MealPlan.objects.filter(id=meal_plan_id).update(**fields)
+    return snapshot
+
+
+def patch_snapshot_consumed(meal_plan_id: int, foods: dict = None, meals: dict = None):
+    """
+    Sadece consumed bayraklarını snapshot üzerinde yerinde günceller ve revision'ı artırır.
+    foods => {food_id: consumed}, meals => {meal_id: consumed}
+    Snapshot yoksa sadece revision artar; snapshot ilk okumada yeniden üretilir.
+    """
+    foods = foods or {}
+    meals = meals or {}
+    if not foods and not meals:
+        return
+
+    with transaction.atomic():
+        mealplan = (
+            MealPlan.objects.select_for_update()
+            .only('id', 'snapshot', 'revision')
+            .filter(id=meal_plan_id)
+            .first()
+        )
+        if mealplan is None:
+            return
+
+        if mealplan.snapshot is not None:
+            for day in mealplan.snapshot.get("days", []):
+                for meal in day.get("meals", []):
+                    if meal["id"] in meals:
+                        meal["consumed"] = meals[meal["id"]]
+                    for food in meal.get("foods", []):
+                        if food["id"] in foods:
+                            food["consumed"] = foods[food["id"]]
+
+        mealplan.revision = F('revision') + 1
+        mealplan.save(update_fields=['snapshot', 'revision'])
+
+
+def trim_snapshot(snapshot: dict, food_fields=None) -> dict:
+    """
+    Snapshot besinlerini yalın alanlara (ve istenirse fields= alt kümesine) indirir.
+    Zaten yalın olan snapshot varsayılan istekte kopyalanmadan döner.
+    """
+    allowed = {f for f in LEAN_FOOD_FIELDS if not food_fields or f in food_fields or f == 'id'}
+
+    days = snapshot.get("days", [])
+    if not food_fields:
+        sample = next((fd for d in days for m in d.get("meals", []) for fd in m.get("foods", [])), None)
+        if sample is None or set(sample) <= allowed:
+            return snapshot
+
+    return {
+        **snapshot,
+        "days": [
+            {
+                **day,
+                "meals": [
+                    {**meal, "foods": [{k: v for k, v in fd.items() if k in allowed} for fd in meal.get("foods", [])]}
+                    for meal in day.get("meals", [])
+                ],
+            }
+            for day in days
+        ],
+    }
+
+
+def plan_response_data(mealplan, options: dict = None) -> dict:
+    """
+    API yanıtı => snapshot; eski planda snapshot yoksa bir kez üretilip kaydedilir.
+    expand=recipe veya MEALPLAN_SNAPSHOTS kapalıysa prefetch'li ORM serializer yolu kullanılır.
+    """
+    options = options or {}
+    expand = options.get("expand") or ()
+    if not settings.MEALPLAN_SNAPSHOTS or 'recipe' in expand:
+        return MealPlanSerializer(prefetched_plans(expand).get(id=mealplan.id), context=options).data
+    if mealplan.snapshot is None:
+        mealplan.snapshot = refresh_snapshot(mealplan.id, bump=False)
+    return trim_snapshot(mealplan.snapshot, options.get("food_fields"))
@@ -0,0 +1,168 @@
+# mealplan/plan_templates.py
+
+from mealplan.models import MealPlanTemplate
+from mealplan.plan_rows import from_record, group_by_day, to_record
+
+# Hedefler çoğunlukla 1800/2000/2200 kcal gibi değerlerde toplanıyor
+CALORIE_BUCKET_SIZE = 200
+MACRO_PCT_STEP = 5
+
+# (protein %, karbonhidrat %, yağ %) => kalorinin yüzdesi
+STANDARD_MACRO_SPLITS = [
+    (30, 40, 30),
+    (25, 50, 25),
+    (35, 35, 30),
+    (40, 30, 30),
+]
+
+
+def round_to_step(value, step):
+    return int(step * round(float(value) / step))
+
+
+def macro_split_pct(daily_cal, macros: dict):
+    """
+    Gram cinsinden makroları kalori yüzdesine çevirir (MACRO_PCT_STEP'e yuvarlanmış).
+    """
+    daily_cal = float(daily_cal) or 1.0
+    return (
+        round_to_step(float(macros.get('protein', 0)) * 4 / daily_cal * 100, MACRO_PCT_STEP),
+        round_to_step(float(macros.get('carbs', 0)) * 4 / daily_cal * 100, MACRO_PCT_STEP),
+        round_to_step(float(macros.get('fats', 0)) * 9 / daily_cal * 100, MACRO_PCT_STEP),
+    )
+
+
+def macros_for_split(calories, split) -> dict:
+    """
+    (protein %, karbonhidrat %, yağ %) => gram cinsinden makro hedefleri
+    """
+    p_pct, c_pct, f_pct = split
+    return {
+        "protein": round(calories * p_pct / 100 / 4),
+        "carbs": round(calories * c_pct / 100 / 4),
+        "fats": round(calories * f_pct / 100 / 9),
+    }
+
+
+def template_key(plan_settings: dict) -> dict:
+    """
+    Kullanıcının plan ayarlarından şablon arama anahtarını üretir.
+    """
+    p_pct, c_pct, f_pct = macro_split_pct(plan_settings["daily_cal"], plan_settings["macros"])
+    return {
+        "calorie_bucket": round_to_step(plan_settings["daily_cal"], CALORIE_BUCKET_SIZE),
+        "protein_pct": p_pct,
+        "carbs_pct": c_pct,
+        "fats_pct": f_pct,
+        "main_meals": plan_settings["main_meals_count"],
+        "snack_meals": plan_settings["snack_meals_count"],
+        "cuisine": plan_settings["cuisine_type"],
+    }
+
+
+def build_search_text(rows: list) -> str:
+    """
+    Aversion kontrolü için şablondaki besin adları + ana bileşenler (küçük harf).
+    """
+    parts = set()
+    for r in rows:
+        parts.add(str(r.get('yemek_adi', '')).lower())
+        parts.add(str(r.get('ana_bilesenler', '') or '').lower())
+    return "\n".join(sorted(p for p in parts if p))
+
+
+def conflicts_with_aversions(search_text: str, aversions: list) -> bool:
+    for item in aversions or []:
+        item = str(item).strip().lower()
+        if item and item in search_text:
+            return True
+    return False
+
+
+def find_plan_template(plan_settings: dict, user=None):
+    """
+    Anahtara uyan ve kullanıcının kaçındığı besinleri içermeyen bir şablon döner.
+    Aynı kovadaki kullanıcılar farklı şablonlara dağıtılır (user.id ile).
+    """
+    candidates = [
+        t_id for t_id, search_text in
+        MealPlanTemplate.objects.filter(**template_key(plan_settings))
+        .order_by('id')
+        .values_list('id', 'search_text')
+        if not conflicts_with_aversions(search_text, plan_settings["user_aversions"])
+    ]
+    if not candidates:
+        return None
+
+    seed = user.id if user is not None and user.id else 0
+    return MealPlanTemplate.objects.get(id=candidates[seed % len(candidates)])
+
+
+def load_template_plan(plan_settings: dict, user=None):
+    """
+    Uygun şablon varsa (parsed_days, plan_rows) döner; porsiyonlar optimizer'da
+    kullanıcının kendi hedeflerine göre yeniden ölçeklenir. Yoksa (None, None).
+    """
+    template = find_plan_template(plan_settings, user)
+    if template is None:
+        return None, None
+
+    print(f"[load_template_plan] => {template}")
+    return template.parsed_days, [from_record(r) for r in template.rows]
+
+
+def build_plan_template(calories, split, main_meals_count, snack_meals_count, cuisine_type="Türk Mutfağı"):
+    """
+    Offline iş: GPT'den 7 gün ister, veritabanıyla eşler, her günü optimize eder,
+    doğrular ve MealPlanTemplate olarak kaydeder. Doğrulanamazsa None döner.
+    """
+    from mealplan.utils import request_plan_rows_from_gpt
+    from mealplan.linear_optimizer import solve_meal_plan_with_pulp
+
+    macros = macros_for_split(calories, split)
+    user_meal_names = [f"Ana Öğün-{i+1}" for i in range(main_meals_count)]
+    user_meal_names += [f"Ara Öğün {i+1}" for i in range(snack_meals_count)]
+
+    plan_settings = {
+        "daily_cal": calories,
+        "macros": macros,
+        "main_meals_count": main_meals_count,
+        "snack_meals_count": snack_meals_count,
+        "meal_times": {},
+        "snack_times": {},
+        "user_aversions": [],
+        "economic_status": "Orta",
+        "cuisine_type": cuisine_type,
+        "user_meal_names": user_meal_names,
+    }
+
+    parsed_days, plan_rows = request_plan_rows_from_gpt(plan_settings)
+    if plan_rows is None or len(parsed_days) < 7:
+        print("[build_plan_template] GPT 7 gün döndürmedi.")
+        return None
+
+    # Veritabanında bulunamayan besin => makrosu 0, şablona alınmaz
+    if any(r.kalori <= 0 for r in plan_rows):
+        print("[build_plan_template] Eşleşmeyen besin var.")
+        return None
+
+    for day_i, day_rows in group_by_day(plan_rows).items():
+        _, ok_status = solve_meal_plan_with_pulp(
+            day_rows,
+            kcal_target=calories,
+            prot_target=macros['protein'],
+            carb_target=macros['carbs'],
+            fat_target=macros['fats']
+        )
+        if not ok_status:
+            print(f"[build_plan_template] Gün {day_i} optimize edilemedi.")
+            return None
+
+    rows = [to_record(r) for r in plan_rows]
+    key = template_key(plan_settings)
+    return MealPlanTemplate.objects.create(
+        **key,
+        parsed_days=parsed_days,
+        rows=rows,
+        search_text=build_search_text(rows),
+    )
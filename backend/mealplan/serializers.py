@@ -1,11 +1,35 @@
 from rest_framework import serializers
-from .models import MealPlan, Day, Meal, Food, DailyTotal
+from .models import MealPlan, Day, Meal, Food, DailyTotal, FoodItem
+
+# Sadece expand=recipe ile gelen alanlar; liste ekranları bunları kullanmıyor
+RECIPE_FIELDS = ('tarif', 'ana_bilesenler')
+
 
 class FoodSerializer(serializers.ModelSerializer):
+    """
+    Varsayılan temsil yalın: tarif / ana_bilesenler yok (ayrıca /recipes/<food_item_id>/,
+    katalogda olmayan (food_item=None) besinler için /foods/<food_id>/recipe/).
+    context => expand: {'recipe'} metinleri ekler, food_fields: {...} sadece bu alanlar (+ id).
+    """
+    # Metinler katalogdaki FoodItem'dan çözülür (food_item select/prefetch edilmeli)
+    tarif = serializers.CharField(source='recipe_text', read_only=True, allow_null=True)
+    ana_bilesenler = serializers.CharField(source='ingredients_text', read_only=True, allow_null=True)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if 'recipe' not in self.context.get('expand', ()):
+            for name in RECIPE_FIELDS:
+                fields.pop(name, None)
+        only = self.context.get('food_fields')
+        if only:
+            fields = {name: field for name, field in fields.items() if name in only or name == 'id'}
+        return fields
+
     class Meta:
         model = Food
         fields = [
             'id',
+            'food_item',
             'name',
             'portion_type',
             'portion_count',
@@ -21,6 +45,39 @@ class FoodSerializer(serializers.ModelSerializer):
         ]
 
 
+class RecipeSerializer(serializers.ModelSerializer):
+    name = serializers.CharField(source='food_name', read_only=True)
+    tarif = serializers.CharField(source='recipe', read_only=True)
+    ana_bilesenler = serializers.CharField(source='main_ingredients', read_only=True)
+
+    class Meta:
+        model = FoodItem
+        fields = [
+            'food_id',
+            'name',
+            'tarif',
+            'ana_bilesenler',
+        ]
+
+
+class FoodRecipeSerializer(serializers.ModelSerializer):
+    """
+    Plandaki tek besinin tarifi: katalogdaysa FoodItem'dan, değilse Food'un kendi metinleri.
+    """
+    tarif = serializers.CharField(source='recipe_text', read_only=True, allow_null=True)
+    ana_bilesenler = serializers.CharField(source='ingredients_text', read_only=True, allow_null=True)
+
+    class Meta:
+        model = Food
+        fields = [
+            'id',
+            'food_item',
+            'name',
+            'tarif',
+            'ana_bilesenler',
+        ]
+
+
 class MealSerializer(serializers.ModelSerializer):
     foods = FoodSerializer(many=True, read_only=True)
 
@@ -73,5 +130,6 @@ class MealPlanSerializer(serializers.ModelSerializer):
             'user',
             'week_start_date',
             'created_at',
+            'version',
             'days',
         ]
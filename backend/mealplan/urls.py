@@ -1,7 +1,12 @@
 from django.urls import path
 from .views import (
     generate_meal_plan,
+    regenerate_day,
+    regenerate_meal,
     get_meal_plan,
+    rollback_meal_plan,
+    get_recipe,
+    get_food_recipe,
     mark_food_consumed,
     mark_meal_consumed,
     bulk_update_consumed
@@ -9,7 +14,12 @@ from .views import (
 
 urlpatterns = [
     path('generate-meal-plan/', generate_meal_plan, name='generate_meal_plan'),
+    path('regenerate-day/', regenerate_day, name='regenerate_day'),
+    path('regenerate-meal/', regenerate_meal, name='regenerate_meal'),
     path('get-meal-plan/', get_meal_plan, name='get_meal_plan'),
+    path('rollback-meal-plan/', rollback_meal_plan, name='rollback_meal_plan'),
+    path('recipes/<int:food_item_id>/', get_recipe, name='get_recipe'),
+    path('foods/<int:food_id>/recipe/', get_food_recipe, name='get_food_recipe'),
     path('mark-food-consumed/', mark_food_consumed, name='mark_food_consumed'),
     path('mark-meal-consumed/', mark_meal_consumed, name='mark_meal_consumed'),
     path('bulk-update-consumed/', bulk_update_consumed, name='bulk_update_consumed'),
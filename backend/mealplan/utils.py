@@ -3,17 +3,26 @@
 import json
 import re
 import datetime
-import pandas as pd
 from datetime import datetime, timedelta
 from django.utils import timezone
+from django.db import transaction
+from django.db.models import Max
+from django.contrib.auth import get_user_model
 import os
 from dotenv import load_dotenv
 
 from survey.models import Survey
-from mealplan.models import MealPlan, Day, Meal, Food, DailyTotal
+from mealplan.models import MealPlan, Day, Meal, Food, DailyTotal, FoodItem
 from mealplan.csv_manager import load_yemekler, ensure_yemek_in_db
-from mealplan.linear_optimizer import solve_meal_plan_with_pulp
-from tracker.utils import update_daily_intake, sync_daily_intakes_for_user
+from mealplan.linear_optimizer import solve_meal_plan_with_pulp, solve_week, solve_days_parallel
+from mealplan.plan_rows import (
+    PlanRow, build_plan_row, assign_row_keys, index_rows, group_by_day, group_by_meal, day_totals
+)
+from mealplan.plan_templates import load_template_plan
+from mealplan.native_planner import generate_native_plan
+from mealplan.plan_snapshot import refresh_snapshot
+from mealplan.consumption import apply_consumption
+from tracker.utils import sync_daily_intakes_for_user
 import pprint
 
 from django.conf import settings
@@ -43,7 +52,8 @@ def request_meal_plan_gpt(prompt: str):
                 {"role": "user", "content": prompt}
             ],
             temperature=0.5,
-            max_tokens=6000
+            max_tokens=6000,
+            timeout=settings.MEALPLAN_GPT_TIMEOUT
         )
         print("[request_meal_plan_gpt] => GPT'den yanıt alındı.\n", response)
     except Exception as e:
@@ -113,7 +123,7 @@ def parse_raw_7days_mealplan_ignore_dayname(assistant_reply: str):
 
 
 ########################################
-# 2) CREATE MATCHED FOODS -> DataFrame
+# 2) CREATE MATCHED FOODS -> PlanRow
 ########################################
 
 def is_snack(meal_title: str) -> bool:
@@ -146,21 +156,21 @@ def detect_meal_type_and_name(
     return std, main_index, snack_index
 
 
-def create_matched_foods_dataframe(
+def create_matched_food_rows(
     parsed_days: list,
     food_list: list,  # This comes from csv_manager.load_yemekler()
     main_meals_count=3,
     snack_meals_count=1
-) -> pd.DataFrame:
+) -> list:
     """
     parsed_days => [ { "ogunler": [...], "gunluk_toplam": {...} }, ... ]
-    Dönüş: her row = day_index, meal_name, yemek_adi, kalori, vs...
+    Dönüş: PlanRow listesi => day_index, meal_name, yemek_adi, kalori, vs...
     Using database food_list instead of CSV
     """
     if not parsed_days:
-        return pd.DataFrame()
+        return []
 
-    df_records = []
+    plan_rows = []
     default_main_names = [f"Ana Öğün-{i+1}" for i in range(main_meals_count)]
     default_snack_names = [f"Ara Öğün {i+1}" for i in range(snack_meals_count)]
 
@@ -209,69 +219,32 @@ def create_matched_foods_dataframe(
 
                 found = ensure_yemek_in_db(raw_adi, food_list)  # Use the csv_manager function
                 if found:
-                    pm = float(found.get("porsiyon_metrik", 100.0))
-                    st = float(found.get("porsiyon_artıs_birimi", 1.0))
-                    if st <= 0:
-                        st = 1.0
-                    minp = float(found.get("minimum_porsiyon_boyutu", 1.0))
-                    maxp = float(found.get("maksimum_porsiyon", 10.0))
-                    portion_type = found.get("porsiyon_turu", "porsiyon")
-                    portion_metric_unit = found.get("porsiyon_metrik_türü", "gram")
-                    ana_bilesenler = found.get("ana_bilesenler", "")
-                    tarif = found.get("tarif", "")
-
-                    if unt in ['g', 'ml']:
-                        val_std = val
-                    else:
-                        val_std = pm  # eğer "p" ise varsayılan pm
-
-                    pors = val_std / pm
-                    pors = round(pors / st) * st
-                    pors = max(pors, minp)
-                    pors = min(pors, maxp)
-
-                    df_records.append({
-                        'day_index': i+1,
-                        'meal_name': std_meal_name,
-                        'original_yemek_adi': raw_adi,
-                        'yemek_adi': found['yemek_adi'],
-                        'kalori (kcal)': float(found['kalori (kcal)']),
-                        'protein (g)': float(found['protein (g)']),
-                        'karbonhidrat (g)': float(found['karbonhidrat (g)']),
-                        'yag (g)': float(found['yag (g)']),
-                        'porsiyon_adedi': pors,
-                        'porsiyon_metrik': pm,
-                        'porsiyon_metrik_türü': portion_metric_unit,
-                        'porsiyon_turu': portion_type,
-                        'minimum_porsiyon_boyutu': minp,
-                        'porsiyon_artıs_birimi': st,
-                        'maksimum_porsiyon_adedi': maxp,
-                        'ana_bilesenler': ana_bilesenler,
-                        'tarif': tarif
-                    })
+                    # "p" (adet/porsiyon) ise varsayılan porsiyon metriği kullanılır
+                    val_std = val if unt in ['g', 'ml'] else None
+                    plan_rows.append(
+                        build_plan_row(i+1, std_meal_name, raw_adi, found, val_std)
+                    )
                 else:
                     # Database'de bulamadı => 0
-                    df_records.append({
-                        'day_index': i+1,
-                        'meal_name': std_meal_name,
-                        'original_yemek_adi': raw_adi,
-                        'yemek_adi': raw_adi,
-                        'kalori (kcal)': 0.0,
-                        'protein (g)': 0.0,
-                        'karbonhidrat (g)': 0.0,
-                        'yag (g)': 0.0,
-                        'porsiyon_adedi': 1.0,
-                        'porsiyon_metrik': 100.0,
-                        'porsiyon_metrik_türü': 'gram',
-                        'porsiyon_turu': 'porsiyon',
-                        'minimum_porsiyon_boyutu': 1.0,
-                        'porsiyon_artıs_birimi': 1.0,
-                        'maksimum_porsiyon_adedi': 10.0,
-                        'ana_bilesenler': '',
-                        'tarif': ''
-                    })
-
-    return pd.DataFrame(df_records)
+                    plan_rows.append(PlanRow(
+                        day_index=i+1,
+                        meal_name=std_meal_name,
+                        original_yemek_adi=raw_adi,
+                        yemek_adi=raw_adi,
+                        kalori=0.0,
+                        protein=0.0,
+                        karbonhidrat=0.0,
+                        yag=0.0,
+                        porsiyon_adedi=1.0,
+                        porsiyon_metrik=100.0,
+                        porsiyon_metrik_turu='gram',
+                        porsiyon_turu='porsiyon',
+                        minimum_porsiyon_boyutu=1.0,
+                        porsiyon_artis_birimi=1.0,
+                        maksimum_porsiyon_adedi=10.0,
+                    ))
+
+    return plan_rows
 
 
 ########################################
@@ -279,17 +252,19 @@ def create_matched_foods_dataframe(
 ########################################
 
 def create_final_json(parsed_days: list,
-                      df: pd.DataFrame,
+                      plan_rows: list,
                       meal_times: dict,
                       snack_times: dict,
                       start_date):
     """
     Her i için date = start_date + i
+    Satırlar tek geçişte güne ve öğüne gruplanır; her besin satırın row_key'ini taşır,
+    DB kaydı satırı isimle aramak yerine bu anahtarla bulur.
     """
     final_out = {"günler": []}
 
-    if df.empty:
-        # DF boşsa => GPT parse bilgisini ham olarak al
+    if not plan_rows:
+        # Satır yoksa => GPT parse bilgisini ham olarak al
         for i, day_obj in enumerate(parsed_days):
             final_out["günler"].append({
                 "gün": f"Gün {i+1}",
@@ -299,24 +274,26 @@ def create_final_json(parsed_days: list,
             })
         return final_out
 
+    assign_row_keys(plan_rows)
+    days = group_by_day(plan_rows)
     for i, day_obj in enumerate(parsed_days):
         day_date = start_date + timedelta(days=i)
-        subdf = df[df['day_index'] == (i+1)].copy()
+        day_rows = days.get(i+1, [])
 
         new_ogunler = []
-        for meal_name in subdf['meal_name'].unique():
+        for (_, meal_name), meal_rows in group_by_meal(day_rows).items():
             # eğer meal_name "Ara Öğün-1" vs => snack_times
             if meal_name.startswith("Ara Öğün"):
                 ogun_saati = snack_times.get(meal_name, "10:00")
             else:
                 ogun_saati = meal_times.get(meal_name, "09:00")
 
-            meal_slice = subdf[subdf['meal_name'] == meal_name]
             food_list = []
-            for _, row in meal_slice.iterrows():
+            for row in meal_rows:
                 food_list.append({
-                    "ad": row['yemek_adi'],
-                    "miktar": f"{row['porsiyon_adedi']} x {row['porsiyon_metrik']} {row['porsiyon_metrik_türü']}"
+                    "ad": row.yemek_adi,
+                    "miktar": f"{row.porsiyon_adedi} x {row.porsiyon_metrik} {row.porsiyon_metrik_turu}",
+                    "row_key": row.row_key
                 })
 
             new_ogunler.append({
@@ -325,24 +302,11 @@ def create_final_json(parsed_days: list,
                 "besinler": food_list
             })
 
-        # Günlük toplam
-        subdf['sum_kcal'] = subdf['kalori (kcal)'] * subdf['porsiyon_adedi']
-        subdf['sum_prot'] = subdf['protein (g)'] * subdf['porsiyon_adedi']
-        subdf['sum_carb'] = subdf['karbonhidrat (g)'] * subdf['porsiyon_adedi']
-        subdf['sum_fat']  = subdf['yag (g)'] * subdf['porsiyon_adedi']
-
-        daily_totals = {
-            "kalori (kcal)": round(subdf['sum_kcal'].sum(), 2),
-            "protein (g)": round(subdf['sum_prot'].sum(), 2),
-            "karbonhidrat (g)": round(subdf['sum_carb'].sum(), 2),
-            "yağ (g)": round(subdf['sum_fat'].sum(), 2),
-        }
-
         final_out["günler"].append({
             "gün": f"Gün {i+1}",
             "date": str(day_date),
             "öğünler": new_ogunler,
-            "günlük_toplam": daily_totals
+            "günlük_toplam": day_totals(day_rows)
         })
 
     return final_out
@@ -352,18 +316,182 @@ def create_final_json(parsed_days: list,
 # 4) DB KAYIT (ÖNEMLİ KISIM)
 ########################################
 
-def save_meal_plan_to_db(final_json: dict, user, final_df: pd.DataFrame):
+def build_meal_display_name(ogun_name: str, ogun_time: str) -> str:
+    """
+    "Ana Öğün-2" + "13:00" => "Öğle Yemeği #2 13:00"
+    """
+    from .views import TURKCE_MEALTYPE_MAP
+
+    short_name = ogun_name.lower().strip()
+
+    # Get base meal type (breakfast, lunch, dinner)
+    meal_type = short_name
+    # Extract the meal number if present
+    meal_number = ""
+    if "-" in short_name:
+        parts = short_name.split("-")
+        if len(parts) > 1 and parts[1].isdigit():
+            meal_number = f" #{parts[1]}"
+
+    # Get Turkish name but preserve the meal number
+    base_tr_name = TURKCE_MEALTYPE_MAP.get(meal_type.split("-")[0], meal_type)
+    tr_name = f"{base_tr_name}{meal_number}"
+
+    # Create a unique display name that includes both the type and number
+    return f"{tr_name} {ogun_time}"
+
+
+def build_foods_for_meal(meal_db, food_list: list, rows_by_key: dict) -> list:
+    """
+    Bir öğünün besinlerini, row_key ile bulunan satırlardaki makrolarla birlikte
+    kaydedilmemiş Food objelerine çevirir (bulk_create için).
+    rows_by_key => {row_key: PlanRow} (assign_row_keys / index_rows)
+    Katalog besinleri FoodItem'a bağlanır, tarif / bileşen metni kopyalanmaz.
+    """
+    foods = []
+    for bitem in food_list:
+        fname = bitem.get("ad", "???")
+
+        # besinin satırından portion_type vb. alalım
+        row = rows_by_key.get(bitem.get("row_key"))
+        if row is not None:
+            pors_count = row.porsiyon_adedi
+
+            total_cal = row.kalori * pors_count
+            total_p   = row.protein * pors_count
+            total_c   = row.karbonhidrat * pors_count
+            total_f   = row.yag * pors_count
+
+            portion_type        = row.porsiyon_turu
+            portion_metric_unit = row.porsiyon_metrik_turu
+            portion_metric      = row.porsiyon_metrik
+            food_item_id        = row.yemek_id
+            if food_item_id is not None:
+                tarif          = None
+                ana_bilesenler = None
+            else:
+                tarif          = row.tarif
+                ana_bilesenler = row.ana_bilesenler
+        else:
+            total_cal = 0
+            total_p   = 0
+            total_c   = 0
+            total_f   = 0
+            pors_count = 1
+            portion_type        = "porsiyon"
+            portion_metric_unit = "gram"
+            portion_metric      = 0.0
+            food_item_id        = None
+            tarif               = ""
+            ana_bilesenler      = ""
+
+        foods.append(Food(
+            meal=meal_db,
+            name=fname,
+            portion_type=portion_type,
+            portion_count=pors_count,
+            portion_metric_unit=portion_metric_unit,
+            portion_metric=portion_metric,
+            calories=total_cal,
+            protein=total_p,
+            carbs=total_c,
+            fats=total_f,
+            food_item_id=food_item_id,
+            tarif=tarif,
+            ana_bilesenler=ana_bilesenler,
+            consumed=False
+        ))
+    return foods
+
+
+def build_day_meals(day_db, day_item: dict) -> list:
+    """
+    Bir günün öğünlerini kaydedilmemiş Meal objelerine çevirir.
+    Dönüş: [(Meal, besin listesi)]
+    """
+    meals = []
+    for j, ogun_obj in enumerate(day_item.get("öğünler", [])):
+        ogun_name = ogun_obj.get("öğün", f"Öğün {j+1}")
+        ogun_time = ogun_obj.get("öğün_saati", "09:00")
+
+        meal_db = Meal(
+            day=day_db,
+            name=ogun_name,
+            displayed_name=build_meal_display_name(ogun_name, ogun_time),
+            order=j+1,
+            meal_time=ogun_time,
+            consumed=False
+        )
+        meals.append((meal_db, ogun_obj.get("besinler", [])))
+    return meals
+
+
+def daily_total_values(day_item: dict) -> dict:
+    gt = day_item.get("günlük_toplam", {})
+    return {
+        "calorie": float(gt.get("kalori (kcal)", 0.0)),
+        "protein": float(gt.get("protein (g)", 0.0)),
+        "carbohydrate": float(gt.get("karbonhidrat (g)", 0.0)),
+        "fat": float(gt.get("yağ (g)", 0.0)),
+    }
+
+
+def drop_missing_catalog_ids(rows_by_key: dict):
+    """
+    FoodItem'ı artık olmayan satırların (örn. eski şablon satırı) yemek_id'sini boşaltır;
+    bu besinler tarif / bileşen metnini Food üzerinde taşır. Tek sorgu.
     """
-    Planı DB'ye kaydederken, final_df içindeki makroları her Food objesine yazar:
+    ids = {row.yemek_id for row in rows_by_key.values() if row.yemek_id is not None}
+    if not ids:
+        return
+    existing = set(FoodItem.objects.filter(food_id__in=ids).values_list('food_id', flat=True))
+    for row in rows_by_key.values():
+        if row.yemek_id is not None and row.yemek_id not in existing:
+            row.yemek_id = None
+
+
+def bulk_save_meals(meals: list, rows_by_key: dict):
+    """
+    build_day_meals çıktısını kaydeder: tüm öğünler tek bulk_create, tüm besinler tek bulk_create.
+    Besinlerin meal FK'si için öğün id'leri bulk_create'ten döner (PostgreSQL / SQLite 3.35+).
+    """
+    drop_missing_catalog_ids(rows_by_key)
+    Meal.objects.bulk_create([meal_db for meal_db, _ in meals])
+    Food.objects.bulk_create([
+        food
+        for meal_db, food_list in meals
+        for food in build_foods_for_meal(meal_db, food_list, rows_by_key)
+    ])
+
+
+def save_foods_for_meal(meal_db, food_list: list, rows_by_key: dict):
+    """
+    Bir öğünün besinlerini tek sorguda Food olarak kaydeder.
+    """
+    drop_missing_catalog_ids(rows_by_key)
+    Food.objects.bulk_create(build_foods_for_meal(meal_db, food_list, rows_by_key))
+
+
+def save_day_contents(day_db, day_item: dict, rows_by_key: dict):
+    """
+    Bir günün öğünlerini, besinlerini ve günlük toplamını kaydeder.
+    day_db zaten oluşturulmuş olmalı; içi boş varsayılır.
+    """
+    bulk_save_meals(build_day_meals(day_db, day_item), rows_by_key)
+    DailyTotal.objects.update_or_create(day=day_db, defaults=daily_total_values(day_item))
+
+
+def save_meal_plan_to_db(final_json: dict, user, plan_rows: list):
+    """
+    Planı DB'ye kaydederken, plan_rows içindeki makroları her Food objesine yazar:
       - portion_type
       - portion_metric_unit
       - tarif
       - ana_bilesenler
+    Tüm kayıt tek transaction içinde, her seviye (Day / Meal / Food / DailyTotal) tek bulk_create.
+    Eski plan silinmez: yeni sürüm pasif olarak yazılır, en sonda aktif plan işaretçisi çevrilir.
+    Eski sürümler prune_meal_plans ile arka planda temizlenir.
     """
-    from .views import TURKCE_MEALTYPE_MAP
-    # Eski planları silelim
-    MealPlan.objects.filter(user=user).delete()
-
     days_list = final_json.get("günler", [])
     if not days_list:
         return None
@@ -374,148 +502,104 @@ def save_meal_plan_to_db(final_json: dict, user, final_df: pd.DataFrame):
     except:
         first_day_date = timezone.now().date()
 
-    mealplan = MealPlan.objects.create(user=user, week_start_date=first_day_date)
+    rows_by_key = index_rows(plan_rows)
 
-    for i, day_item in enumerate(days_list):
-        day_number = i + 1
-        d_str = day_item.get("date", "")
-        try:
-            day_date = datetime.strptime(d_str, "%Y-%m-%d").date()
-        except:
-            day_date = first_day_date + timedelta(days=i)
+    with transaction.atomic():
+        lock_user_plans(user)
+        last_version = MealPlan.objects.filter(user=user).aggregate(v=Max('version'))['v'] or 0
 
-        day_db = Day.objects.create(
-            meal_plan=mealplan,
-            day_number=day_number,
-            date=day_date
+        mealplan = MealPlan.objects.create(
+            user=user,
+            week_start_date=first_day_date,
+            version=last_version + 1,
+            is_active=False
         )
 
-        # Öğünler
-        ogunler_list = day_item.get("öğünler", [])
-        for j, ogun_obj in enumerate(ogunler_list):
-            ogun_name = ogun_obj.get("öğün", f"Öğün {j+1}")
-            ogun_time = ogun_obj.get("öğün_saati", "09:00")
+        days = []
+        for i, day_item in enumerate(days_list):
+            d_str = day_item.get("date", "")
+            try:
+                day_date = datetime.strptime(d_str, "%Y-%m-%d").date()
+            except:
+                day_date = first_day_date + timedelta(days=i)
 
-            short_name = ogun_name.lower().strip()
-            
-            # Get base meal type (breakfast, lunch, dinner)
-            meal_type = short_name
-            # Extract the meal number if present
-            meal_number = ""
-            if "-" in short_name:
-                parts = short_name.split("-")
-                if len(parts) > 1 and parts[1].isdigit():
-                    meal_number = f" #{parts[1]}"
-            
-            # Get Turkish name but preserve the meal number
-            base_tr_name = TURKCE_MEALTYPE_MAP.get(meal_type.split("-")[0], meal_type)
-            tr_name = f"{base_tr_name}{meal_number}"
-            
-            # Create a unique display name that includes both the type and number
-            display_name = f"{tr_name} {ogun_time}"
-
-            meal_db = Meal.objects.create(
-                day=day_db,
-                name=ogun_name,
-                displayed_name=display_name,
-                order=j+1,
-                meal_time=ogun_time,
-                consumed=False
-            )
+            days.append(Day(meal_plan=mealplan, day_number=i + 1, date=day_date))
+        Day.objects.bulk_create(days)
 
-            # Besinler
-            food_list = ogun_obj.get("besinler", [])
-            for bitem in food_list:
-                fname = bitem.get("ad", "???")
-
-                # final_df'den portion_type vb. alalım
-                df_slice = final_df[
-                    (final_df['day_index'] == day_number) &
-                    (final_df['meal_name'] == ogun_name) &
-                    (final_df['yemek_adi'] == fname)
-                ]
-                if not df_slice.empty:
-                    row = df_slice.iloc[0]
-                    kcal_each = row['kalori (kcal)']
-                    prot_each = row['protein (g)']
-                    carb_each = row['karbonhidrat (g)']
-                    fat_each  = row['yag (g)']
-                    pors_count = row['porsiyon_adedi']
-
-                    total_cal = kcal_each * pors_count
-                    total_p   = prot_each * pors_count
-                    total_c   = carb_each * pors_count
-                    total_f   = fat_each  * pors_count
-
-                    portion_type        = row['porsiyon_turu']
-                    portion_metric_unit = row['porsiyon_metrik_türü']
-                    portion_metric      = row['porsiyon_metrik']
-                    tarif               = row['tarif']
-                    ana_bilesenler      = row['ana_bilesenler']
-                else:
-                    total_cal = 0
-                    total_p   = 0
-                    total_c   = 0
-                    total_f   = 0
-                    pors_count = 1
-                    portion_type        = "porsiyon"
-                    portion_metric_unit = "gram"
-                    portion_metric      = 0.0
-                    tarif               = ""
-                    ana_bilesenler      = ""
-
-                Food.objects.create(
-                    meal=meal_db,
-                    name=fname,
-                    portion_type=portion_type,
-                    portion_count=pors_count,
-                    portion_metric_unit=portion_metric_unit,
-                    portion_metric=portion_metric,
-                    calories=total_cal,
-                    protein=total_p,
-                    carbs=total_c,
-                    fats=total_f,
-                    tarif=tarif,
-                    ana_bilesenler=ana_bilesenler,
-                    consumed=False
-                )
-
-        # Günlük toplam
-        gt = day_item.get("günlük_toplam", {})
-        DailyTotal.objects.create(
-            day=day_db,
-            calorie=float(gt.get("kalori (kcal)", 0.0)),
-            protein=float(gt.get("protein (g)", 0.0)),
-            carbohydrate=float(gt.get("karbonhidrat (g)", 0.0)),
-            fat=float(gt.get("yağ (g)", 0.0))
-        )
+        meals = []
+        for day_db, day_item in zip(days, days_list):
+            meals.extend(build_day_meals(day_db, day_item))
+        bulk_save_meals(meals, rows_by_key)
+
+        DailyTotal.objects.bulk_create([
+            DailyTotal(day=day_db, **daily_total_values(day_item))
+            for day_db, day_item in zip(days, days_list)
+        ])
+
+        mealplan.snapshot = refresh_snapshot(mealplan.id, bump=False)
+        activate_meal_plan(user, mealplan)
 
     return mealplan
 
 
-########################################
-# 5) ANA FONK => generate_and_optimize_mealplan_for_user
-########################################
+def lock_user_plans(user):
+    """
+    Aynı kullanıcının plan sürümü / aktif plan değişiklikleri (üretim, geri alma) sırayla çalışsın.
+    Kullanıcı satırı kilitlenir: ilk üretimde kilitlenecek aktif plan henüz yok, kullanıcı hep var.
+    Transaction içinde çağrılmalı.
+    """
+    list(get_user_model().objects.select_for_update().filter(pk=user.pk).values_list('pk', flat=True))
 
-def generate_and_optimize_mealplan_for_user(user, start_date=None):
+
+def activate_meal_plan(user, mealplan):
     """
-    1) Survey'den bilgileri al: daily_cal, macros, meal_times, snack_times, main_meals_count vs.
-    2) GPT'den 7 günlük plan çek
-    3) Database => DataFrame => optimize
-    4) create_final_json => (day i=0..6 => date = start_date + i)
-    5) DB kaydet (Food objelerinde makroları da kaydet!)
-    6) sync daily intakes
+    Aktif plan işaretçisini çevirir: önceki aktif pasif, verilen plan aktif olur.
+    Transaction içinde çağrılmalı; okuyanlar ya eski ya yeni planı görür, yarım planı asla.
     """
+    MealPlan.objects.active().filter(user=user).exclude(id=mealplan.id).update(is_active=False)
+    if not mealplan.is_active:
+        mealplan.is_active = True
+        mealplan.save(update_fields=['is_active'])
 
-    import json
-    from django.utils import timezone
-    from survey.models import Survey
-    from mealplan.linear_optimizer import solve_meal_plan_with_pulp
-    from tracker.utils import sync_daily_intakes_for_user
 
-    print(f"[generate_and_optimize_mealplan_for_user] => user: {user}")
+def rollback_meal_plan_for_user(user, version: int = None):
+    """
+    Aktif planı bir önceki (veya verilen) sürüme döndürür; sadece işaretçi çevrilir.
+    Sürüm prune_meal_plans ile silinmişse None döner.
+    Aktif planda tüketilmiş besin varsa geri alınmaz => ConsumedFoodsError
+    (defter kayıtları o plana ait; eski plandaki aynı besinler tekrar işaretlenince iki kez sayılırdı).
+    """
+    with transaction.atomic():
+        lock_user_plans(user)
+        current = MealPlan.objects.active().filter(user=user).first()
+        if current is not None:
+            lock_unconsumed_meals(Meal.objects.filter(day__meal_plan=current))
+        candidates = MealPlan.objects.filter(user=user, is_active=False)
+        if version is not None:
+            candidates = candidates.filter(version=version)
+        elif current is not None:
+            candidates = candidates.filter(version__lt=current.version)
+
+        target = candidates.order_by('-version').first()
+        if target is None:
+            return None
+
+        activate_meal_plan(user, target)
+
+    return target
+
 
-    # 1) Survey - We always expect a survey to exist
+########################################
+# 5) SURVEY => PLAN AYARLARI
+########################################
+
+def load_plan_settings(user):
+    """
+    Survey'den plan üretimi için gereken ayarları okur:
+    daily_cal, macros, öğün sayıları, meal_times, snack_times, aversions vs.
+    Hem haftalık üretim hem de tek gün / tek öğün yenileme bunu kullanır.
+    """
+    # We always expect a survey to exist
     survey = Survey.objects.get(user=user)
     daily_cal = survey.calorie_intake or survey.tdee or 2000
 
@@ -589,17 +673,43 @@ def generate_and_optimize_mealplan_for_user(user, start_date=None):
     economic_status = "Orta"
     cuisine_type = "Türk Mutfağı"
 
-    # Eğer start_date yoksa bugünün tarihi
-    if not start_date:
-        start_date = timezone.now().date()
-
-    # 2) GPT prompt hazırlama
     user_meal_names = []
     for idx_m in range(main_meals_count):
         user_meal_names.append(f"Ana Öğün-{idx_m+1}")
     for idx_s in range(snack_meals_count):
         user_meal_names.append(f"Ara Öğün {idx_s+1}")
 
+    return {
+        "daily_cal": daily_cal,
+        "macros": macros,
+        "main_meals_count": main_meals_count,
+        "snack_meals_count": snack_meals_count,
+        "meal_times": meal_times,
+        "snack_times": snack_times,
+        "user_aversions": user_aversions,
+        "economic_status": economic_status,
+        "cuisine_type": cuisine_type,
+        "user_meal_names": user_meal_names,
+    }
+
+
+########################################
+# 6) ANA FONK => generate_and_optimize_mealplan_for_user
+########################################
+
+def build_weekly_prompt(plan_settings: dict) -> str:
+    """
+    7 günlük plan için GPT prompt'unu hazırlar.
+    """
+    daily_cal = plan_settings["daily_cal"]
+    macros = plan_settings["macros"]
+    meal_times = plan_settings["meal_times"]
+    snack_times = plan_settings["snack_times"]
+    user_aversions = plan_settings["user_aversions"]
+    economic_status = plan_settings["economic_status"]
+    cuisine_type = plan_settings["cuisine_type"]
+    user_meal_names = plan_settings["user_meal_names"]
+
     # meal_times/snack_times'ı promptta göstermek istersek:
     # format => "Ana Öğün-1: 09:00; Ana Öğün-2: 13:00; ..."
     meal_times_str = "; ".join([f"{k}: {v}" for k, v in meal_times.items()])
@@ -640,19 +750,27 @@ def generate_and_optimize_mealplan_for_user(user, start_date=None):
     }}
     - AŞIRI ÖNEMLİ: AŞIRI ÖNEMLİ:AŞIRI ÖNEMLİ:AŞIRI ÖNEMLİ: Tam olarak 7 gün için plan oluştur. Tüm günleri tek bir yanıt içinde ver. Gün 1'den Gün 7'ye kadar her birini ayrı JSON bloğu olarak dahil et. Eksik gün olmamalı!!!!!!Eksik gün olmamalı!!!!!!Eksik gün olmamalı!!!!!!Eksik gün olmamalı!!!!!!Eksik gün olmamalı!!!!!!Eksik gün olmamalı!!!!!!
     """
+    return prompt
 
 
+def request_plan_rows_from_gpt(plan_settings: dict):
+    """
+    GPT'den 7 günlük plan ister, parse eder ve besinleri veritabanıyla eşler.
+    Dönüş: (parsed_days, plan_rows) veya başarısızsa (None, None)
+    """
+    prompt = build_weekly_prompt(plan_settings)
+
     # GPT çağır
     reply = request_meal_plan_gpt(prompt)
     if not reply:
         print("GPT döndürmedi, None geldi.")
-        return None
+        return None, None
 
-    # 3) parse
+    # parse
     parsed_days = parse_raw_7days_mealplan_ignore_dayname(reply)
     if not parsed_days:
         print("GPT parse edilemedi veya 0 gün geldi.")
-        return None
+        return None, None
 
     # sadece 7 gün
     parsed_days = parsed_days[:7]
@@ -662,58 +780,176 @@ def generate_and_optimize_mealplan_for_user(user, start_date=None):
     # Load food data from database instead of CSV
     food_list = load_yemekler()  # This returns [] if database is empty, which is fine
 
-    # DF oluştur
-    df = create_matched_foods_dataframe(
+    # Satırları oluştur
+    plan_rows = create_matched_food_rows(
         parsed_days=parsed_days,
         food_list=food_list,  # Even if empty, ensure_yemek_in_db will populate it
-        main_meals_count=main_meals_count,
-        snack_meals_count=snack_meals_count
+        main_meals_count=plan_settings["main_meals_count"],
+        snack_meals_count=plan_settings["snack_meals_count"]
     )
-    if df.empty:
-        print("create_matched_foods_dataframe => DF boş döndü")
-        return None
+    if not plan_rows:
+        print("create_matched_food_rows => satır dönmedi")
+        return None, None
+
+    return parsed_days, plan_rows
+
+
+def plan_rows_from_engines(gpt_source, native_source):
+    """
+    MEALPLAN_ENGINE / MEALPLAN_NATIVE_FALLBACK'e göre plan satırlarının kaynağı:
+    native seçiliyse önce native motor, değilse GPT; GPT başarısızsa (fallback açıksa) native.
+    gpt_source / native_source => (parsed_days, plan_rows) veya (None, None) dönen fonksiyonlar.
+    Tam plan, tek gün ve tek öğün üretimi aynı sırayı kullanır.
+    """
+    parsed_days, plan_rows = None, None
+    if settings.MEALPLAN_ENGINE == 'native':
+        parsed_days, plan_rows = native_source()
+    if plan_rows is None:
+        parsed_days, plan_rows = gpt_source()
+    if plan_rows is None and settings.MEALPLAN_NATIVE_FALLBACK and settings.MEALPLAN_ENGINE != 'native':
+        print("[plan_rows_from_engines] GPT başarısız => native motor")
+        parsed_days, plan_rows = native_source()
+    return parsed_days, plan_rows
+
+
+def solver_options(fast_path: bool = None, backend: str = None, use_cache: bool = None) -> dict:
+    """
+    Optimizer çağrıları için ortak çözücü ayarları (settings'ten; verilen değerler öncelikli).
+    """
+    return {
+        "fast_path": settings.MEALPLAN_OPTIMIZER_FAST_PATH if fast_path is None else fast_path,
+        "backend": backend or settings.MEALPLAN_SOLVER_BACKEND,
+        "time_limit": settings.MEALPLAN_SOLVE_TIMEOUT or None,
+        "mip_gap": settings.MEALPLAN_MIP_GAP or None,
+        "use_cache": settings.MEALPLAN_OPTIMIZER_CACHE if use_cache is None else use_cache,
+    }
+
+
+def optimize_single_day(day_rows: list, plan_settings: dict, fast_path: bool = None,
+                        backend: str = None, metrics: list = None, use_cache: bool = None) -> list:
+    """
+    Tek günün satırlarını kullanıcının hedeflerine göre optimize eder (porsiyonlar yerinde güncellenir).
+    Optimize edilemezse satırlar orijinal porsiyonlarıyla kalır.
+    """
+    macros = plan_settings["macros"]
+    solve_meal_plan_with_pulp(
+        day_rows,
+        kcal_target=plan_settings["daily_cal"],
+        prot_target=macros['protein'],
+        carb_target=macros['carbs'],
+        fat_target=macros['fats'],
+        kcal_tol=0.05,
+        prot_tol=0.10,
+        carb_tol=0.10,
+        fat_tol=0.10,
+        metrics=metrics,
+        **solver_options(fast_path, backend, use_cache)
+    )
+    return day_rows
+
 
-    # 4) optimize
-    unique_days = df['day_index'].unique()
-    final_df_parts = []
-
-    for day_i in unique_days:
-        slice_i = df[df['day_index'] == day_i].copy()
-        optdf, ok_status = solve_meal_plan_with_pulp(
-            slice_i,
-            kcal_target=daily_cal,
-            prot_target=macros['protein'],
-            carb_target=macros['carbs'],
-            fat_target=macros['fats'],
-            kcal_tol=0.05,
-            prot_tol=0.10,
-            carb_tol=0.10,
-            fat_tol=0.10
+def optimize_plan_days(plan_rows: list, plan_settings: dict, mode: str = None,
+                       fast_path: bool = None, backend: str = None, metrics: list = None,
+                       use_cache: bool = None) -> list:
+    """
+    Planın günlerini optimize edip aynı satır listesini döner (porsiyonlar yerinde güncellenir).
+    mode => 'week'   : tüm hafta tek model / tek solver çağrısı (solve_week)
+            'day'    : her gün ayrı model ve ayrı solver çağrısı
+            'process': günler ayrı modeller, process pool'da eşzamanlı
+    fast_path => önce NumPy çözücü, CBC sadece tolerans içinde çözülemeyen günler için.
+    backend => 'cbc' / 'highs' / 'native'; metrics => çözüm metrikleri bu listeye eklenir.
+    use_cache => daha önce çözülmüş aynı gün problemleri için çözücü çalışmaz.
+    Optimize edilemeyen gün orijinal porsiyonlarıyla kalır.
+    """
+    mode = mode or settings.MEALPLAN_OPTIMIZER_MODE
+    options = solver_options(fast_path, backend, use_cache)
+    macros = plan_settings["macros"]
+    targets = {
+        "kcal_target": plan_settings["daily_cal"],
+        "prot_target": macros['protein'],
+        "carb_target": macros['carbs'],
+        "fat_target": macros['fats'],
+        "kcal_tol": 0.05,
+        "prot_tol": 0.10,
+        "carb_tol": 0.10,
+        "fat_tol": 0.10,
+    }
+
+    if mode == 'week':
+        _, statuses = solve_week(plan_rows, metrics=metrics, **targets, **options)
+        failed = [d for d, ok in statuses.items() if not ok]
+        if failed:
+            print(f"[optimize_plan_days] optimize edilemeyen günler: {failed}")
+        return plan_rows
+
+    day_groups = list(group_by_day(plan_rows).values())
+    if mode == 'process':
+        solve_days_parallel(
+            day_groups,
+            max_workers=settings.MEALPLAN_OPTIMIZER_WORKERS or None,
+            metrics=metrics,
+            **targets,
+            **options
         )
-        if ok_status:
-            final_df_parts.append(optdf)
-        else:
-            # optimize edilemezse orijinali ekleyelim
-            final_df_parts.append(slice_i)
+        return plan_rows
+
+    for day_rows in day_groups:
+        solve_meal_plan_with_pulp(day_rows, metrics=metrics, **targets, **options)
+    return plan_rows
 
-    import pandas as pd
-    final_df = pd.concat(final_df_parts, ignore_index=True)
 
-    # 5) create_final_json => db kaydet
+def generate_and_optimize_mealplan_for_user(user, start_date=None):
+    """
+    1) Survey'den bilgileri al: daily_cal, macros, meal_times, snack_times, main_meals_count vs.
+    2) Uygun hazır şablon varsa onu kullan, yoksa GPT'den (veya native motordan) 7 günlük plan çek
+    3) Database => PlanRow satırları => optimize
+    4) create_final_json => (day i=0..6 => date = start_date + i)
+    5) DB kaydet (Food objelerinde makroları da kaydet!)
+    6) sync daily intakes
+    """
+
+    from django.utils import timezone
+    from tracker.utils import sync_daily_intakes_for_user
+
+    print(f"[generate_and_optimize_mealplan_for_user] => user: {user}")
+
+    # 1) Survey
+    plan_settings = load_plan_settings(user)
+
+    # Eğer start_date yoksa bugünün tarihi
+    if not start_date:
+        start_date = timezone.now().date()
+
+    # 2) Önce şablon kütüphanesi => bulunursa GPT'ye hiç gitmiyoruz
+    parsed_days, plan_rows = None, None
+    if settings.MEALPLAN_USE_TEMPLATES:
+        parsed_days, plan_rows = load_template_plan(plan_settings, user)
+    if plan_rows is None:
+        parsed_days, plan_rows = plan_rows_from_engines(
+            lambda: request_plan_rows_from_gpt(plan_settings),
+            lambda: generate_native_plan(plan_settings, seed=f"{user.id}-{start_date}"),
+        )
+    if plan_rows is None:
+        return None
+
+    # 3) optimize (şablon da kullanıcının kendi hedeflerine göre yeniden ölçeklenir)
+    optimize_plan_days(plan_rows, plan_settings)
+
+    # 4) create_final_json => db kaydet
     final_json = create_final_json(
         parsed_days,
-        final_df,
-        meal_times,
-        snack_times,
+        plan_rows,
+        plan_settings["meal_times"],
+        plan_settings["snack_times"],
         start_date
     )
 
-    mealplan_obj = save_meal_plan_to_db(final_json, user, final_df)
+    mealplan_obj = save_meal_plan_to_db(final_json, user, plan_rows)
     if not mealplan_obj:
         print("Plan kaydedilemedi!")
         return None
 
-    # 6) sync daily intakes
+    # 5) sync daily intakes
     sync_daily_intakes_for_user(user, lookback=90, lookahead=7)
 
     return mealplan_obj
@@ -721,7 +957,7 @@ def generate_and_optimize_mealplan_for_user(user, start_date=None):
 
 
 ########################################
-# 6) TEK GÜN request (opsiyonel)
+# 7) TEK GÜN request (opsiyonel)
 ########################################
 
 def request_gpt_for_single_day(
@@ -733,15 +969,18 @@ def request_gpt_for_single_day(
     snack_times: dict,
     user_aversions: list,
     economic_status: str,
-    cuisine_type: str
+    cuisine_type: str,
+    exclude_foods: list = None
 ):
     """
     Sadece tek bir gün için GPT'den plan ister.
-    (Opsiyonel kullanım)
+    user_meal_names tek öğün içerirse sadece o öğün istenir (öğün yenileme).
+    exclude_foods => yenilenen günde/öğünde tekrar edilmemesi gereken besinler.
     """
     user_preferences = []
     meal_times_str = "; ".join([f"{k}: {v}" for k,v in meal_times.items()])
     snack_times_str = "; ".join([f"{k}: {v}" for k,v in snack_times.items()])
+    exclude_foods_str = ', '.join(exclude_foods or []) or '-'
 
     prompt = f"""
     Aşağıdaki kriterlere göre sadece '{day_name}' günü için bir meal plan oluştur:
@@ -764,6 +1003,7 @@ def request_gpt_for_single_day(
     - **Ekonomik Durum:** {economic_status}
     - **Çeşitlilik:**
       - Tekrar etme
+      - Şu besinleri kullanma: {exclude_foods_str}
     - **Mutfak:** {cuisine_type}
 
     Cevabı JSON olarak ver, format:
@@ -792,94 +1032,314 @@ def request_gpt_for_single_day(
 
 
 ########################################
-# 7) CONSUMPTION => tracker (opsiyonel örnek)
+# 8) TEK GÜN / TEK ÖĞÜN YENİLEME
 ########################################
 
-def mark_food_as_consumed(food_id: int, user, date_str: str = None):
+class ConsumedFoodsError(Exception):
+    """Yenilenecek gün / öğünde tüketilmiş besin var; silinirse defter kaydı sahipsiz kalır."""
+
+
+def lock_unconsumed_meals(meals):
     """
-    Bir 'food_id' için consumed=True yapar,
-    'food.calories' vb. makroları 'DailyIntake'e ekler.
+    Yenilenecek öğünleri ve besinlerini kilitler (apply_consumption ile aynı sıra: önce öğünler,
+    sonra id sırasında besinler) ve tüketim durumunu kilit altında tekrar kontrol eder.
+    View'daki kontrol GPT çağrısından önce yapılır; arada tüketilen besin için ConsumedFoodsError.
+    Çağıranın transaction'ı içinde çağrılmalı.
+    """
+    meal_ids = list(meals.select_for_update(of=('self',)).order_by('id').values_list('id', flat=True))
+    consumed = list(
+        Food.objects.select_for_update(of=('self',))
+        .filter(meal_id__in=meal_ids)
+        .order_by('id')
+        .values_list('consumed', flat=True)
+    )
+    if any(consumed):
+        raise ConsumedFoodsError()
+
+
+def fixed_food_rows(foods, day_index: int) -> list:
+    """
+    Kayıtlı Food'ları optimizer'ın değiştiremeyeceği (min = max = mevcut porsiyon)
+    satırlara çevirir. Öğün yenilerken günün diğer öğünleri bu şekilde sabit kalır.
+    """
+    rows = []
+    for fd in foods:
+        count = fd.portion_count or 1.0
+        rows.append(PlanRow(
+            day_index=day_index,
+            meal_name=fd.meal.name,
+            original_yemek_adi=fd.name,
+            yemek_adi=fd.name,
+            kalori=fd.calories / count,
+            protein=fd.protein / count,
+            karbonhidrat=fd.carbs / count,
+            yag=fd.fats / count,
+            porsiyon_adedi=count,
+            porsiyon_metrik=fd.portion_metric,
+            porsiyon_metrik_turu=fd.portion_metric_unit,
+            porsiyon_turu=fd.portion_type,
+            minimum_porsiyon_boyutu=count,
+            porsiyon_artis_birimi=1.0,
+            maksimum_porsiyon_adedi=count,
+            ana_bilesenler=fd.ana_bilesenler or "",
+            tarif=fd.tarif or "",
+            yemek_id=fd.food_item_id,
+        ))
+    return rows
+
+
+def sync_day_goal(user, day_db):
+    """
+    Günün DailyTotal'ını o tarihin DailyIntake hedefine yazar.
+    """
+    from tracker.utils import update_daily_intake_goal
+
+    dt = DailyTotal.objects.get(day=day_db)
+    update_daily_intake_goal(
+        user=user,
+        date=day_db.date,
+        calories=dt.calorie,
+        protein=dt.protein,
+        carbs=dt.carbohydrate,
+        fats=dt.fat
+    )
+
+
+def request_day_rows_from_gpt(plan_settings: dict, day_number: int, exclude_foods: list):
+    """
+    GPT'den tek gün ister ve besinleri veritabanıyla eşler.
+    Dönüş: (parsed_days, day_rows) veya başarısızsa (None, None)
+    """
+    reply = request_gpt_for_single_day(
+        day_name=f"Gün {day_number}",
+        daily_cal=plan_settings["daily_cal"],
+        macros=plan_settings["macros"],
+        user_meal_names=plan_settings["user_meal_names"],
+        meal_times=plan_settings["meal_times"],
+        snack_times=plan_settings["snack_times"],
+        user_aversions=plan_settings["user_aversions"],
+        economic_status=plan_settings["economic_status"],
+        cuisine_type=plan_settings["cuisine_type"],
+        exclude_foods=exclude_foods
+    )
+    if not reply:
+        print("[request_day_rows_from_gpt] GPT döndürmedi.")
+        return None, None
+
+    parsed_days = parse_raw_7days_mealplan_ignore_dayname(reply)[:1]
+    if not parsed_days:
+        print("[request_day_rows_from_gpt] GPT parse edilemedi.")
+        return None, None
+
+    day_rows = create_matched_food_rows(
+        parsed_days=parsed_days,
+        food_list=load_yemekler(),
+        main_meals_count=plan_settings["main_meals_count"],
+        snack_meals_count=plan_settings["snack_meals_count"]
+    )
+    if not day_rows:
+        return None, None
+    return parsed_days, day_rows
+
+
+def request_meal_rows_from_gpt(plan_settings: dict, meal_db, meal_settings: dict, exclude_foods: list):
+    """
+    GPT'den sadece tek öğün ister (meal_settings => öğüne kalan kalori / makro bütçesi).
+    Dönüş: (parsed_days, rows) veya başarısızsa (None, None); satırlar meal_db.name öğününde.
+    """
+    reply = request_gpt_for_single_day(
+        day_name=f"Gün {meal_db.day.day_number} - {meal_db.name}",
+        daily_cal=round(meal_settings["daily_cal"]),
+        macros=meal_settings["macros"],
+        user_meal_names=[meal_db.name],
+        meal_times={meal_db.name: str(meal_db.meal_time)[:5]},
+        snack_times={},
+        user_aversions=plan_settings["user_aversions"],
+        economic_status=plan_settings["economic_status"],
+        cuisine_type=plan_settings["cuisine_type"],
+        exclude_foods=exclude_foods
+    )
+    if not reply:
+        print("[request_meal_rows_from_gpt] GPT döndürmedi.")
+        return None, None
+
+    parsed_days = parse_raw_7days_mealplan_ignore_dayname(reply)[:1]
+    if not parsed_days:
+        print("[request_meal_rows_from_gpt] GPT parse edilemedi.")
+        return None, None
+
+    # GPT yine de birden fazla öğün döndürürse aynı isimdekini, yoksa ilkini al
+    ogunler = parsed_days[0].get("ogunler", [])
+    if not ogunler:
+        return None, None
+    matching = [o for o in ogunler if o.get("öğün", "").strip().lower() == meal_db.name.lower()]
+    besinler = (matching or ogunler)[0].get("besinler", [])
+    scoped_days = [{"ogunler": [{"öğün": meal_db.name, "besinler": besinler}]}]
+
+    rows = create_matched_food_rows(
+        parsed_days=scoped_days,
+        food_list=load_yemekler(),
+        main_meals_count=plan_settings["main_meals_count"],
+        snack_meals_count=plan_settings["snack_meals_count"]
+    )
+    if not rows:
+        return None, None
+    for row in rows:
+        row.meal_name = meal_db.name
+    return scoped_days, rows
+
+
+def regenerate_day_for_user(user, day_number: int):
+    """
+    Planın sadece tek bir gününü yeniden üretir, diğer günlere dokunmaz:
+    1) Sadece o gün üretilir => GPT (request_gpt_for_single_day) veya native motor
+       (MEALPLAN_ENGINE / MEALPLAN_NATIVE_FALLBACK, plan_rows_from_engines)
+    2) Optimizer sadece o gün için çalışır
+    3) Sadece o günün Meal/Food/DailyTotal kayıtları ve o tarihin DailyIntake hedefi güncellenir
+    Arada tüketilen besin varsa hiçbir şey silinmez => ConsumedFoodsError
     """
-    from tracker.models import DailyIntake
     try:
-        food_obj = Food.objects.get(pk=food_id, meal__day__meal_plan__user=user)
-    except Food.DoesNotExist:
+        day_db = Day.objects.get(meal_plan__user=user, meal_plan__is_active=True, day_number=day_number)
+    except Day.DoesNotExist:
         return None
 
-    if not food_obj.consumed:
-        food_obj.consumed = True
-        food_obj.save()
+    plan_settings = load_plan_settings(user)
+    old_food_names = list(
+        Food.objects.filter(meal__day=day_db).values_list('name', flat=True)
+    )
 
-        # hangi güne eklenecek
-        if date_str:
-            try:
-                dval = datetime.strptime(date_str, "%Y-%m-%d").date()
-            except:
-                dval = food_obj.meal.day.date
-        else:
-            dval = food_obj.meal.day.date
+    parsed_days, day_rows = plan_rows_from_engines(
+        lambda: request_day_rows_from_gpt(plan_settings, day_number, old_food_names),
+        lambda: generate_native_plan(
+            plan_settings, seed=f"{user.id}-{day_db.date}", days=1, exclude=old_food_names
+        ),
+    )
+    if not day_rows:
+        return None
 
-        from tracker.utils import update_daily_intake
-        update_daily_intake(
-            user=user,
-            date=dval,
-            cals=food_obj.calories or 0,
-            protein=food_obj.protein or 0,
-            carbs=food_obj.carbs or 0,
-            fats=food_obj.fats or 0
-        )
+    optimize_single_day(day_rows, plan_settings)
+    day_item = create_final_json(
+        parsed_days,
+        day_rows,
+        plan_settings["meal_times"],
+        plan_settings["snack_times"],
+        day_db.date
+    )["günler"][0]
 
-    return food_obj
+    with transaction.atomic():
+        lock_unconsumed_meals(day_db.meals.all())
+        day_db.meals.all().delete()
+        save_day_contents(day_db, day_item, index_rows(day_rows))
+        sync_day_goal(user, day_db)
+        refresh_snapshot(day_db.meal_plan_id)
 
+    return day_db
 
-def mark_meal_as_consumed(meal_id: int, user, date_str: str = None):
+
+def regenerate_meal_for_user(user, meal_id: int):
     """
-    Bir öğünün tamamını consumed=True yapar,
-    içindeki Food'ları da consumed=True yapar,
-    tümünün makrolarını DailyIntake'e ekler.
+    Tek bir öğünü yeniden üretir.
+    Sadece o öğün üretilir (GPT veya native motor, plan_rows_from_engines); optimizer günün
+    tamamı üzerinde çalışır ama diğer öğünlerin porsiyonları sabit tutulur. DB'de sadece o
+    öğünün Food'ları, günün DailyTotal'ı ve o tarihin DailyIntake hedefi güncellenir.
+    Arada tüketilen besin varsa hiçbir şey silinmez => ConsumedFoodsError
     """
-    from tracker.models import DailyIntake
     try:
-        meal_obj = Meal.objects.get(pk=meal_id, day__meal_plan__user=user)
+        meal_db = Meal.objects.select_related('day').get(
+            id=meal_id, day__meal_plan__user=user, day__meal_plan__is_active=True
+        )
     except Meal.DoesNotExist:
         return None
 
-    if not meal_obj.consumed:
-        meal_obj.consumed = True
-        meal_obj.save()
+    day_db = meal_db.day
+    plan_settings = load_plan_settings(user)
+    macros = plan_settings["macros"]
 
-        if date_str:
-            try:
-                dval = datetime.strptime(date_str, "%Y-%m-%d").date()
-            except:
-                dval = meal_obj.day.date
-        else:
-            dval = meal_obj.day.date
-
-        from tracker.utils import update_daily_intake
-
-        total_cal = 0
-        total_p = 0
-        total_c = 0
-        total_f = 0
-
-        foods = Food.objects.filter(meal=meal_obj)
-        for f in foods:
-            if not f.consumed:
-                f.consumed = True
-                f.save()
-                total_cal += f.calories or 0
-                total_p   += f.protein  or 0
-                total_c   += f.carbs    or 0
-                total_f   += f.fats     or 0
-
-        update_daily_intake(
-            user=user,
-            date=dval,
-            cals=total_cal,
-            protein=total_p,
-            carbs=total_c,
-            fats=total_f
+    other_foods = list(
+        Food.objects.filter(meal__day=day_db).exclude(meal=meal_db).select_related('meal')
+    )
+    old_food_names = list(meal_db.foods.values_list('name', flat=True))
+
+    # Öğüne kalan bütçe => günlük hedef - diğer öğünlerin toplamı
+    meal_settings = {
+        **plan_settings,
+        "daily_cal": max(0.0, plan_settings["daily_cal"] - sum(f.calories for f in other_foods)),
+        "macros": {
+            "protein": round(max(0.0, macros['protein'] - sum(f.protein for f in other_foods)), 1),
+            "carbs": round(max(0.0, macros['carbs'] - sum(f.carbs for f in other_foods)), 1),
+            "fats": round(max(0.0, macros['fats'] - sum(f.fats for f in other_foods)), 1),
+        },
+        "user_meal_names": [meal_db.name],
+    }
+
+    _, new_rows = plan_rows_from_engines(
+        lambda: request_meal_rows_from_gpt(plan_settings, meal_db, meal_settings, old_food_names),
+        lambda: generate_native_plan(
+            meal_settings, seed=f"{user.id}-{day_db.date}-{meal_db.name}", days=1,
+            exclude=old_food_names + [f.name for f in other_foods]
+        ),
+    )
+    if not new_rows:
+        return None
+
+    day_rows = fixed_food_rows(other_foods, day_index=1) + new_rows
+    optimize_single_day(day_rows, plan_settings)
+
+    rows_by_key = assign_row_keys(new_rows)
+    food_list = [{"ad": row.yemek_adi, "row_key": row.row_key} for row in new_rows]
+    gt = day_totals(day_rows)
+
+    with transaction.atomic():
+        lock_unconsumed_meals(Meal.objects.filter(id=meal_db.id))
+        meal_db.foods.all().delete()
+        save_foods_for_meal(meal_db, food_list, rows_by_key)
+        meal_db.consumed = False
+        meal_db.save(update_fields=['consumed'])
+        DailyTotal.objects.update_or_create(
+            day=day_db,
+            defaults={
+                "calorie": float(gt["kalori (kcal)"]),
+                "protein": float(gt["protein (g)"]),
+                "carbohydrate": float(gt["karbonhidrat (g)"]),
+                "fat": float(gt["yağ (g)"]),
+            }
         )
+        sync_day_goal(user, day_db)
+        refresh_snapshot(day_db.meal_plan_id)
+
+    return meal_db
+
+
+########################################
+# 9) CONSUMPTION => tracker (opsiyonel örnek)
+########################################
+
+def _parse_intake_date(date_str: str = None):
+    """
+    "YYYY-MM-DD" => date; boş veya geçersizse None (planın günü kullanılır).
+    """
+    if not date_str:
+        return None
+    try:
+        return datetime.strptime(date_str, "%Y-%m-%d").date()
+    except ValueError:
+        return None
 
-    return meal_obj
+
+def mark_food_as_consumed(food_id: int, user, date_str: str = None):
+    """
+    Bir 'food_id' için consumed=True yapar,
+    'food.calories' vb. makroları 'DailyIntake'e ekler.
+    """
+    result = apply_consumption(user, foods={food_id: True}, intake_date=_parse_intake_date(date_str))
+    return result["foods"].get(food_id)
+
+
+def mark_meal_as_consumed(meal_id: int, user, date_str: str = None):
+    """
+    Bir öğünün tamamını consumed=True yapar,
+    içindeki Food'ları da consumed=True yapar,
+    tümünün makrolarını DailyIntake'e ekler.
+    """
+    result = apply_consumption(user, meals={meal_id: True}, intake_date=_parse_intake_date(date_str))
+    return result["meals"].get(meal_id)
@@ -4,11 +4,26 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-
-from .utils import generate_and_optimize_mealplan_for_user
-from .models import MealPlan, Food, Meal
-from .serializers import MealPlanSerializer, FoodSerializer
-from tracker.utils import update_daily_intake, remove_daily_intake, sync_daily_intakes_for_user
+from django.utils.cache import patch_cache_control
+import hashlib
+
+from .utils import (
+    generate_and_optimize_mealplan_for_user,
+    regenerate_day_for_user,
+    regenerate_meal_for_user,
+    rollback_meal_plan_for_user,
+    ConsumedFoodsError,
+)
+from .models import MealPlan, Day, Food, Meal, FoodItem
+from .serializers import DaySerializer, MealSerializer, FoodSerializer, RecipeSerializer, FoodRecipeSerializer
+from .consumption import apply_consumption
+from .plan_snapshot import (
+    plan_response_data,
+    payload_options,
+    plan_etag,
+    etag_matches,
+)
+from tracker.utils import sync_daily_intakes_for_user
 import traceback
 
 TURKCE_MEALTYPE_MAP = {
@@ -32,28 +47,191 @@ def generate_meal_plan(request):
         if not mealplan_obj:
             return Response({"detail": "Plan oluşturulamadı veya Survey eksik."},
                             status=status.HTTP_400_BAD_REQUEST)
-        
-        # plan oluşturulunca tracker'a da (DailyIntake) hedef değerleri kaydedelim
-        sync_daily_intakes_for_user(user=user, lookback=90, lookahead=7)
 
-        ser = MealPlanSerializer(mealplan_obj)
-        return Response(ser.data, status=status.HTTP_200_OK)
+        options = payload_options(request.query_params)
+        return Response(plan_response_data(mealplan_obj, options), status=status.HTTP_200_OK,
+                        headers={"ETag": plan_etag(mealplan_obj.id, mealplan_obj.revision, options)})
     except Exception as e:
         print("[ERROR] Exception in generate_meal_plan =>", e)
         traceback.print_exc()
         return Response({"detail": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def regenerate_day(request):
+    """
+    Body: { "day_number": 3 }
+    => Sadece o günü yeniden üretir (tek gün GPT + tek gün optimizasyon).
+    """
+    user = request.user
+    day_number = request.data.get("day_number")
+    if day_number is None:
+        return Response({"detail": "day_number gereklidir."}, status=400)
+
+    try:
+        day_obj = Day.objects.get(meal_plan__user=user, meal_plan__is_active=True, day_number=day_number)
+    except (Day.DoesNotExist, ValueError):
+        return Response({"detail": "Gün bulunamadı"}, status=404)
+
+    if Food.objects.filter(meal__day=day_obj, consumed=True).exists():
+        return Response({"detail": "Tüketilmiş besin içeren gün yeniden oluşturulamaz."}, status=409)
+
+    try:
+        day_obj = regenerate_day_for_user(user, day_obj.day_number)
+        if not day_obj:
+            return Response({"detail": "Gün yeniden oluşturulamadı."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        options = payload_options(request.query_params)
+        foods = 'meals__foods__food_item' if 'recipe' in options["expand"] else 'meals__foods'
+        day_obj = Day.objects.select_related('daily_total').prefetch_related(foods).get(id=day_obj.id)
+        return Response(DaySerializer(day_obj, context=options).data, status=status.HTTP_200_OK)
+    except ConsumedFoodsError:
+        return Response({"detail": "Tüketilmiş besin içeren gün yeniden oluşturulamaz."}, status=409)
+    except Exception as e:
+        print("[ERROR] Exception in regenerate_day =>", e)
+        traceback.print_exc()
+        return Response({"detail": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def regenerate_meal(request):
+    """
+    Body: { "meal_id": 45 }
+    => Sadece o öğünü yeniden üretir, günün diğer öğünleri sabit kalır.
+    """
+    user = request.user
+    meal_id = request.data.get("meal_id")
+    if meal_id is None:
+        return Response({"detail": "meal_id gereklidir."}, status=400)
+
+    try:
+        meal = Meal.objects.get(id=meal_id, day__meal_plan__user=user, day__meal_plan__is_active=True)
+    except (Meal.DoesNotExist, ValueError):
+        return Response({"detail": "Öğün bulunamadı."}, status=404)
+
+    if meal.foods.filter(consumed=True).exists():
+        return Response({"detail": "Tüketilmiş besin içeren öğün yeniden oluşturulamaz."}, status=409)
+
+    try:
+        meal = regenerate_meal_for_user(user, meal.id)
+        if not meal:
+            return Response({"detail": "Öğün yeniden oluşturulamadı."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        options = payload_options(request.query_params)
+        foods = 'foods__food_item' if 'recipe' in options["expand"] else 'foods'
+        meal = Meal.objects.prefetch_related(foods).get(id=meal.id)
+        return Response(MealSerializer(meal, context=options).data, status=status.HTTP_200_OK)
+    except ConsumedFoodsError:
+        return Response({"detail": "Tüketilmiş besin içeren öğün yeniden oluşturulamaz."}, status=409)
+    except Exception as e:
+        print("[ERROR] Exception in regenerate_meal =>", e)
+        traceback.print_exc()
+        return Response({"detail": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def rollback_meal_plan(request):
+    """
+    Body: { "version": 3 } (opsiyonel)
+    => Aktif planı bir önceki (veya verilen) sürüme döndürür. Sadece aktif işaretçi değişir.
+    """
+    user = request.user
+    version = request.data.get("version")
+    if version is not None:
+        try:
+            version = int(version)
+        except (TypeError, ValueError):
+            return Response({"detail": "version sayı olmalı."}, status=400)
+
+    try:
+        mealplan_obj = rollback_meal_plan_for_user(user, version)
+    except ConsumedFoodsError:
+        return Response({"detail": "Tüketilmiş besin içeren plan geri alınamaz."}, status=409)
+    if not mealplan_obj:
+        return Response({"detail": "Dönülebilecek plan sürümü yok."}, status=status.HTTP_404_NOT_FOUND)
+
+    sync_daily_intakes_for_user(user=user, lookback=90, lookahead=7)
+    options = payload_options(request.query_params)
+    return Response(plan_response_data(mealplan_obj, options), status=status.HTTP_200_OK,
+                    headers={"ETag": plan_etag(mealplan_obj.id, mealplan_obj.revision, options)})
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_meal_plan(request):
+    """
+    Aktif planın snapshot'ı tek (user, is_active) indeks okumasıyla döner.
+    ETag => plan id + revision. If-None-Match eşleşirse 304; sadece (id, revision) okunur.
+    Query: ?fields=name,calories,... (besin alanları) ve ?expand=recipe (tarif / ana_bilesenler).
+    """
     user = request.user
+    options = payload_options(request.query_params)
+    head = MealPlan.objects.active().filter(user=user).values_list('id', 'revision').first()
+    if head is None:
+        return Response({"detail": "Plan yok"}, status=status.HTTP_404_NOT_FOUND)
+
+    etag = plan_etag(*head, options)
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
     try:
-        mp = MealPlan.objects.get(user=user)
-        ser = MealPlanSerializer(mp)
-        return Response(ser.data, status=status.HTTP_200_OK)
+        mp = MealPlan.objects.get(id=head[0])
     except MealPlan.DoesNotExist:
         return Response({"detail": "Plan yok"}, status=status.HTTP_404_NOT_FOUND)
+    return Response(plan_response_data(mp, options), status=status.HTTP_200_OK,
+                    headers={"ETag": plan_etag(mp.id, mp.revision, options)})
+
+
+# Katalog metinleri nadiren değişir; istemci bir gün boyunca önbellekten kullanabilir
+RECIPE_MAX_AGE = 60 * 60 * 24
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_recipe(request, food_item_id: int):
+    """
+    Tek katalog besininin tarif ve bileşenleri. Plan yanıtları bunları varsayılan olarak taşımaz.
+    ETag => içerik hash'i; If-None-Match eşleşirse 304.
+    """
+    try:
+        item = FoodItem.objects.only('food_id', 'food_name', 'recipe', 'main_ingredients').get(food_id=food_item_id)
+    except FoodItem.DoesNotExist:
+        return Response({"detail": "Tarif bulunamadı."}, status=status.HTTP_404_NOT_FOUND)
+
+    return _recipe_response(request, RecipeSerializer(item).data, item.food_id)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_food_recipe(request, food_id: int):
+    """
+    Kullanıcının planındaki tek besinin tarifi; food_item=None (katalogda olmayan) besinler
+    /recipes/<food_item_id>/ ile alınamadığı için. Önbellek / ETag get_recipe ile aynı.
+    """
+    try:
+        food = Food.objects.select_related('food_item').get(id=food_id, meal__day__meal_plan__user=request.user)
+    except Food.DoesNotExist:
+        return Response({"detail": "Tarif bulunamadı."}, status=status.HTTP_404_NOT_FOUND)
+
+    return _recipe_response(request, FoodRecipeSerializer(food).data, f"f{food.id}")
+
+
+def _recipe_response(request, data: dict, etag_prefix):
+    """
+    Tarif yanıtı => ETag içerik hash'i; If-None-Match eşleşirse 304.
+    """
+    digest = hashlib.sha1(f"{data['name']}\n{data['tarif']}\n{data['ana_bilesenler']}".encode()).hexdigest()[:16]
+    etag = f'"{etag_prefix}-{digest}"'
+
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    else:
+        response = Response(data, status=status.HTTP_200_OK, headers={"ETag": etag})
+    patch_cache_control(response, private=True, max_age=RECIPE_MAX_AGE)
+    return response
 
 
 def _cannot_mark_consumed(meal: Meal):
@@ -77,40 +255,19 @@ def mark_food_consumed(request):
         return Response({"detail": "food_id is required."}, status=400)
 
     try:
-        food = Food.objects.get(id=food_id, meal__day__meal_plan__user=user)
-    except Food.DoesNotExist:
+        food = Food.objects.select_related('meal').get(
+            id=food_id, meal__day__meal_plan__user=user, meal__day__meal_plan__is_active=True
+        )
+    except (Food.DoesNotExist, ValueError, TypeError):
         return Response({"detail": "Food not found."}, status=404)
 
     if _cannot_mark_consumed(food.meal):
         return Response({"detail": "Not allowed at this time."}, status=403)
 
-    # If the client wants to mark the food as eaten
-    if is_eaten and not food.consumed:
-        update_daily_intake(
-            user=user,
-            date=food.meal.day.date,
-            calories=food.calories,
-            protein=food.protein,
-            carbs=food.carbs,
-            fats=food.fats
-        )
-        food.consumed = True
-        food.save()
-
-    # If the client wants to unmark (i.e. set as not eaten)
-    elif not is_eaten and food.consumed:
-        remove_daily_intake(
-            user=user,
-            date=food.meal.day.date,
-            calories=food.calories,
-            protein=food.protein,
-            carbs=food.carbs,
-            fats=food.fats
-        )
-        food.consumed = False
-        food.save()
+    # Tracker, snapshot ve consumed bayrağı tek transaction'da
+    result = apply_consumption(user, foods={food.id: bool(is_eaten)})
 
-    ser = FoodSerializer(food)
+    ser = FoodSerializer(result["foods"][food.id])
     return Response(ser.data, status=200)
 
 
@@ -133,43 +290,16 @@ def mark_meal_consumed(request):
         return Response({"detail": "is_eaten boolean olmalı."}, status=400)
 
     try:
-        meal = Meal.objects.get(id=meal_id, day__meal_plan__user=user)
-    except Meal.DoesNotExist:
+        result = apply_consumption(user, meals={meal_id: is_eaten})
+    except (ValueError, TypeError):
         return Response({"detail": "Öğün bulunamadı."}, status=404)
 
-    if is_eaten:
-        # Daha önce tüketilmemiş Food'lar tracker'a ekleniyor
-        for fd in meal.foods.all():
-            if not fd.consumed:
-                update_daily_intake(
-                    user=user,
-                    date=meal.day.date,
-                    calories=fd.calories,
-                    protein=fd.protein,
-                    carbs=fd.carbs,
-                    fats=fd.fats
-                )
-                fd.consumed = True
-                fd.save()
-    else:
-        # Tüketilme geri alınıyor
-        for fd in meal.foods.all():
-            if fd.consumed:
-                remove_daily_intake(
-                    user=user,
-                    date=meal.day.date,
-                    calories=fd.calories,
-                    protein=fd.protein,
-                    carbs=fd.carbs,
-                    fats=fd.fats
-                )
-                fd.consumed = False
-                fd.save()
-
-    meal.consumed = is_eaten
-    meal.save()
-
-    foods_ser = FoodSerializer(meal.foods.all(), many=True)
+    meal = result["meals"].get(int(meal_id))
+    if meal is None:
+        return Response({"detail": "Öğün bulunamadı."}, status=404)
+
+    foods = [fd for fd in result["foods"].values() if fd.meal_id == meal.id]
+    foods_ser = FoodSerializer(foods, many=True)
     return Response({
         "meal_id": meal_id,
         "meal_consumed": meal.consumed,
@@ -193,7 +323,8 @@ def bulk_update_consumed(request):
       ]
     }
     => Tek seferde hem foods hem meals consumed durumunu ayarlıyoruz.
-    => Her birinde consumed durumu değiştiyse tracker'a yansıtıyoruz.
+    => Öğün durumu içindeki tüm besinlere uygulanır; değişenler tracker'a
+       tarih başına tek makro farkı olarak yansır.
     """
     user = request.user
     data = request.data
@@ -202,73 +333,17 @@ def bulk_update_consumed(request):
     meals_data = data.get("meals", [])
 
     try:
-        mealplan = MealPlan.objects.get(user=user)
-        day_obj = mealplan.days.get(day_number=day_number)
+        day_obj = Day.objects.get(meal_plan__user=user, meal_plan__is_active=True, day_number=day_number)
     except:
         return Response({"detail": "Gün bulunamadı"}, status=404)
 
-    # Tek tek foods
-    for fd in foods_data:
-        food_id = fd.get("food_id")
-        consumed = fd.get("consumed", False)
-        try:
-            food = Food.objects.get(id=food_id, meal__day=day_obj)
-        except Food.DoesNotExist:
-            continue
-
-        if consumed and not food.consumed:
-            update_daily_intake(
-                user=user,
-                date=day_obj.date,
-                calories=food.calories,
-                protein=food.protein,
-                carbs=food.carbs,
-                fats=food.fats
-            )
-        elif (food.consumed and not consumed):
-            remove_daily_intake(
-                user=user,
-                date=day_obj.date,
-                calories=food.calories,
-                protein=food.protein,
-                carbs=food.carbs,
-                fats=food.fats
-            )
-        food.consumed = consumed
-        food.save()
-
-    # Tek tek meals
-    for md in meals_data:
-        meal_id = md.get("meal_id")
-        consumed = md.get("consumed", False)
-        try:
-            meal = Meal.objects.get(id=meal_id, day=day_obj)
-        except Meal.DoesNotExist:
-            continue
-
-        if consumed != meal.consumed:
-            meal.consumed = consumed
-            meal.save()
-            for f in meal.foods.all():
-                if consumed and not f.consumed:
-                    update_daily_intake(
-                        user=user,
-                        date=day_obj.date,
-                        calories=f.calories,
-                        protein=f.protein,
-                        carbs=f.carbs,
-                        fats=f.fats
-                    )
-                elif f.consumed and not consumed:
-                    remove_daily_intake(
-                        user=user,
-                        date=day_obj.date,
-                        calories=f.calories,
-                        protein=f.protein,
-                        carbs=f.carbs,
-                        fats=f.fats
-                    )
-                f.consumed = consumed
-                f.save()
+    try:
+        foods = {int(fd["food_id"]): bool(fd.get("consumed", False)) for fd in foods_data}
+        meals = {int(md["meal_id"]): bool(md.get("consumed", False)) for md in meals_data}
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return Response({"detail": "foods / meals formatı geçersiz."}, status=400)
+
+    # Başka güne ait id'ler sessizce atlanır
+    apply_consumption(user, foods=foods, meals=meals, day=day_obj)
 
     return Response({"detail": "Ok"}, status=200)
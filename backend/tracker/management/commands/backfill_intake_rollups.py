@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from tracker.models import DailyIntake, IntakeRollup, WeightHistory
+from tracker.rollups import ROLLUP_AGGREGATES, build_user_rollups
+
+
+class Command(BaseCommand):
+    help = 'Build weekly / monthly IntakeRollup rows from existing DailyIntake and WeightHistory data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Only backfill this user id')
+        parser.add_argument('--overwrite', action='store_true',
+                            help='Recompute existing rollups too (by default only missing buckets are created)')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        if options.get('user'):
+            user_ids = [options['user']]
+        else:
+            user_ids = sorted(
+                set(DailyIntake.objects.values_list('user_id', flat=True).distinct())
+                | set(WeightHistory.objects.values_list('user_id', flat=True).distinct())
+            )
+
+        created = 0
+        for user_id in user_ids:
+            rollups = build_user_rollups(user_id)
+            if options['dry_run']:
+                created += len(rollups)
+                continue
+
+            # Kullanıcı başına tek transaction; --overwrite yoksa mevcut kovalar korunur
+            with transaction.atomic():
+                if options['overwrite']:
+                    IntakeRollup.objects.bulk_create(
+                        rollups,
+                        update_conflicts=True,
+                        unique_fields=['user', 'period', 'period_start'],
+                        update_fields=[*ROLLUP_AGGREGATES, 'last_weight'],
+                    )
+                else:
+                    IntakeRollup.objects.bulk_create(rollups, ignore_conflicts=True)
+            created += len(rollups)
+
+        verb = 'would be written' if options['dry_run'] else 'written'
+        self.stdout.write(self.style.SUCCESS(f'{created} rollup buckets {verb} for {len(user_ids)} users'))
@@ -0,0 +1,37 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from tracker.models import SyncEvent
+
+
+class Command(BaseCommand):
+    help = 'Delete offline-sync idempotency records older than --days in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30,
+                            help='Keep idempotency keys for this many days (clients retry within this window)')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows deleted per transaction')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        batch_size = max(1, options['batch_size'])
+        expired = SyncEvent.objects.filter(created_at__lt=cutoff)
+
+        if options['dry_run']:
+            self.stdout.write(f'{expired.count()} sync events would be deleted')
+            return
+
+        deleted = 0
+        while True:
+            chunk = list(expired.values_list('id', flat=True)[:batch_size])
+            if not chunk:
+                break
+            with transaction.atomic():
+                count, _ = SyncEvent.objects.filter(id__in=chunk).delete()
+            deleted += count
+
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired sync events'))
@@ -0,0 +1,191 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, FloatField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from tracker.models import DailyIntake, IntakeEvent
+from tracker.rollups import apply_rollup_delta, day_rollup_values
+from tracker.stats_cache import invalidate_user_stats
+
+
+# Smaller differences are float noise => no opening event
+OPENING_EPSILON = 1e-6
+
+
+class Command(BaseCommand):
+    """
+    Ordering: run with --backfill once, right after the ledger deploy and before any plain
+    rebuild. A plain rebuild overwrites actual_* with the ledger sums, so pre-ledger totals of
+    days without an opening event are lost after it.
+    """
+    help = 'Recompute DailyIntake actual totals from the IntakeEvent ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Only rebuild this user id')
+        parser.add_argument('--batch-size', type=int, default=500, help='(user, date) rows per transaction')
+        parser.add_argument('--backfill', action='store_true',
+                            help='First write ledger events for pre-ledger manual / photo entries and '
+                                 'opening-balance events for the rest of actual_*; run once, before the first plain rebuild')
+        parser.add_argument('--dry-run', action='store_true', help='Only report drifted rows, do not write')
+
+    def handle(self, *args, **options):
+        user_id = options.get('user')
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+
+        if options['backfill']:
+            self.backfill_opening_events(user_id, dry_run)
+
+        events = IntakeEvent.objects.all()
+        if user_id:
+            events = events.filter(user_id=user_id)
+        totals = (
+            events.values('user_id', 'date')
+            .annotate(calories=Sum('calories'), protein=Sum('protein'), carbs=Sum('carbs'), fats=Sum('fats'))
+            .order_by('user_id', 'date')
+        )
+
+        checked = 0
+        fixed = 0
+        batch = []
+        for row in totals.iterator(chunk_size=batch_size):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                fixed += self.apply_batch(batch, dry_run)
+                checked += len(batch)
+                batch = []
+        if batch:
+            fixed += self.apply_batch(batch, dry_run)
+            checked += len(batch)
+
+        verb = 'would fix' if dry_run else 'fixed'
+        self.stdout.write(self.style.SUCCESS(f'Checked {checked} ledger days, {verb} {fixed} DailyIntake rows'))
+
+    def apply_batch(self, batch, dry_run):
+        """Compare one batch of ledger sums with DailyIntake and overwrite drifted rows"""
+        user_ids = {row['user_id'] for row in batch}
+        dates = {row['date'] for row in batch}
+        existing = {
+            (di.user_id, di.date): di
+            for di in DailyIntake.objects.filter(user_id__in=user_ids, date__in=dates)
+        }
+
+        to_create = []
+        to_update = []
+        before = {}  # (user_id, date) => rollup contribution before the overwrite
+        for row in batch:
+            di = existing.get((row['user_id'], row['date']))
+            if di is None:
+                di = DailyIntake(user_id=row['user_id'], date=row['date'])
+                to_create.append(di)
+            elif (di.actual_calorie, di.actual_protein, di.actual_carbs, di.actual_fats) == (
+                row['calories'], row['protein'], row['carbs'], row['fats']
+            ):
+                continue
+            else:
+                to_update.append(di)
+                before[(di.user_id, di.date)] = day_rollup_values(di)
+            di.actual_calorie = row['calories']
+            di.actual_protein = row['protein']
+            di.actual_carbs = row['carbs']
+            di.actual_fats = row['fats']
+
+        if not dry_run:
+            with transaction.atomic():
+                DailyIntake.objects.bulk_create(to_create, ignore_conflicts=True)
+                DailyIntake.objects.bulk_update(
+                    to_update, ['actual_calorie', 'actual_protein', 'actual_carbs', 'actual_fats']
+                )
+                # Toplu yazma sinyal göndermez => değişen günlerin hafta / ay özetleri ve istatistik önbelleği
+                for di in to_create + to_update:
+                    apply_rollup_delta(
+                        di.user_id, di.date, before.get((di.user_id, di.date), {}), day_rollup_values(di)
+                    )
+                for changed_user_id in {di.user_id for di in to_create + to_update}:
+                    invalidate_user_stats(changed_user_id)
+        return len(to_create) + len(to_update)
+
+    def backfill_opening_events(self, user_id, dry_run):
+        """
+        Carry pre-ledger totals into the ledger once, so a rebuild does not zero them.
+        1) Every manual entry / photo meal without events gets its own event (source + ref_id),
+           so a later edit or delete adjusts exactly that entry's net value.
+        2) The rest of actual_* (actual minus ledger sum, per-entry events included) goes into
+           one opening event per day. Days that already have an opening event are skipped
+           (re-running is a no-op; later drift is what a plain rebuild fixes).
+        """
+        with transaction.atomic():
+            entry_events = self.backfill_entry_events(user_id)
+            opening_events = self.backfill_day_openings(user_id)
+            if dry_run:
+                transaction.set_rollback(True)
+        self.stdout.write(
+            f'Backfilled {entry_events} manual / photo entry events, '
+            f'opening-balance events for {opening_events} days with pre-ledger totals'
+        )
+
+    def backfill_entry_events(self, user_id):
+        """Write one event per pre-ledger ManualTrackingEntry / UserPhotoMeal (their current values)"""
+        from mealgpt.models import ManualTrackingEntry
+        from mealphoto.models import UserPhotoMeal
+
+        def without_events(queryset, source, user_field):
+            queryset = queryset.annotate(has_events=Exists(IntakeEvent.objects.filter(
+                user_id=OuterRef(user_field), source=source, ref_id=OuterRef('id')
+            ))).filter(has_events=False)
+            return queryset.filter(**{user_field: user_id}) if user_id else queryset
+
+        events = [
+            IntakeEvent(
+                user_id=entry.day.user_id, date=entry.day.date, source=IntakeEvent.SOURCE_MANUAL, ref_id=entry.id,
+                calories=entry.calories, protein=entry.protein, carbs=entry.carbs, fats=entry.fats
+            )
+            for entry in without_events(
+                ManualTrackingEntry.objects.select_related('day'), IntakeEvent.SOURCE_MANUAL, 'day__user_id'
+            ).iterator()
+        ]
+        events += [
+            IntakeEvent(
+                user_id=meal.user_id, date=meal.date, source=IntakeEvent.SOURCE_PHOTO, ref_id=meal.id,
+                calories=meal.calories, protein=meal.protein, carbs=meal.carbs, fats=meal.fats
+            )
+            for meal in without_events(UserPhotoMeal.objects.all(), IntakeEvent.SOURCE_PHOTO, 'user_id').iterator()
+        ]
+        IntakeEvent.objects.bulk_create(events, batch_size=1000)
+        return len(events)
+
+    def backfill_day_openings(self, user_id):
+        """Opening event per day = actual_* minus the day's ledger sum"""
+        day_events = IntakeEvent.objects.filter(user_id=OuterRef('user_id'), date=OuterRef('date'))
+
+        def ledger_sum(field):
+            total = day_events.order_by().values('user_id', 'date').annotate(total=Sum(field)).values('total')
+            return Coalesce(Subquery(total, output_field=FloatField()), 0.0)
+
+        # Zero-actual days are included too: their entry events may need a negative opening
+        days = (
+            DailyIntake.objects
+            .annotate(has_opening=Exists(day_events.filter(source=IntakeEvent.SOURCE_OPENING)))
+            .filter(has_opening=False)
+            .annotate(
+                ledger_calories=ledger_sum('calories'), ledger_protein=ledger_sum('protein'),
+                ledger_carbs=ledger_sum('carbs'), ledger_fats=ledger_sum('fats'),
+            )
+        )
+        if user_id:
+            days = days.filter(user_id=user_id)
+
+        events = []
+        for di in days.iterator():
+            opening = (
+                di.actual_calorie - di.ledger_calories, di.actual_protein - di.ledger_protein,
+                di.actual_carbs - di.ledger_carbs, di.actual_fats - di.ledger_fats,
+            )
+            if all(abs(value) < OPENING_EPSILON for value in opening):
+                continue
+            events.append(IntakeEvent(
+                user_id=di.user_id, date=di.date, source=IntakeEvent.SOURCE_OPENING,
+                calories=opening[0], protein=opening[1], carbs=opening[2], fats=opening[3]
+            ))
+        IntakeEvent.objects.bulk_create(events, batch_size=1000)
+        return len(events)
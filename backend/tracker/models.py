@@ -2,6 +2,9 @@
 from django.db import models
 from django.conf import settings
 from django.utils import timezone
+from django.contrib.auth import get_user_model
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
 
 class UserMacroGoal(models.Model):
     """
@@ -67,6 +70,103 @@ class DailyIntake(models.Model):
         return f"{self.user} {self.date} => actual={self.actual_calorie} / goal={self.goal_calorie}"
 
 
+class IntakeEvent(models.Model):
+    """
+    Append-only tüketim defteri: her ekleme / geri alma (±) makrolarla bir satır.
+    DailyIntake.actual_* alanları bu defterin (user, date) toplamlarıdır;
+    rebuild_daily_intakes komutu toplamları defterden yeniden hesaplar.
+    """
+    SOURCE_PLAN_FOOD = 'plan_food'
+    SOURCE_MANUAL = 'manual'
+    SOURCE_PHOTO = 'photo'
+    SOURCE_OPENING = 'opening'  # Defter öncesi toplamlar (rebuild_daily_intakes --backfill)
+    SOURCE_CHOICES = [
+        (SOURCE_PLAN_FOOD, 'Plan food'),
+        (SOURCE_MANUAL, 'Manual entry'),
+        (SOURCE_PHOTO, 'Photo meal'),
+        (SOURCE_OPENING, 'Opening balance'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='intake_events')
+    date = models.DateField()
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES)
+    ref_id = models.BigIntegerField(null=True, blank=True)  # Food / ManualTrackingEntry / UserPhotoMeal id
+
+    # İşaretli (signed) değerler: geri almada negatif
+    calories = models.FloatField(default=0.0)
+    protein = models.FloatField(default=0.0)
+    carbs = models.FloatField(default=0.0)
+    fats = models.FloatField(default=0.0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'date'], name='intake_event_user_date_idx'),
+            models.Index(fields=['source', 'ref_id'], name='intake_event_ref_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} {self.date} {self.source}#{self.ref_id} => {self.calories:+} kcal"
+
+
+class IntakeRollup(models.Model):
+    """
+    Kullanıcının ISO hafta / ay bazında DailyIntake özetleri (uzun aralık grafikleri için).
+    DailyIntake değiştikçe aynı transaction'da ilgili kovalara sadece fark eklenir (tracker/rollups.py);
+    mevcut veri / tam yeniden hesaplama için backfill_intake_rollups komutu.
+    """
+    PERIOD_WEEK = 'week'
+    PERIOD_MONTH = 'month'
+    PERIOD_CHOICES = [(PERIOD_WEEK, 'ISO week'), (PERIOD_MONTH, 'Month')]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='intake_rollups')
+    period = models.CharField(max_length=5, choices=PERIOD_CHOICES)
+    period_start = models.DateField()  # Haftanın pazartesisi / ayın 1'i
+
+    # Toplamlar
+    sum_calorie = models.FloatField(default=0.0)
+    sum_protein = models.FloatField(default=0.0)
+    sum_carbs = models.FloatField(default=0.0)
+    sum_fats = models.FloatField(default=0.0)
+    sum_water = models.IntegerField(default=0)
+    sum_goal_calorie = models.FloatField(default=0.0)
+    sum_water_goal = models.IntegerField(default=0)
+
+    # Sayımlar / uyum metrikleri
+    days_recorded = models.IntegerField(default=0)   # DailyIntake kaydı olan gün
+    days_logged = models.IntegerField(default=0)     # Kalori girilmiş gün
+    days_on_target = models.IntegerField(default=0)  # Kalori hedefin ±%10'unda
+    days_water_met = models.IntegerField(default=0)  # Su hedefine ulaşılan gün
+    last_weight = models.FloatField(null=True, blank=True)  # Kovadaki son kilo ölçümü
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'period', 'period_start')
+
+    def __str__(self):
+        return f"{self.user} {self.period} {self.period_start} => {self.sum_calorie} kcal"
+
+
+class SyncEvent(models.Model):
+    """
+    Çevrimdışı senkronizasyonda uygulanmış istemci olayları (idempotency kaydı).
+    Aynı key tekrar gelirse olay yeniden uygulanmaz, saklanan sonuç döner.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='sync_events')
+    key = models.CharField(max_length=64)  # İstemcinin ürettiği idempotency key
+    kind = models.CharField(max_length=20)
+    result = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('user', 'key')
+        indexes = [models.Index(fields=['created_at'], name='sync_event_created_idx')]
+
+    def __str__(self):
+        return f"{self.user} {self.kind} {self.key}"
+
+
 class WeightHistory(models.Model):
     """
     Kullanıcının kilo takibi
@@ -83,3 +183,44 @@ class WeightHistory(models.Model):
 
     def __str__(self):
         return f"{self.user} {self.date} => {self.weight}kg"
+
+
+@receiver(pre_save, sender=DailyIntake)
+def remember_intake_before_save(sender, instance, **kwargs):
+    """Satırın kayıttan önceki halini saklar; post_save özetlere sadece farkı uygular"""
+    instance._rollup_before = DailyIntake.objects.filter(pk=instance.pk).first() if instance.pk else None
+
+
+@receiver(post_save, sender=DailyIntake)
+def refresh_rollups_on_intake_save(sender, instance, **kwargs):
+    """Kaydedilen günün hafta / ay özetlerine farkı aynı transaction'da ekler, istatistik önbelleğini düşürür"""
+    from tracker.rollups import apply_rollup_delta, day_rollup_values
+    from tracker.stats_cache import invalidate_user_stats
+    before = day_rollup_values(getattr(instance, '_rollup_before', None))
+    apply_rollup_delta(instance.user_id, instance.date, before, day_rollup_values(instance))
+    invalidate_user_stats(instance.user_id)
+
+
+@receiver(post_delete, sender=DailyIntake)
+def invalidate_stats_on_intake_delete(sender, instance, **kwargs):
+    """Silinen günün katkısını hafta / ay özetlerinden düşer, istatistik önbelleğini düşürür"""
+    # Kullanıcı silinirken özetler de cascade ile siliniyor
+    if isinstance(kwargs.get('origin'), get_user_model()):
+        return
+    from tracker.rollups import apply_rollup_delta, day_rollup_values
+    from tracker.stats_cache import invalidate_user_stats
+    apply_rollup_delta(instance.user_id, instance.date, day_rollup_values(instance), {})
+    invalidate_user_stats(instance.user_id)
+
+
+@receiver(post_save, sender=WeightHistory)
+@receiver(post_delete, sender=WeightHistory)
+def refresh_rollups_on_weight_change(sender, instance, **kwargs):
+    """Hafta / ay özetlerindeki son kiloyu günceller, istatistik önbelleğini düşürür"""
+    # Kullanıcı silinirken özetler de cascade ile siliniyor
+    if isinstance(kwargs.get('origin'), get_user_model()):
+        return
+    from tracker.rollups import refresh_weight_rollups
+    from tracker.stats_cache import invalidate_user_stats
+    refresh_weight_rollups(instance.user_id, [instance.date])
+    invalidate_user_stats(instance.user_id)
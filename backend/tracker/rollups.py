@@ -0,0 +1,141 @@
+# tracker/rollups.py
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from tracker.models import DailyIntake, IntakeRollup, WeightHistory
+from tracker.stats import bucket_start, bucket_end, TARGET_TOLERANCE
+
+PERIODS = (IntakeRollup.PERIOD_WEEK, IntakeRollup.PERIOD_MONTH)
+
+# Kovadaki DailyIntake satırlarının özet ifadeleri (backfill; day_rollup_values aynı kuralları uygular)
+ROLLUP_AGGREGATES = {
+    'sum_calorie': Sum('actual_calorie'),
+    'sum_protein': Sum('actual_protein'),
+    'sum_carbs': Sum('actual_carbs'),
+    'sum_fats': Sum('actual_fats'),
+    'sum_water': Sum('water_actual'),
+    'sum_goal_calorie': Sum('goal_calorie'),
+    'sum_water_goal': Sum('water_goal'),
+    'days_recorded': Count('id'),
+    'days_logged': Count('id', filter=Q(actual_calorie__gt=0)),
+    'days_on_target': Count('id', filter=Q(
+        goal_calorie__gt=0,
+        actual_calorie__gte=F('goal_calorie') * (1 - TARGET_TOLERANCE),
+        actual_calorie__lte=F('goal_calorie') * (1 + TARGET_TOLERANCE),
+    )),
+    'days_water_met': Count('id', filter=Q(water_goal__gt=0, water_actual__gte=F('water_goal'))),
+}
+
+
+def _upsert(user_id, period, start, values: dict):
+    """
+    Kova satırını günceller; yoksa oluşturup tekrar günceller (apply_intake_delta ile aynı kalıp).
+    """
+    values = {**values, 'updated_at': timezone.now()}
+    rows = IntakeRollup.objects.filter(user_id=user_id, period=period, period_start=start).update(**values)
+    if not rows:
+        IntakeRollup.objects.get_or_create(user_id=user_id, period=period, period_start=start)
+        IntakeRollup.objects.filter(user_id=user_id, period=period, period_start=start).update(**values)
+
+
+def _buckets(dates):
+    return {(period, bucket_start(d, period)) for d in dates for period in PERIODS}
+
+
+def day_rollup_values(di) -> dict:
+    """
+    Tek DailyIntake satırının kovaya katkısı (ROLLUP_AGGREGATES ile aynı kurallar).
+    di None ise (satır yok) katkı da yok.
+    """
+    if di is None:
+        return {}
+    actual, goal = di.actual_calorie, di.goal_calorie
+    return {
+        'sum_calorie': actual,
+        'sum_protein': di.actual_protein,
+        'sum_carbs': di.actual_carbs,
+        'sum_fats': di.actual_fats,
+        'sum_water': di.water_actual,
+        'sum_goal_calorie': goal,
+        'sum_water_goal': di.water_goal,
+        'days_recorded': 1,
+        'days_logged': int(actual > 0),
+        'days_on_target': int(goal > 0 and goal * (1 - TARGET_TOLERANCE) <= actual <= goal * (1 + TARGET_TOLERANCE)),
+        'days_water_met': int(di.water_goal > 0 and di.water_actual >= di.water_goal),
+    }
+
+
+def _recompute_bucket(user_id, period, start):
+    values = DailyIntake.objects.filter(
+        user_id=user_id, date__gte=start, date__lte=bucket_end(start, period)
+    ).aggregate(**ROLLUP_AGGREGATES)
+    _upsert(user_id, period, start, {k: v or 0 for k, v in values.items()})
+
+
+def apply_rollup_delta(user_id, date, before: dict, after: dict):
+    """
+    Günün katkısı before'dan after'a değiştiğinde (day_rollup_values) hafta ve ay kovalarına
+    sadece farkı F() ile ekler: kova başına tek UPDATE, DailyIntake'i yeniden taramaz.
+    Kova satırı henüz yoksa (backfill edilmemiş) bir kez DailyIntake'ten hesaplanır.
+    Tam yeniden hesaplama backfill_intake_rollups komutundadır.
+    Kilo (last_weight) dokunulmaz, o refresh_weight_rollups ile güncellenir.
+    """
+    delta = {k: after.get(k, 0) - before.get(k, 0) for k in ROLLUP_AGGREGATES}
+    changes = {k: F(k) + v for k, v in delta.items() if v}
+    if not changes:
+        return
+
+    changes['updated_at'] = timezone.now()
+    with transaction.atomic():
+        for period, start in sorted(_buckets([date])):
+            rows = IntakeRollup.objects.filter(user_id=user_id, period=period, period_start=start).update(**changes)
+            if not rows:
+                _recompute_bucket(user_id, period, start)
+
+
+def refresh_weight_rollups(user_id, dates):
+    """
+    Verilen tarihlerin hafta ve ay kovalarındaki son kilo ölçümünü günceller.
+    """
+    with transaction.atomic():
+        for period, start in sorted(_buckets(dates)):
+            last_weight = (
+                WeightHistory.objects.filter(user_id=user_id, date__gte=start, date__lte=bucket_end(start, period))
+                .order_by('-date')
+                .values_list('weight', flat=True)
+                .first()
+            )
+            _upsert(user_id, period, start, {'last_weight': last_weight})
+
+
+def build_user_rollups(user_id) -> list:
+    """
+    Bir kullanıcının tüm hafta / ay kovalarını (kaydedilmemiş IntakeRollup listesi) üretir:
+    her periyot için tek gruplu aggregate sorgusu + kilo listesi. backfill komutu kullanır.
+    """
+    from django.db.models.functions import TruncMonth, TruncWeek
+
+    weights = list(
+        WeightHistory.objects.filter(user_id=user_id).order_by('date').values_list('date', 'weight')
+    )
+    rollups = []
+    for period, trunc in ((IntakeRollup.PERIOD_WEEK, TruncWeek), (IntakeRollup.PERIOD_MONTH, TruncMonth)):
+        buckets = {
+            row.pop('bucket'): row
+            for row in DailyIntake.objects.filter(user_id=user_id)
+            .values(bucket=trunc('date'))
+            .annotate(**ROLLUP_AGGREGATES)
+            .order_by()
+        }
+        last_weight = {}
+        for day, weight in weights:  # Tarih sırasında => son ölçüm kalır
+            last_weight[bucket_start(day, period)] = weight
+        for start in buckets.keys() | last_weight.keys():
+            values = {k: v or 0 for k, v in buckets.get(start, {}).items()}
+            rollups.append(IntakeRollup(
+                user_id=user_id, period=period, period_start=start,
+                last_weight=last_weight.get(start), **values
+            ))
+    return rollups
@@ -0,0 +1,263 @@
+# tracker/stats.py
+
+from datetime import date, timedelta
+
+from tracker.models import DailyIntake, IntakeRollup, WeightHistory
+
+DAY = 'day'
+WEEK = 'week'
+MONTH = 'month'
+GRANULARITIES = (DAY, WEEK, MONTH)
+MAX_RANGE_DAYS = 731  # Özel aralık için üst sınır (~2 yıl)
+
+# Seri adı => DailyIntake alanı
+SERIES_FIELDS = {
+    'calories_actual': 'actual_calorie',
+    'calories_goal': 'goal_calorie',
+    'protein': 'actual_protein',
+    'carbs': 'actual_carbs',
+    'fats': 'actual_fats',
+    'water_actual': 'water_actual',
+    'water_goal': 'water_goal',
+}
+TARGET_TOLERANCE = 0.10  # Kalori hedefinin ±%10'u => "hedefte"
+ADHERENCE_FIELDS = ('days_logged', 'days_on_target', 'days_water_met')
+
+# Seri adı => IntakeRollup toplam alanı
+ROLLUP_SERIES_FIELDS = {
+    'calories_actual': 'sum_calorie',
+    'calories_goal': 'sum_goal_calorie',
+    'protein': 'sum_protein',
+    'carbs': 'sum_carbs',
+    'fats': 'sum_fats',
+    'water_actual': 'sum_water',
+    'water_goal': 'sum_water_goal',
+}
+
+
+def bucket_start(day: date, granularity: str) -> date:
+    """
+    Günün ait olduğu kovanın ilk günü: gün => kendisi, hafta => ISO pazartesi, ay => ayın 1'i.
+    """
+    if granularity == WEEK:
+        return day - timedelta(days=day.weekday())
+    if granularity == MONTH:
+        return day.replace(day=1)
+    return day
+
+
+def bucket_end(start: date, granularity: str) -> date:
+    """
+    bucket_start ile başlayan kovanın son günü.
+    """
+    if granularity == WEEK:
+        return start + timedelta(days=6)
+    if granularity == MONTH:
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    return start
+
+
+def bucket_label(start: date, granularity: str, label_format: str = None) -> str:
+    if label_format:
+        return start.strftime(label_format)
+    if granularity == MONTH:
+        return start.strftime('%Y-%m')
+    return start.isoformat()
+
+
+def is_on_target(actual, goal) -> bool:
+    """
+    Kalori hedefin ±TARGET_TOLERANCE içinde mi (rollup'taki days_on_target ile aynı kural).
+    """
+    return bool(goal) and goal > 0 and goal * (1 - TARGET_TOLERANCE) <= (actual or 0) <= goal * (1 + TARGET_TOLERANCE)
+
+
+def _new_bucket():
+    return {"sums": dict.fromkeys(SERIES_FIELDS, 0), "days": 0, "weight": None, "adherence": dict.fromkeys(ADHERENCE_FIELDS, 0)}
+
+
+def _daily_buckets(user, start_date: date, end_date: date, granularity: str) -> dict:
+    """
+    [start_date, end_date] günlerini DailyIntake / WeightHistory satırlarından kovalara toplar.
+    Her iki model birer sorguyla alınır, tarihe göre dict'te O(1) bulunur.
+    """
+    rows = DailyIntake.objects.filter(
+        user=user, date__gte=start_date, date__lte=end_date
+    ).values('date', *SERIES_FIELDS.values())
+    by_date = {row['date']: row for row in rows}
+
+    weight_by_date = dict(
+        WeightHistory.objects.filter(
+            user=user, date__gte=start_date, date__lte=end_date
+        ).values_list('date', 'weight')
+    )
+
+    buckets = {}
+    current = start_date
+    while current <= end_date:
+        bucket = buckets.setdefault(bucket_start(current, granularity), _new_bucket())
+        row = by_date.get(current)
+        if row is not None:
+            for name, field in SERIES_FIELDS.items():
+                bucket["sums"][name] += row[field] or 0
+            adherence = bucket["adherence"]
+            adherence["days_logged"] += (row['actual_calorie'] or 0) > 0
+            adherence["days_on_target"] += is_on_target(row['actual_calorie'], row['goal_calorie'])
+            adherence["days_water_met"] += (row['water_goal'] or 0) > 0 and (row['water_actual'] or 0) >= row['water_goal']
+        bucket["days"] += 1
+        if current in weight_by_date:
+            bucket["weight"] = weight_by_date[current]
+        current += timedelta(days=1)
+    return buckets
+
+
+def _rollup_buckets(user, starts: list, granularity: str) -> dict:
+    """
+    Tam kovaları IntakeRollup'tan okur (kova başına tek satır). Satırı olmayan kova 0 sayılır.
+    """
+    buckets = {start: _new_bucket() for start in starts}
+    for start in starts:
+        buckets[start]["days"] = (bucket_end(start, granularity) - start).days + 1
+    if not starts:
+        return buckets
+
+    rows = IntakeRollup.objects.filter(
+        user=user, period=granularity, period_start__gte=starts[0], period_start__lte=starts[-1]
+    ).values('period_start', 'last_weight', *ROLLUP_SERIES_FIELDS.values(), *ADHERENCE_FIELDS)
+    for row in rows:
+        bucket = buckets.get(row['period_start'])
+        if bucket is None:
+            continue
+        for name, field in ROLLUP_SERIES_FIELDS.items():
+            bucket["sums"][name] = row[field] or 0
+        bucket["weight"] = row['last_weight']
+        bucket["adherence"] = {name: row[name] for name in ADHERENCE_FIELDS}
+    return buckets
+
+
+def range_series(user, start_date: date, end_date: date, granularity: str = DAY, label_format: str = None) -> dict:
+    """
+    [start_date, end_date] aralığı için yoğun (boşluksuz) seriler.
+    Kaydı olmayan günler 0 sayılır (eski haftalık / aylık davranışı).
+    week / month => kovadaki günlerin ortalaması, kilo => kovadaki son ölçüm.
+    Aralığa tamamen giren hafta / ay kovaları IntakeRollup'tan (kova başına bir satır),
+    sadece kenardaki yarım kovalar günlük satırlardan hesaplanır.
+    Dönüş, haftalık / aylık istatistik yanıtıyla aynı formattadır.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {GRANULARITIES}")
+
+    if granularity == DAY:
+        buckets = _daily_buckets(user, start_date, end_date, granularity)
+    else:
+        full = []
+        start = bucket_start(start_date, granularity)
+        if start < start_date:
+            start = bucket_end(start, granularity) + timedelta(days=1)
+        while bucket_end(start, granularity) <= end_date:
+            full.append(start)
+            start = bucket_end(start, granularity) + timedelta(days=1)
+
+        if full:
+            head_end = full[0] - timedelta(days=1)
+            tail_start = bucket_end(full[-1], granularity) + timedelta(days=1)
+            buckets = {}
+            if start_date <= head_end:
+                buckets.update(_daily_buckets(user, start_date, head_end, granularity))
+            buckets.update(_rollup_buckets(user, full, granularity))
+            if tail_start <= end_date:
+                buckets.update(_daily_buckets(user, tail_start, end_date, granularity))
+        else:
+            buckets = _daily_buckets(user, start_date, end_date, granularity)
+
+    series = {name: [] for name in SERIES_FIELDS}
+    adherence = {name: [] for name in ADHERENCE_FIELDS}
+    labels = []
+    weights = []
+    for start, bucket in buckets.items():
+        labels.append(bucket_label(start, granularity, label_format))
+        for name, total in bucket["sums"].items():
+            series[name].append(total if granularity == DAY else round(total / bucket["days"], 2))
+        for name, count in bucket["adherence"].items():
+            adherence[name].append(count)
+        weights.append(bucket["weight"])
+
+    data = {
+        'dates': labels,
+        'calories': {
+            'actual': series['calories_actual'],
+            'goal': series['calories_goal']
+        },
+        'macros': {
+            'protein': series['protein'],
+            'carbs': series['carbs'],
+            'fats': series['fats']
+        },
+        'water': {
+            'actual': series['water_actual'],
+            'goal': series['water_goal']
+        },
+        'weight': weights
+    }
+    # Hafta / ay kovalarında gün sayımları (kayıtlı, hedefte, su hedefi tutmuş)
+    if granularity != DAY:
+        data['adherence'] = adherence
+    return data
+
+
+def manual_range_series(user, start_date: date, end_date: date, day_totals: dict, goals, label) -> dict:
+    """
+    Manuel takip (manuel giriş + fotoğraflı öğün) için yoğun günlük seriler.
+    day_totals => get_manual_entries çıktısı ({iso_tarih: {calories, protein, carbs, fats}}),
+    goals => hedefleri taşıyan DailyIntake, label => tarih => etiket.
+    Su ve kilo aralık için birer sorguyla alınır; gün sayısından bağımsız sabit sorgu.
+    """
+    water_by_date = dict(
+        DailyIntake.objects.filter(
+            user=user, date__gte=start_date, date__lte=end_date
+        ).values_list('date', 'water_actual')
+    )
+    weight_by_date = dict(
+        WeightHistory.objects.filter(
+            user=user, date__gte=start_date, date__lte=end_date
+        ).values_list('date', 'weight')
+    )
+
+    dates = []
+    macros = {'calories': [], 'protein': [], 'carbs': [], 'fats': []}
+    water_actual = []
+    weights = []
+    current = start_date
+    while current <= end_date:
+        dates.append(label(current))
+        day_entries = day_totals.get(current.isoformat(), {})
+        for name, values in macros.items():
+            values.append(day_entries.get(name, 0))
+        water_actual.append(water_by_date.get(current, 0))
+        weights.append(weight_by_date.get(current))
+        current += timedelta(days=1)
+
+    days_count = len(dates)
+    return {
+        'dates': dates,
+        'calories': {
+            'actual': macros['calories'],
+            'goal': [goals.goal_calorie] * days_count
+        },
+        'macros': {
+            'protein': macros['protein'],
+            'carbs': macros['carbs'],
+            'fats': macros['fats']
+        },
+        'water': {
+            'actual': water_actual,
+            'goal': [goals.water_goal] * days_count
+        },
+        'weight': weights,
+        'goals': {
+            'protein': goals.goal_protein,
+            'carbs': goals.goal_carbs,
+            'fats': goals.goal_fats,
+            'water': goals.water_goal
+        }
+    }
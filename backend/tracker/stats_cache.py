@@ -0,0 +1,64 @@
+# tracker/stats_cache.py
+
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+STATS_CACHE_PREFIX = 'tracker:stats'
+
+
+def _generation_key(user_id) -> str:
+    return f"{STATS_CACHE_PREFIX}:{user_id}:gen"
+
+
+def stats_generation(user_id) -> str:
+    """
+    Kullanıcının istatistik önbelleği nesli. Yanıt anahtarları bunu içerir;
+    nesil değişince eski yanıtlar okunmaz (TTL ile düşer). Yoksa yeni nesil açılır.
+    """
+    key = _generation_key(user_id)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        generation = cache.get(key)
+    return generation
+
+
+def invalidate_user_stats(user_id):
+    """
+    Kullanıcının tüm istatistik yanıtlarını tek yazma ile geçersiz kılar (yeni nesil).
+    Transaction içindeyse commit sonrasında çalışır; böylece commit öncesi okunan
+    eski veri yeni nesil altında önbelleğe yazılamaz.
+    """
+    transaction.on_commit(lambda: cache.set(_generation_key(user_id), uuid.uuid4().hex, None))
+
+
+def _range_part(range_key) -> str:
+    """
+    Aralık değerlerini anahtar parçasına çevirir: tarihler ISO, çoklu değerler ":" ile.
+    repr kullanılmaz (boşluk / parantez => memcached'de geçersiz anahtar).
+    """
+    values = range_key if isinstance(range_key, (tuple, list)) else (range_key,)
+    return ":".join(v.isoformat() if hasattr(v, 'isoformat') else str(v) for v in values)
+
+
+def cached_stats(user_id, endpoint: str, range_key, build):
+    """
+    (user, endpoint, range) için önbellekteki yanıtı döner; yoksa build() ile üretip saklar.
+    range_key => aralığı belirleyen değer veya tuple (tarihler, sayfa vb.), _range_part ile anahtara girer.
+    build() veritabanına yazmamalı (örn. DailyIntake oluşturmak): yazma sinyali nesli değiştirir,
+    yanıt eski nesil altında kalır. Okuma için tracker.views.read_daily_intake.
+    TRACKER_STATS_CACHE kapalıysa doğrudan build().
+    """
+    if not settings.TRACKER_STATS_CACHE:
+        return build()
+
+    # Nesil, veri okunmadan ÖNCE alınır: build sırasında gelen yazma yeni nesle geçer
+    key = f"{STATS_CACHE_PREFIX}:{user_id}:{stats_generation(user_id)}:{endpoint}:{_range_part(range_key)}"
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        cache.set(key, data, settings.TRACKER_STATS_CACHE_TTL)
+    return data
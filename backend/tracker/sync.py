@@ -0,0 +1,307 @@
+# tracker/sync.py
+
+from datetime import date
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from mealgpt.models import ManualTrackingDay, ManualTrackingEntry
+from mealplan.consumption import apply_consumption
+from mealplan.models import Food, Meal
+from tracker.models import DailyIntake, SyncEvent
+
+MAX_SYNC_EVENTS = 500  # Tek istekte kabul edilen en fazla olay
+EVENT_TYPES = ('food', 'meal', 'water', 'manual_add', 'manual_delete')
+
+
+class SyncConflict(Exception):
+    """Aynı key'ler başka bir istekte o anda uygulanıyor => istemci tekrar denemeli."""
+
+
+class SyncEventError(Exception):
+    """Olay geçersiz veya hedefi bulunamadı; olay 'rejected' olarak saklanır."""
+
+
+def _parse_date(value, default=None):
+    if not value:
+        return default or timezone.now().date()
+    try:
+        return date.fromisoformat(str(value))
+    except ValueError:
+        raise SyncEventError("Geçersiz tarih")
+
+
+def _number(event, field, default=None):
+    value = event.get(field, default)
+    if value is None:
+        raise SyncEventError(f"{field} gerekli")
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise SyncEventError(f"Geçersiz {field}")
+
+
+def _object_id(event, field):
+    try:
+        return int(event[field])
+    except (KeyError, TypeError, ValueError):
+        raise SyncEventError(f"{field} gerekli")
+
+
+class _ConsumptionBatch:
+    """
+    Ardışık food / meal olaylarını tek apply_consumption çağrısında toplar.
+    apply_consumption'da öğün durumu besin durumunun önüne geçtiği için,
+    bir öğünden SONRA gelen besin olayı önce bekleyenleri uygular (sıra korunur).
+    """
+
+    def __init__(self, user, state):
+        self.user = user
+        self.state = state
+        self.foods = {}
+        self.meals = {}
+        self.pending = []  # (result, type, id)
+
+    def add(self, result, event_type, object_id, consumed):
+        if event_type == 'food' and self.meals:
+            self.flush()
+        target = self.foods if event_type == 'food' else self.meals
+        target[object_id] = consumed
+        self.pending.append((result, event_type, object_id))
+
+    def flush(self):
+        if not self.pending:
+            return
+        applied = apply_consumption(self.user, foods=self.foods, meals=self.meals)
+        for result, event_type, object_id in self.pending:
+            rows = applied["foods"] if event_type == 'food' else applied["meals"]
+            if object_id not in rows:
+                result.update(status='rejected', detail="Bulunamadı")
+                continue
+            row = rows[object_id]
+            self.state["foods" if event_type == 'food' else "meals"][object_id] = row.consumed
+        for fd in applied["foods"].values():
+            self.state["foods"][fd.id] = fd.consumed
+            self.state["dates"].add(fd.meal.day.date)
+        self.foods, self.meals, self.pending = {}, {}, []
+
+
+def _apply_water(user, event, state):
+    from tracker.views import get_or_create_daily_intake
+
+    amount = _number(event, 'amount')
+    if amount < 0:
+        raise SyncEventError("Geçersiz miktar")
+    target_date = _parse_date(event.get('date'))
+    daily_intake = get_or_create_daily_intake(user, target_date)
+    daily_intake.water_actual = int(amount)
+    daily_intake.save(update_fields=['water_actual'])
+    state["dates"].add(target_date)
+    return target_date
+
+
+def _apply_manual_add(user, event, state, result):
+    name = (event.get('name') or '').strip()
+    if not name:
+        raise SyncEventError("Geçersiz isim")
+    calories = _number(event, 'calories')
+    if calories < 0:
+        raise SyncEventError("Geçersiz kalori değeri")
+    entry_date = _parse_date(event.get('date'))
+
+    day, _ = ManualTrackingDay.objects.get_or_create(user=user, date=entry_date)
+    # Deftere / günlük toplama yazma post_save sinyalinde
+    entry = ManualTrackingEntry.objects.create(
+        day=day,
+        name=name,
+        calories=calories,
+        protein=_number(event, 'protein', 0),
+        carbs=_number(event, 'carbs', 0),
+        fats=_number(event, 'fats', 0),
+        grams=_number(event, 'grams', 100.0),
+    )
+    result["entry_id"] = entry.id
+    result["date"] = entry_date.isoformat()
+    state["manual_entries"][event["key"]] = entry.id
+    state["dates"].add(entry_date)
+
+
+def _apply_manual_delete(user, event, state, entry_ids_by_key):
+    # Çevrimdışı eklenen kayıt, sunucu id'si yerine ekleme olayının key'i ile silinebilir
+    if event.get('entry_key'):
+        entry_id = entry_ids_by_key.get(event['entry_key'])
+    else:
+        entry_id = _object_id(event, 'entry_id')
+
+    entry = ManualTrackingEntry.objects.select_related('day').filter(id=entry_id, day__user=user).first()
+    if entry is None:
+        raise SyncEventError("Kayıt bulunamadı")
+    state["dates"].add(entry.day.date)
+    entry.delete()
+    return entry.day.date
+
+
+def _replay_targets(key, event, stored, state, replayed):
+    """
+    Tekrar gelen (duplicate) olayın hedeflerini toplar => yanıttaki state yine dolu olsun.
+    Öncelik saklanan sonuçta (food_id / meal_id / date / entry_id); eski kayıtlarda olayın kendisi.
+    Reddedilmiş olayların hedefi yok.
+    """
+    stored = stored or {}
+    if stored.get("outcome") == 'rejected':
+        return
+    event_type = event.get('type')
+    if event_type in ('food', 'meal'):
+        field = f"{event_type}_id"
+        try:
+            object_id = int(stored.get(field) or event[field])
+        except (KeyError, TypeError, ValueError):
+            return
+        replayed["foods" if event_type == 'food' else "meals"].add(object_id)
+        return
+    if event_type == 'manual_add' and stored.get("entry_id"):
+        state["manual_entries"][key] = stored["entry_id"]
+    try:
+        target_date = stored.get("date") or (event_type != 'manual_delete' and event.get('date'))
+        if target_date:
+            state["dates"].add(_parse_date(target_date))
+    except SyncEventError:
+        pass
+
+
+def _replayed_state(user, state, replayed):
+    """
+    Duplicate food / meal hedeflerinin güncel consumed durumları ve tarihleri (tek sorgu / tip).
+    Öğün olayı besinlerini de kapsar (ilk uygulamadaki state gibi).
+    Bu istekte zaten uygulanmış hedeflerin durumu değişmez.
+    """
+    if not replayed["foods"] and not replayed["meals"]:
+        return
+    foods = Food.objects.filter(
+        Q(id__in=replayed["foods"]) | Q(meal_id__in=replayed["meals"]), meal__day__meal_plan__user=user
+    ).values_list('id', 'consumed', 'meal__day__date')
+    for food_id, consumed, day_date in foods:
+        state["foods"].setdefault(food_id, consumed)
+        state["dates"].add(day_date)
+    meals = Meal.objects.filter(
+        id__in=replayed["meals"], day__meal_plan__user=user
+    ).values_list('id', 'consumed', 'day__date')
+    for meal_id, consumed, day_date in meals:
+        state["meals"].setdefault(meal_id, consumed)
+        state["dates"].add(day_date)
+
+
+def _intake_state(user, dates) -> dict:
+    rows = DailyIntake.objects.filter(user=user, date__in=dates).values(
+        'date', 'actual_calorie', 'actual_protein', 'actual_carbs', 'actual_fats', 'water_actual', 'water_goal'
+    )
+    return {
+        row['date'].isoformat(): {
+            'calories': row['actual_calorie'],
+            'protein': row['actual_protein'],
+            'carbs': row['actual_carbs'],
+            'fats': row['actual_fats'],
+            'water_actual': row['water_actual'],
+            'water_goal': row['water_goal'],
+        }
+        for row in rows
+    }
+
+
+def apply_sync_batch(user, events: list) -> dict:
+    """
+    İstemcinin sıralı olay listesini tek transaction'da uygular.
+    Her olay => {"key": "...", "type": food|meal|water|manual_add|manual_delete, ...}
+      food / meal       => food_id / meal_id, consumed
+      water             => amount (ml, günün toplamı), date
+      manual_add        => name, calories, protein, carbs, fats, grams, date
+      manual_delete     => entry_id veya entry_key (manual_add olayının key'i)
+    Daha önce görülen key'ler tekrar uygulanmaz, saklanan sonuç "duplicate" ile döner;
+    hedefleri (besin / öğün / tarih) yine state'e eklenir => tekrar gönderilen batch de güncel durumu alır.
+    Dönüş: {"results": [...], "state": {"foods", "meals", "manual_entries", "intake"}}
+    Aynı key'ler eşzamanlı başka bir istekte işleniyorsa SyncConflict.
+    """
+    keys = [str(e.get('key') or '') for e in events]
+    state = {"foods": {}, "meals": {}, "manual_entries": {}, "dates": set()}
+    results = []
+
+    with transaction.atomic():
+        seen = {
+            ev.key: ev
+            for ev in SyncEvent.objects.filter(user=user, key__in=[k for k in keys if k])
+        }
+
+        # Yeni key'leri önce sahiplen: eşzamanlı aynı batch unique kısıtına takılır
+        claimed = {}
+        for key, event in zip(keys, events):
+            if key and key not in seen and key not in claimed:
+                claimed[key] = SyncEvent(user=user, key=key, kind=str(event.get('type', ''))[:20])
+        try:
+            with transaction.atomic():
+                SyncEvent.objects.bulk_create(claimed.values())
+        except IntegrityError:
+            raise SyncConflict()
+        claimed = {
+            ev.key: ev for ev in SyncEvent.objects.filter(user=user, key__in=claimed.keys())
+        }
+
+        entry_ids_by_key = {
+            key: (ev.result or {}).get('entry_id') for key, ev in seen.items() if ev.kind == 'manual_add'
+        }
+        batch = _ConsumptionBatch(user, state)
+        handled = set()
+        replayed = {"foods": set(), "meals": set()}
+
+        for key, event in zip(keys, events):
+            if not key:
+                results.append({"key": None, "status": "rejected", "detail": "key gerekli"})
+                continue
+            if key in seen or key in handled:
+                stored = seen[key].result if key in seen else None
+                results.append({**(stored or {"key": key}), "status": "duplicate"})
+                if key in seen:
+                    _replay_targets(key, event, stored, state, replayed)
+                continue
+            handled.add(key)
+
+            result = {"key": key, "status": "applied"}
+            results.append(result)
+            event_type = event.get('type')
+            try:
+                if event_type not in EVENT_TYPES:
+                    raise SyncEventError(f"Bilinmeyen olay tipi: {event_type}")
+                if event_type in ('food', 'meal'):
+                    consumed = event.get('consumed')
+                    if not isinstance(consumed, bool):
+                        raise SyncEventError("consumed boolean olmalı")
+                    object_id = _object_id(event, f"{event_type}_id")
+                    result[f"{event_type}_id"] = object_id
+                    batch.add(result, event_type, object_id, consumed)
+                    continue
+
+                # Plan dışı olaylar sıradan bağımsız; yine de bekleyen tüketimler önce uygulanır
+                batch.flush()
+                if event_type == 'water':
+                    result["date"] = _apply_water(user, event, state).isoformat()
+                elif event_type == 'manual_add':
+                    _apply_manual_add(user, event, state, result)
+                    entry_ids_by_key[key] = result["entry_id"]
+                else:
+                    result["date"] = _apply_manual_delete(user, event, state, entry_ids_by_key).isoformat()
+            except SyncEventError as e:
+                result.update(status='rejected', detail=str(e))
+
+        batch.flush()
+        _replayed_state(user, state, replayed)
+
+        # Olay sonuçlarını sakla => aynı key tekrar gelirse aynı cevap
+        for result in results:
+            ev = claimed.get(result.get("key"))
+            if ev is not None and ev.result is None:
+                ev.result = {k: v for k, v in result.items() if k != 'status'} | {"outcome": result["status"]}
+        SyncEvent.objects.bulk_update(claimed.values(), ['result'])
+
+        state["intake"] = _intake_state(user, state.pop("dates"))
+
+    return {"results": results, "state": state}
@@ -10,6 +10,9 @@ urlpatterns = [
     # Water tracking
     path('water/', views.update_water_intake, name='update_water_intake'),
     
+    # Offline sync (idempotent batch)
+    path('sync/', views.sync_events, name='sync_events'),
+    
     # Weight tracking
     path('weight/', views.log_weight, name='log_weight'),
     path('weight/history/', views.get_weight_history, name='get_weight_history'),
@@ -18,6 +21,7 @@ urlpatterns = [
     path('statistics/daily/', views.get_daily_statistics, name='get_daily_statistics'),
     path('statistics/weekly/', views.get_weekly_statistics, name='get_weekly_statistics'),
     path('statistics/monthly/', views.get_monthly_statistics, name='get_monthly_statistics'),
+    path('statistics/range/', views.get_range_statistics, name='get_range_statistics'),
     path('statistics/daily/manual/', views.get_daily_manual_statistics, name='get_daily_manual_statistics'),
     path('statistics/weekly/manual/', views.get_weekly_manual_statistics, name='get_weekly_manual_statistics'),
     path('statistics/monthly/manual/', views.get_monthly_manual_statistics, name='get_monthly_manual_statistics'),
@@ -1,60 +1,163 @@
-from tracker.models import DailyIntake
+from django.db import transaction
+from django.db.models import F, Sum
 
-def update_daily_intake(user, date, calories, protein, carbs, fats):
+from tracker.models import DailyIntake, IntakeEvent
+from tracker.rollups import apply_rollup_delta, day_rollup_values
+from tracker.stats_cache import invalidate_user_stats
+
+MACRO_FIELDS = {
+    "calories": "actual_calorie",
+    "protein": "actual_protein",
+    "carbs": "actual_carbs",
+    "fats": "actual_fats",
+}
+
+
+def apply_intake_delta(user, date, calories=0.0, protein=0.0, carbs=0.0, fats=0.0):
     """
-    ...
+    DailyIntake.actual_* alanlarına (±) değerleri veritabanında F() ile ekler (upsert).
+    Okuma-yazma yok => eşzamanlı istekler birbirinin güncellemesini ezmez.
+    Kayıt zaten varsa tek UPDATE; yoksa oluşturulup tekrar UPDATE edilir.
+    Günün hafta / ay özetlerine (IntakeRollup) aynı transaction'da sadece fark eklenir.
     """
-    di, created = DailyIntake.objects.get_or_create(
-        user=user,
-        date=date,
-        defaults={
-            "goal_calorie": 0.0,
-            "goal_protein": 0.0,
-            "goal_carbs":   0.0,
-            "goal_fats":    0.0
-        }
-    )
-    di.actual_calorie += calories
-    di.actual_protein += protein
-    di.actual_carbs   += carbs
-    di.actual_fats    += fats
-    di.save()
+    deltas = {"calories": calories, "protein": protein, "carbs": carbs, "fats": fats}
+    changes = {col: F(col) + (deltas[key] or 0.0) for key, col in MACRO_FIELDS.items()}
+
+    rows = DailyIntake.objects.filter(user=user, date=date).update(**changes)
+    if not rows:
+        # get_or_create, aynı anda oluşturma yarışında IntegrityError'u kendisi yakalar
+        DailyIntake.objects.get_or_create(user=user, date=date)
+        DailyIntake.objects.filter(user=user, date=date).update(**changes)
+
+    # .update() sinyal göndermez => hafta / ay özetleri ve istatistik önbelleği burada.
+    # Önceki hali = güncel satır - delta (satır yeni oluştuysa o hali post_save zaten işledi)
+    di = DailyIntake.objects.get(user=user, date=date)
+    after = day_rollup_values(di)
+    for key, col in MACRO_FIELDS.items():
+        setattr(di, col, getattr(di, col) - (deltas[key] or 0.0))
+    apply_rollup_delta(user.pk, date, day_rollup_values(di), after)
+    invalidate_user_stats(user.pk)
+
+
+def record_intake_event(user, date, calories, protein, carbs, fats, source=IntakeEvent.SOURCE_PLAN_FOOD, ref_id=None):
+    """
+    Deftere bir satır ekler ve aynı transaction içinde günlük toplamı günceller.
+    Geri almalar negatif değerlerle kaydedilir; toplamlar kırpılmaz (max(0, ...) yok).
+    """
+    calories = calories or 0.0
+    protein = protein or 0.0
+    carbs = carbs or 0.0
+    fats = fats or 0.0
+    if not (calories or protein or carbs or fats):
+        return None
+
+    with transaction.atomic():
+        event = IntakeEvent.objects.create(
+            user=user, date=date, source=source, ref_id=ref_id,
+            calories=calories, protein=protein, carbs=carbs, fats=fats
+        )
+        apply_intake_delta(user, date, calories, protein, carbs, fats)
+    return event
+
+
+def record_intake_batch(user, items, source=IntakeEvent.SOURCE_PLAN_FOOD):
+    """
+    items => [{"date", "ref_id", "calories", "protein", "carbs", "fats"}] (işaretli değerler)
+    Tüm satırlar tek bulk_create ile deftere yazılır; toplamlar her tarih için
+    tek bir birleştirilmiş F() güncellemesiyle uygulanır. Etkilenen tarihler döner.
+    """
+    events = []
+    per_date = {}
+    for item in items:
+        macros = {key: item.get(key) or 0.0 for key in MACRO_FIELDS}
+        if not any(macros.values()):
+            continue
+        events.append(IntakeEvent(user=user, date=item["date"], source=source, ref_id=item.get("ref_id"), **macros))
+        totals = per_date.setdefault(item["date"], dict.fromkeys(MACRO_FIELDS, 0.0))
+        for key, value in macros.items():
+            totals[key] += value
+
+    if not events:
+        return []
+
+    with transaction.atomic():
+        IntakeEvent.objects.bulk_create(events)
+        for date, totals in per_date.items():
+            apply_intake_delta(user, date, **totals)
+    return list(per_date)
 
 
-def remove_daily_intake(user, date, calories, protein, carbs, fats):
+def update_daily_intake(user, date, calories, protein, carbs, fats, source=IntakeEvent.SOURCE_PLAN_FOOD, ref_id=None):
+    """
+    Tüketilen makroları deftere (+) yazar ve o günün actual toplamına ekler.
+    """
+    return record_intake_event(user, date, calories, protein, carbs, fats, source=source, ref_id=ref_id)
+
+
+def remove_daily_intake(user, date, calories, protein, carbs, fats, source=IntakeEvent.SOURCE_PLAN_FOOD, ref_id=None):
     """
     Bir yemek iade edilir veya 'consumed=False' yapılırsa, actual makrolardan geri alır.
+    Deftere (-) satır yazılır; toplam, eklemenin tam tersi kadar azalır.
     """
-    try:
-        di = DailyIntake.objects.get(user=user, date=date)
-    except DailyIntake.DoesNotExist:
-        return  # Yoksa pas
-
-    di.actual_calorie = max(0, di.actual_calorie - calories)
-    di.actual_protein = max(0, di.actual_protein - protein)
-    di.actual_carbs   = max(0, di.actual_carbs - carbs)
-    di.actual_fats    = max(0, di.actual_fats - fats)
+    return record_intake_event(
+        user, date, -(calories or 0.0), -(protein or 0.0), -(carbs or 0.0), -(fats or 0.0),
+        source=source, ref_id=ref_id
+    )
+
+
+def set_intake_for_ref(user, date, source, ref_id, calories=0.0, protein=0.0, carbs=0.0, fats=0.0):
+    """
+    Bir kaynağın (örn. manuel giriş, fotoğraflı öğün) deftere yansıyan net değerini
+    verilen değerlere eşitler: sadece aradaki fark kadar (±) satır yazılır.
+    Kaynağın tarihi değiştiyse eski tarihteki net değer sıfırlanır. Silmede 0 ile çağrılır.
+    """
+    target = {"calories": calories or 0.0, "protein": protein or 0.0, "carbs": carbs or 0.0, "fats": fats or 0.0}
+
+    with transaction.atomic():
+        net_by_date = (
+            IntakeEvent.objects.filter(user=user, source=source, ref_id=ref_id)
+            .values('date')
+            .annotate(**{f"net_{k}": Sum(k) for k in target})
+        )
+        seen_date = False
+        for net in net_by_date:
+            wanted = target if net['date'] == date else dict.fromkeys(target, 0.0)
+            seen_date = seen_date or net['date'] == date
+            delta = {k: round(wanted[k] - (net[f"net_{k}"] or 0.0), 6) for k in target}
+            record_intake_event(user, net['date'], source=source, ref_id=ref_id, **delta)
+        if not seen_date:
+            record_intake_event(user, date, source=source, ref_id=ref_id, **target)
+
+
+def update_daily_intake_goal(user, date, calories, protein, carbs, fats):
+    """
+    Plan gününün hedef makrolarını o tarihin DailyIntake kaydına yazar.
+    """
+    di, created = DailyIntake.objects.get_or_create(user=user, date=date)
+    di.goal_calorie = calories
+    di.goal_protein = protein
+    di.goal_carbs   = carbs
+    di.goal_fats    = fats
     di.save()
 
 # tracker/utils.py
 
 def sync_daily_intakes_for_user(user, lookback=90, lookahead=7):
+    """
+    Aktif planın günlerinin hedeflerini DailyIntake'e yazar.
+    Eski DailyIntake satırları silinmez (lookback sadece log için): actual_* defterin
+    (IntakeEvent) toplamıdır, satır silinirse rebuild günü hedefsiz geri getirir ve
+    defterden / DailyIntake'ten hesaplanan özetler ayrışır.
+    """
     from mealplan.models import MealPlan, Day
-    from django.utils import timezone
-    from tracker.models import DailyIntake
-    from datetime import timedelta
-    
-    # 1) lookback gününden daha eski kayıtları silelim
-    oldest_allowed = timezone.now().date() - timedelta(days=lookback)
-    DailyIntake.objects.filter(user=user, date__lt=oldest_allowed).delete()
 
     try:
-        mealplan = MealPlan.objects.get(user=user)
+        mealplan = MealPlan.objects.active().get(user=user)
     except MealPlan.DoesNotExist:
         print("[sync_daily_intakes_for_user] No plan => done.")
         return
 
-    # 2) Var olan plan günlerinin DailyIntake'lerini güncelle
+    # 1) Var olan plan günlerinin DailyIntake'lerini güncelle
     for day_obj in mealplan.days.all():
         dt = day_obj.date
         if hasattr(day_obj, 'daily_total'):
@@ -68,14 +171,9 @@ def sync_daily_intakes_for_user(user, lookback=90, lookahead=7):
             gcarb = 0
             gfat  = 0
 
-        di, created = DailyIntake.objects.get_or_create(user=user, date=dt)
-        di.goal_calorie = gcal
-        di.goal_protein = gprot
-        di.goal_carbs   = gcarb
-        di.goal_fats    = gfat
-        di.save()
+        update_daily_intake_goal(user, dt, gcal, gprot, gcarb, gfat)
 
-    # 3) Geleceğe yönelik lookahead kadar gün isterseniz create edebilirsiniz (opsiyonel)
+    # 2) Geleceğe yönelik lookahead kadar gün isterseniz create edebilirsiniz (opsiyonel)
     # ...
     
     print(f"[sync_daily_intakes_for_user] => completed for user={user}, with lookback={lookback}, lookahead={lookahead}")
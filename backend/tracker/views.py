@@ -1,5 +1,6 @@
 from django.utils import timezone
-from django.db.models import Sum
+from django.db.models import Sum, F
+from django.db.models.functions import TruncDate
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
@@ -8,10 +9,15 @@ from datetime import timedelta, date
 
 from .models import DailyIntake, UserMacroGoal, WeightHistory, UserCustomGoal
 from .serializers import DailyIntakeSerializer, WeightHistorySerializer, UserMacroGoalSerializer, UserCustomGoalSerializer
+from .sync import apply_sync_batch, SyncConflict, MAX_SYNC_EVENTS
+from .stats import range_series, manual_range_series, DAY, GRANULARITIES, MAX_RANGE_DAYS
+from .stats_cache import cached_stats
 
 from mealgpt.models import ManualTrackingDay, ManualTrackingEntry
 from mealphoto.models import UserPhotoMeal  # Adjust if your model name is different
 
+ENTRY_PAGE_SIZE = 50  # Entry details per page
+
 # Helper function to get or create today's DailyIntake
 def get_or_create_daily_intake(user, target_date=None):
     """Get or create a DailyIntake for the specified user and date"""
@@ -22,116 +28,110 @@ def get_or_create_daily_intake(user, target_date=None):
         return DailyIntake.objects.get(user=user, date=target_date)
     except DailyIntake.DoesNotExist:
         # Create new record with goals from user's preferences
-        try:
-            user_goals = UserMacroGoal.objects.get(user=user)
-            daily_intake = DailyIntake.objects.create(
-                user=user,
-                date=target_date,
-                goal_calorie=user_goals.daily_calorie,
-                goal_protein=user_goals.protein,
-                goal_carbs=user_goals.carbs,
-                goal_fats=user_goals.fats,
-                water_goal=user_goals.water_goal,
-            )
-            return daily_intake
-        except UserMacroGoal.DoesNotExist:
-            # No goals set, create with defaults
-            return DailyIntake.objects.create(
-                user=user,
-                date=target_date
-            )
+        return DailyIntake.objects.create(user=user, date=target_date, **default_intake_goals(user))
+
+
+def default_intake_goals(user):
+    """Goal fields for a new DailyIntake from the user's preferences (empty => model defaults)"""
+    try:
+        user_goals = UserMacroGoal.objects.get(user=user)
+    except UserMacroGoal.DoesNotExist:
+        return {}
+    return {
+        'goal_calorie': user_goals.daily_calorie,
+        'goal_protein': user_goals.protein,
+        'goal_carbs': user_goals.carbs,
+        'goal_fats': user_goals.fats,
+        'water_goal': user_goals.water_goal,
+    }
+
+
+def read_daily_intake(user, target_date=None):
+    """
+    Read-only counterpart of get_or_create_daily_intake for cached statistics builds:
+    a missing day is returned unsaved with the default goals (no write, no post_save invalidation)
+    """
+    target_date = target_date or timezone.now().date()
+    daily_intake = DailyIntake.objects.filter(user=user, date=target_date).first()
+    return daily_intake or DailyIntake(user=user, date=target_date, **default_intake_goals(user))
 
-# Helper function to get manual entries for a date range
+# Helper function to get manual entry totals for a date range
 def get_manual_entries(user, start_date, end_date=None):
     """
-    Aggregates entries from manual tracking and photo meals for a user
-    within the specified date range.
+    Per-day totals of manual tracking entries and photo meals for a user
+    within the specified date range => {iso_date: {calories, protein, carbs, fats}}.
+    Sums are computed in the database (values('date').annotate(Sum)), no model
+    instances are loaded; use get_manual_entry_page for the entry details.
     """
     result = {}
     
     # If only one date is provided, set end_date to the same date
     if end_date is None:
         end_date = start_date
-    
-    # Get manual entries from mealgpt app
-    manual_days = ManualTrackingDay.objects.filter(
+
+    sums = {name: Sum(name) for name in ('calories', 'protein', 'carbs', 'fats')}
+
+    # Manual entries from mealgpt app
+    manual_totals = ManualTrackingEntry.objects.filter(
+        day__user=user,
+        day__date__gte=start_date,
+        day__date__lte=end_date
+    ).values(day_date=F('day__date')).annotate(**sums).order_by()
+
+    # Photo meals are grouped by created_at date (same as before)
+    photo_totals = UserPhotoMeal.objects.filter(
         user=user,
-        date__gte=start_date,
-        date__lte=end_date
-    )
-    
-    # Process manual entries
-    for day in manual_days:
-        day_str = day.date.isoformat()
-        entries = day.entries.all()
-        
-        if day_str not in result:
-            result[day_str] = {
-                'calories': 0,
-                'protein': 0,
-                'carbs': 0,
-                'fats': 0,
-                'entries': []
-            }
-        
-        # Add entry details
-        for entry in entries:
-            result[day_str]['calories'] += entry.calories
-            result[day_str]['protein'] += entry.protein
-            result[day_str]['carbs'] += entry.carbs
-            result[day_str]['fats'] += entry.fats
-            
-            result[day_str]['entries'].append({
-                'id': entry.id,
-                'name': entry.name,
-                'calories': entry.calories,
-                'protein': entry.protein,
-                'carbs': entry.carbs,
-                'fats': entry.fats,
-                'source': 'manual'
-            })
-    
-    # Get photo meal entries - use created_at__date instead of date
-    try:
-        photo_meals = UserPhotoMeal.objects.filter(
-            user=user,
-            created_at__date__gte=start_date,
-            created_at__date__lte=end_date
-        )
-        
-        # Process photo meal entries
-        for meal in photo_meals:
-            day_str = meal.created_at.date().isoformat()
-            
-            if day_str not in result:
-                result[day_str] = {
-                    'calories': 0,
-                    'protein': 0,
-                    'carbs': 0,
-                    'fats': 0,
-                    'entries': []
-                }
-            
-            # Add meal details - using the direct fields, not meal_data
-            result[day_str]['calories'] += meal.calories
-            result[day_str]['protein'] += meal.protein
-            result[day_str]['carbs'] += meal.carbs
-            result[day_str]['fats'] += meal.fats
-            
-            result[day_str]['entries'].append({
-                'id': meal.id,
-                'name': meal.name,
-                'calories': meal.calories,
-                'protein': meal.protein,
-                'carbs': meal.carbs,
-                'fats': meal.fats,
-                'source': 'photo'
-            })
-    except Exception as e:
-        print(f"Error processing photo meals: {e}")
-    
+        created_at__date__gte=start_date,
+        created_at__date__lte=end_date
+    ).values(day_date=TruncDate('created_at')).annotate(**sums).order_by()
+
+    for row in [*manual_totals, *photo_totals]:
+        day = result.setdefault(row['day_date'].isoformat(), dict.fromkeys(sums, 0))
+        for name in sums:
+            day[name] += row[name] or 0
+
     return result
 
+
+def get_manual_entry_page(user, start_date, end_date=None, page=1, page_size=ENTRY_PAGE_SIZE):
+    """
+    One page of manual entry + photo meal details in the range (manual entries first,
+    then photo meals). Only the rows on the page are fetched.
+    Returns (entries, total_count).
+    """
+    if end_date is None:
+        end_date = start_date
+
+    manual = ManualTrackingEntry.objects.filter(
+        day__user=user,
+        day__date__gte=start_date,
+        day__date__lte=end_date
+    ).order_by('day__date', '-created_at')
+    photos = UserPhotoMeal.objects.filter(
+        user=user,
+        created_at__date__gte=start_date,
+        created_at__date__lte=end_date
+    ).order_by('created_at')
+
+    manual_count = manual.count()
+    total_count = manual_count + photos.count()
+    offset = (page - 1) * page_size
+    limit = offset + page_size
+
+    fields = ('id', 'name', 'calories', 'protein', 'carbs', 'fats')
+    entries = []
+    if offset < manual_count:
+        entries += [
+            {**row, 'source': 'manual'}
+            for row in manual.values(*fields)[offset:min(limit, manual_count)]
+        ]
+    if limit > manual_count:
+        entries += [
+            {**row, 'source': 'photo'}
+            for row in photos.values(*fields)[max(offset - manual_count, 0):limit - manual_count]
+        ]
+    return entries, total_count
+
 # Water tracking endpoints
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -171,6 +171,30 @@ def update_water_intake(request):
         'water_goal': daily_intake.water_goal
     })
 
+# Offline sync endpoint
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def sync_events(request):
+    """
+    Çevrimdışı biriken olayları tek istekte uygular.
+    { "events": [ { "key": "<idempotency key>", "type": "food", "food_id": 12, "consumed": true }, ... ] }
+    Tekrar gönderilen key'ler yeniden uygulanmaz; sonuçlar ve güncel durum döner.
+    """
+    events = request.data.get('events')
+    if not isinstance(events, list) or not all(isinstance(e, dict) for e in events):
+        return Response({'error': 'events must be a list of objects'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(events) > MAX_SYNC_EVENTS:
+        return Response({'error': f'At most {MAX_SYNC_EVENTS} events per request'}, status=status.HTTP_400_BAD_REQUEST)
+    if any(len(str(e.get('key') or '')) > 64 for e in events):
+        return Response({'error': 'key must be at most 64 characters'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        data = apply_sync_batch(request.user, events)
+    except SyncConflict:
+        return Response({'error': 'Same events are being synced, retry'}, status=status.HTTP_409_CONFLICT)
+
+    return Response(data)
+
 # Weight tracking endpoints
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -243,50 +267,53 @@ def get_daily_statistics(request):
         except ValueError:
             return Response({'error': 'Invalid date format'}, status=status.HTTP_400_BAD_REQUEST)
     
-    # Get or create today's intake record
-    daily_intake = get_or_create_daily_intake(request.user, target_date)
-    
-    # Try to get weight for the day
-    try:
-        weight_entry = WeightHistory.objects.get(user=request.user, date=target_date)
-        weight = weight_entry.weight
-    except WeightHistory.DoesNotExist:
-        weight = None
+    def build():
+        # Read the day's intake record (missing => default goals, nothing is written)
+        daily_intake = read_daily_intake(request.user, target_date)
+
+        # Try to get weight for the day
+        try:
+            weight_entry = WeightHistory.objects.get(user=request.user, date=target_date)
+            weight = weight_entry.weight
+        except WeightHistory.DoesNotExist:
+            weight = None
     
-    # Get food item details from manual tracking or entries
-    # This depends on your existing application structure
-    # This is a placeholder - replace with your actual food items retrieval
-    food_items = []  # You'll need to populate this from your food tracking system
+        # Get food item details from manual tracking or entries
+        # This depends on your existing application structure
+        # This is a placeholder - replace with your actual food items retrieval
+        food_items = []  # You'll need to populate this from your food tracking system
     
-    response_data = {
-        'date': daily_intake.date.isoformat(),
-        'totals': {
-            'calories': {
-                'goal': daily_intake.goal_calorie,
-                'actual': daily_intake.actual_calorie
-            },
-            'protein': {
-                'goal': daily_intake.goal_protein,
-                'actual': daily_intake.actual_protein
-            },
-            'carbs': {
-                'goal': daily_intake.goal_carbs,
-                'actual': daily_intake.actual_carbs
-            },
-            'fats': {
-                'goal': daily_intake.goal_fats,
-                'actual': daily_intake.actual_fats
+        response_data = {
+            'date': daily_intake.date.isoformat(),
+            'totals': {
+                'calories': {
+                    'goal': daily_intake.goal_calorie,
+                    'actual': daily_intake.actual_calorie
+                },
+                'protein': {
+                    'goal': daily_intake.goal_protein,
+                    'actual': daily_intake.actual_protein
+                },
+                'carbs': {
+                    'goal': daily_intake.goal_carbs,
+                    'actual': daily_intake.actual_carbs
+                },
+                'fats': {
+                    'goal': daily_intake.goal_fats,
+                    'actual': daily_intake.actual_fats
+                },
+                'water': {
+                    'goal': daily_intake.water_goal,
+                    'actual': daily_intake.water_actual
+                }
             },
-            'water': {
-                'goal': daily_intake.water_goal,
-                'actual': daily_intake.water_actual
-            }
-        },
-        'foodItems': food_items,
-        'weight': weight
-    }
-    
-    return Response(response_data)
+            'foodItems': food_items,
+            'weight': weight
+        }
+        return response_data
+
+    # Repeat reads are served from the per-user cache until the next write
+    return Response(cached_stats(request.user.id, 'daily', target_date, build))
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -294,195 +321,50 @@ def get_weekly_statistics(request):
     """Get nutritional statistics for the past 7 days"""
     end_date = timezone.now().date()
     start_date = end_date - timedelta(days=6)  # 7 days including today
-    
-    # Get records for the past 7 days
-    daily_records = DailyIntake.objects.filter(
-        user=request.user,
-        date__gte=start_date,
-        date__lte=end_date
-    ).order_by('date')
-    
-    # Get weight records for the same period
-    weight_records = WeightHistory.objects.filter(
-        user=request.user,
-        date__gte=start_date,
-        date__lte=end_date
-    ).order_by('date')
-    
-    # Prepare data arrays for the response
-    dates = []
-    calories_actual = []
-    calories_goal = []
-    protein_actual = []
-    carbs_actual = []
-    fats_actual = []
-    water_actual = []
-    water_goal = []
-    weights = []
-    
-    # Create a lookup for weight records by date
-    weight_by_date = {record.date: record.weight for record in weight_records}
-    
-    # Fill in any missing days with default records
-    current_date = start_date
-    while current_date <= end_date:
-        # Try to find existing record for this date
-        day_record = next((record for record in daily_records if record.date == current_date), None)
-        
-        if not day_record:
-            # Create a dummy record with zeros for missing dates
-            day_record = DailyIntake(
-                user=request.user,
-                date=current_date,
-                actual_calorie=0,
-                actual_protein=0,
-                actual_carbs=0,
-                actual_fats=0,
-                water_actual=0,
-                goal_calorie=0,
-                goal_protein=0,
-                goal_carbs=0,
-                goal_fats=0,
-                water_goal=0
-            )
-        
-        # Format date as "Mon", "Tue", etc.
-        date_str = current_date.strftime('%a')
-        dates.append(date_str)
-        
-        # Add nutritional data
-        calories_actual.append(day_record.actual_calorie)
-        calories_goal.append(day_record.goal_calorie)
-        protein_actual.append(day_record.actual_protein)
-        carbs_actual.append(day_record.actual_carbs)
-        fats_actual.append(day_record.actual_fats)
-        water_actual.append(day_record.water_actual)
-        water_goal.append(day_record.water_goal)
-        
-        # Add weight data if available
-        weights.append(weight_by_date.get(current_date))
-        
-        # Move to next day
-        current_date += timedelta(days=1)
-    
-    response_data = {
-        'dates': dates,
-        'calories': {
-            'actual': calories_actual,
-            'goal': calories_goal
-        },
-        'macros': {
-            'protein': protein_actual,
-            'carbs': carbs_actual,
-            'fats': fats_actual
-        },
-        'water': {
-            'actual': water_actual,
-            'goal': water_goal
-        },
-        'weight': weights
-    }
-    
-    return Response(response_data)
+
+    # Format date as "Mon", "Tue", etc.
+    return Response(cached_stats(
+        request.user.id, 'weekly', (start_date, end_date),
+        lambda: range_series(request.user, start_date, end_date, label_format='%a')
+    ))
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_monthly_statistics(request):
     """Get nutritional statistics for the current month"""
-    # Get current date
     today = timezone.now().date()
-    # Get first day of the month
     start_date = today.replace(day=1)
-    
-    # Get records for the current month
-    daily_records = DailyIntake.objects.filter(
-        user=request.user,
-        date__gte=start_date,
-        date__lte=today
-    ).order_by('date')
-    
-    # Get weight records for the same period
-    weight_records = WeightHistory.objects.filter(
-        user=request.user,
-        date__gte=start_date,
-        date__lte=today
-    ).order_by('date')
-    
-    # Prepare data arrays for the response
-    dates = []
-    calories_actual = []
-    calories_goal = []
-    protein_actual = []
-    carbs_actual = []
-    fats_actual = []
-    water_actual = []
-    water_goal = []
-    weights = []
-    
-    # Create a lookup for weight records by date
-    weight_by_date = {record.date: record.weight for record in weight_records}
-    
-    # Fill in any missing days with default records
-    current_date = start_date
-    while current_date <= today:
-        # Try to find existing record for this date
-        day_record = next((record for record in daily_records if record.date == current_date), None)
-        
-        if not day_record:
-            # Create a dummy record with zeros for missing dates
-            day_record = DailyIntake(
-                user=request.user,
-                date=current_date,
-                actual_calorie=0,
-                actual_protein=0,
-                actual_carbs=0,
-                actual_fats=0,
-                water_actual=0,
-                goal_calorie=0,
-                goal_protein=0,
-                goal_carbs=0,
-                goal_fats=0,
-                water_goal=0
-            )
-        
-        # Format date as ISO format
-        date_str = current_date.isoformat()
-        dates.append(date_str)
-        
-        # Add nutritional data
-        calories_actual.append(day_record.actual_calorie)
-        calories_goal.append(day_record.goal_calorie)
-        protein_actual.append(day_record.actual_protein)
-        carbs_actual.append(day_record.actual_carbs)
-        fats_actual.append(day_record.actual_fats)
-        water_actual.append(day_record.water_actual)
-        water_goal.append(day_record.water_goal)
-        
-        # Add weight data if available
-        weights.append(weight_by_date.get(current_date))
-        
-        # Move to next day
-        current_date += timedelta(days=1)
-    
-    response_data = {
-        'dates': dates,
-        'calories': {
-            'actual': calories_actual,
-            'goal': calories_goal
-        },
-        'macros': {
-            'protein': protein_actual,
-            'carbs': carbs_actual,
-            'fats': fats_actual
-        },
-        'water': {
-            'actual': water_actual,
-            'goal': water_goal
-        },
-        'weight': weights
-    }
-    
-    return Response(response_data)
+
+    return Response(cached_stats(
+        request.user.id, 'monthly', (start_date, today),
+        lambda: range_series(request.user, start_date, today)
+    ))
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_range_statistics(request):
+    """
+    Get nutritional statistics for a custom range
+    ?start=YYYY-MM-DD&end=YYYY-MM-DD (default today)&granularity=day|week|month
+    """
+    try:
+        end_date = date.fromisoformat(request.query_params['end']) if request.query_params.get('end') else timezone.now().date()
+        start_date = date.fromisoformat(request.query_params['start']) if request.query_params.get('start') else end_date - timedelta(days=6)
+    except ValueError:
+        return Response({'error': 'Invalid date format'}, status=status.HTTP_400_BAD_REQUEST)
+
+    granularity = request.query_params.get('granularity', DAY)
+    if granularity not in GRANULARITIES:
+        return Response({'error': f'granularity must be one of {", ".join(GRANULARITIES)}'}, status=status.HTTP_400_BAD_REQUEST)
+    if start_date > end_date:
+        return Response({'error': 'start must be before end'}, status=status.HTTP_400_BAD_REQUEST)
+    if (end_date - start_date).days + 1 > MAX_RANGE_DAYS:
+        return Response({'error': f'Range is limited to {MAX_RANGE_DAYS} days'}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(cached_stats(
+        request.user.id, 'range', (start_date, end_date, granularity),
+        lambda: range_series(request.user, start_date, end_date, granularity)
+    ))
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -562,49 +444,62 @@ def get_daily_manual_statistics(request):
             except ValueError:
                 return Response({'error': 'Invalid date format'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Get manual entries for the day
-        entries = get_manual_entries(request.user, target_date)
+        # Entry details are paginated: ?page=1&page_size=50
+        try:
+            page = max(1, int(request.query_params.get('page', 1)))
+            page_size = min(max(1, int(request.query_params.get('page_size', ENTRY_PAGE_SIZE))), 200)
+        except ValueError:
+            return Response({'error': 'Invalid page'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Get daily intake for macronutrient goals
-        daily_intake = get_or_create_daily_intake(request.user, target_date)
+        def build():
+            # Get manual entry totals and one page of details for the day
+            entries = get_manual_entries(request.user, target_date)
+            entry_page, entries_count = get_manual_entry_page(request.user, target_date, page=page, page_size=page_size)
         
-        # Get weight entry - same as weekly plan
-        try:
-            weight_entry = WeightHistory.objects.get(user=request.user, date=target_date)
-            weight = weight_entry.weight
-        except WeightHistory.DoesNotExist:
-            weight = None
+            # Get daily intake for macronutrient goals (read-only inside the cached build)
+            daily_intake = read_daily_intake(request.user, target_date)
         
-        # Format the response
-        response_data = {
-            'date': target_date.isoformat(),
-            'entries': entries.get(target_date.isoformat(), {}).get('entries', []),
-            'totals': {
-                'calories': {
-                    'goal': daily_intake.goal_calorie,
-                    'actual': entries.get(target_date.isoformat(), {}).get('calories', 0)
-                },
-                'protein': {
-                    'goal': daily_intake.goal_protein,
-                    'actual': entries.get(target_date.isoformat(), {}).get('protein', 0)
-                },
-                'carbs': {
-                    'goal': daily_intake.goal_carbs,
-                    'actual': entries.get(target_date.isoformat(), {}).get('carbs', 0)
-                },
-                'fats': {
-                    'goal': daily_intake.goal_fats,
-                    'actual': entries.get(target_date.isoformat(), {}).get('fats', 0)
+            # Get weight entry - same as weekly plan
+            try:
+                weight_entry = WeightHistory.objects.get(user=request.user, date=target_date)
+                weight = weight_entry.weight
+            except WeightHistory.DoesNotExist:
+                weight = None
+        
+            # Format the response
+            response_data = {
+                'date': target_date.isoformat(),
+                'entries': entry_page,
+                'entries_count': entries_count,
+                'page': page,
+                'page_size': page_size,
+                'totals': {
+                    'calories': {
+                        'goal': daily_intake.goal_calorie,
+                        'actual': entries.get(target_date.isoformat(), {}).get('calories', 0)
+                    },
+                    'protein': {
+                        'goal': daily_intake.goal_protein,
+                        'actual': entries.get(target_date.isoformat(), {}).get('protein', 0)
+                    },
+                    'carbs': {
+                        'goal': daily_intake.goal_carbs,
+                        'actual': entries.get(target_date.isoformat(), {}).get('carbs', 0)
+                    },
+                    'fats': {
+                        'goal': daily_intake.goal_fats,
+                        'actual': entries.get(target_date.isoformat(), {}).get('fats', 0)
+                    },
+                    'water': {
+                        'goal': daily_intake.water_goal,  # Use water_goal instead of goal_water
+                        'actual': daily_intake.water_actual
+                    }
                 },
-                'water': {
-                    'goal': daily_intake.water_goal,  # Use water_goal instead of goal_water
-                    'actual': daily_intake.water_actual
-                }
-            },
-            'weight': weight
-        }
-        
-        return Response(response_data)
+                'weight': weight
+            }
+            return response_data
+
+        return Response(cached_stats(request.user.id, 'daily_manual', (target_date, page, page_size), build))
     except Exception as e:
         print(f"Error in get_daily_manual_statistics: {e}")
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -618,83 +513,18 @@ def get_weekly_manual_statistics(request):
         end_date = timezone.now().date()
         start_date = end_date - timedelta(days=6)  # 7 days including today
         
-        # Get manual entries for the week
-        entries = get_manual_entries(request.user, start_date, end_date)
-        
-        # Prepare data arrays for the response
-        dates = []
-        calories_actual = []
-        protein_actual = []
-        carbs_actual = []
-        fats_actual = []
-        water_actual = []
-        weights = []
-        
-        # Get goals (using the latest daily intake for goals)
-        daily_intake = get_or_create_daily_intake(request.user)
-        calories_goal = daily_intake.goal_calorie
-        protein_goal = daily_intake.goal_protein
-        carbs_goal = daily_intake.goal_carbs
-        fats_goal = daily_intake.goal_fats
-        water_goal = daily_intake.water_goal  # Use water_goal instead of goal_water
-        
-        # Fill in data for each day
-        current_date = start_date
-        while current_date <= end_date:
-            date_str = current_date.strftime('%a')  # 'Mon', 'Tue', etc.
-            iso_date = current_date.isoformat()
-            dates.append(date_str)
+        def build():
+            # Get manual entries for the week
+            entries = get_manual_entries(request.user, start_date, end_date)
             
-            day_entries = entries.get(iso_date, {})
+            # Get goals (using today's daily intake for goals, read-only inside the cached build)
+            daily_intake = read_daily_intake(request.user)
             
-            # Add nutritional data
-            calories_actual.append(day_entries.get('calories', 0))
-            protein_actual.append(day_entries.get('protein', 0))
-            carbs_actual.append(day_entries.get('carbs', 0))
-            fats_actual.append(day_entries.get('fats', 0))
-            
-            # Add water data - use the same approach as weekly plan
-            try:
-                daily_intake_record = DailyIntake.objects.get(user=request.user, date=current_date)
-                water_actual.append(daily_intake_record.water_actual)
-            except DailyIntake.DoesNotExist:
-                water_actual.append(0)
-            
-            # Add weight data - use the same approach as weekly plan
-            try:
-                weight_record = WeightHistory.objects.get(user=request.user, date=current_date)
-                weights.append(weight_record.weight)
-            except WeightHistory.DoesNotExist:
-                weights.append(None)
-            
-            # Move to next day
-            current_date += timedelta(days=1)
-        
-        response_data = {
-            'dates': dates,
-            'calories': {
-                'actual': calories_actual,
-                'goal': [calories_goal] * 7
-            },
-            'macros': {
-                'protein': protein_actual,
-                'carbs': carbs_actual,
-                'fats': fats_actual
-            },
-            'water': {
-                'actual': water_actual,
-                'goal': [water_goal] * 7
-            },
-            'weight': weights,  # Changed from 'weights' to 'weight' to match weekly plan format
-            'goals': {
-                'protein': protein_goal,
-                'carbs': carbs_goal,
-                'fats': fats_goal,
-                'water': water_goal
-            }
-        }
-        
-        return Response(response_data)
+            return manual_range_series(
+                request.user, start_date, end_date, entries, daily_intake,
+                label=lambda d: d.strftime('%a')  # 'Mon', 'Tue', etc.
+            )
+        return Response(cached_stats(request.user.id, 'weekly_manual', (start_date, end_date), build))
     except Exception as e:
         print(f"Error in get_weekly_manual_statistics: {e}")
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -710,87 +540,18 @@ def get_monthly_manual_statistics(request):
         # Get first day of the month
         start_date = today.replace(day=1)
         
-        # Get manual entries for the month
-        entries = get_manual_entries(request.user, start_date, today)
-        
-        # Prepare data arrays for the response
-        dates = []
-        calories_actual = []
-        protein_actual = []
-        carbs_actual = []
-        fats_actual = []
-        water_actual = []
-        weights = []
-        
-        # Get goals (using the latest daily intake for goals)
-        daily_intake = get_or_create_daily_intake(request.user)
-        calories_goal = daily_intake.goal_calorie
-        protein_goal = daily_intake.goal_protein
-        carbs_goal = daily_intake.goal_carbs
-        fats_goal = daily_intake.goal_fats
-        water_goal = daily_intake.water_goal  # Use water_goal instead of goal_water
-        
-        # Fill in data for each day
-        current_date = start_date
-        while current_date <= today:
-            # Format date as day of month
-            date_str = str(current_date.day)
-            iso_date = current_date.isoformat()
-            dates.append(date_str)
-            
-            day_entries = entries.get(iso_date, {})
-            
-            # Add nutritional data
-            calories_actual.append(day_entries.get('calories', 0))
-            protein_actual.append(day_entries.get('protein', 0))
-            carbs_actual.append(day_entries.get('carbs', 0))
-            fats_actual.append(day_entries.get('fats', 0))
+        def build():
+            # Get manual entries for the month
+            entries = get_manual_entries(request.user, start_date, today)
             
-            # Add water data - use the same approach as weekly plan
-            try:
-                daily_intake_record = DailyIntake.objects.get(user=request.user, date=current_date)
-                water_actual.append(daily_intake_record.water_actual)
-            except DailyIntake.DoesNotExist:
-                water_actual.append(0)
+            # Get goals (using today's daily intake for goals, read-only inside the cached build)
+            daily_intake = read_daily_intake(request.user)
             
-            # Add weight data - use the same approach as weekly plan
-            try:
-                weight_record = WeightHistory.objects.get(user=request.user, date=current_date)
-                weights.append(weight_record.weight)
-            except WeightHistory.DoesNotExist:
-                weights.append(None)
-            
-            # Move to next day
-            current_date += timedelta(days=1)
-        
-        # Number of days in the period
-        days_count = len(dates)
-        
-        response_data = {
-            'dates': dates,
-            'calories': {
-                'actual': calories_actual,
-                'goal': [calories_goal] * days_count
-            },
-            'macros': {
-                'protein': protein_actual,
-                'carbs': carbs_actual,
-                'fats': fats_actual
-            },
-            'water': {
-                'actual': water_actual,
-                'goal': [water_goal] * days_count
-            },
-            'weight': weights,  # Changed from 'weights' to 'weight' to match weekly plan format
-            'goals': {
-                'protein': protein_goal,
-                'carbs': carbs_goal,
-                'fats': fats_goal,
-                'water': water_goal
-            }
-        }
-        
-        return Response(response_data)
+            return manual_range_series(
+                request.user, start_date, today, entries, daily_intake,
+                label=lambda d: str(d.day)  # Day of month
+            )
+        return Response(cached_stats(request.user.id, 'monthly_manual', (start_date, today), build))
     except Exception as e:
         print(f"Error in get_monthly_manual_statistics: {e}")
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
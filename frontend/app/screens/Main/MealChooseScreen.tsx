@@ -38,6 +38,7 @@ if (Platform.OS === 'android' && UIManager.setLayoutAnimationEnabledExperimental
 ========================== */
 type Food = {
   id: number;
+  food_item?: number | null;
   name: string;
   portion_type: string;
   portion_count: number;
@@ -438,9 +439,33 @@ const MealChooseScreen: React.FC = () => {
   /* =======================
      Info Modal
   ========================== */
-  const openInfo = (food: Food) => {
+  const openInfo = async (food: Food) => {
     setInfoFood(food);
     setInfoVisible(true);
+
+    // Plan yanıtı tarif / bileşen taşımıyor; katalog besini katalogdan, katalogda
+    // olmayan (food_item boş) besin kendi kaydından ayrıca çekilir
+    if (food.tarif !== undefined) return;
+    const recipePath = food.food_item
+      ? `recipes/${food.food_item}/`
+      : `foods/${food.id}/recipe/`;
+    try {
+      const token = await SecureStore.getItemAsync('accessToken');
+      if (!token) return;
+      const res = await fetch(
+        `https://${ipv4Data.ipv4_address}/api/mealplan/${recipePath}`,
+        { headers: { Authorization: `Bearer ${token}` } }
+      );
+      if (!res.ok) return;
+      const recipe = await res.json();
+      setInfoFood((prev) =>
+        prev && prev.id === food.id
+          ? { ...prev, tarif: recipe.tarif, ana_bilesenler: recipe.ana_bilesenler }
+          : prev
+      );
+    } catch (err) {
+      console.log('fetchRecipe error:', err);
+    }
   };
   
   const closeInfo = () => {